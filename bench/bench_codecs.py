@@ -0,0 +1,113 @@
+"""Encode/decode time and size for each tile_codec codec.
+
+    python bench/bench_codecs.py
+    python bench/bench_codecs.py --repeat 2000 --codecs json-compact binary+zlib
+
+Room sets:
+  real     the tiles in world_tiles/ (skipped if there are none)
+  typical  generated rooms: a few sentences, a handful of nested items
+  deep     items nested 150 "contains" levels down
+  longdesc 2,000-character descriptions
+  wide     one room holding 2,000 items
+  player   a player save with a 300-item inventory
+
+Times are per document, best of 3 runs.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tile_codec import CODECS, encode, decode  # noqa: E402
+from world_store import FolderStore  # noqa: E402
+from bench_room_memory import make_tile, SENTENCES, ITEM_NAMES  # noqa: E402
+
+
+def deep_tile(rng, depth=150):
+    tile = make_tile(rng, 0, 0)
+    item = {"name": "pebble", "desc": "A tiny pebble.", "contains": []}
+    for i in range(depth):
+        item = {"name": rng.choice(ITEM_NAMES), "desc": f"Layer {i}.", "contains": [item]}
+    tile["items"] = [item]
+    return tile
+
+
+def long_desc_tile(rng, chars=2000):
+    tile = make_tile(rng, 0, 0)
+    text = ""
+    while len(text) < chars:
+        text += rng.choice(SENTENCES) + " "
+    tile["description"] = text[:chars]
+    return tile
+
+
+def wide_tile(rng, n=2000):
+    tile = make_tile(rng, 0, 0)
+    tile["items"] = [{"name": rng.choice(ITEM_NAMES), "desc": rng.choice(SENTENCES),
+                      "contains": []} for _ in range(n)]
+    return tile
+
+
+def player_doc(rng, n=300):
+    return {
+        "name": "Player One",
+        "stats": {"health": 100},
+        "position": {"x": 3, "y": -2, "z": 0},
+        "inventory": [{"name": rng.choice(ITEM_NAMES), "desc": rng.choice(SENTENCES),
+                       "contains": []} for _ in range(n)],
+        "meta": {"last_save": "2025-11-23T13:20:01.112291Z"},
+    }
+
+
+def room_sets(rng, world):
+    sets = {}
+    store = FolderStore(world)
+    real = [store.get(*c) for c in store.coords()]
+    if real:
+        sets["real"] = real
+    sets["typical"] = [make_tile(rng, i, 0) for i in range(50)]
+    sets["deep"] = [deep_tile(rng)]
+    sets["longdesc"] = [long_desc_tile(rng) for _ in range(10)]
+    sets["wide"] = [wide_tile(rng)]
+    sets["player"] = [player_doc(rng)]
+    return sets
+
+
+def timed(fn, docs, repeat):
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for d in docs:
+                fn(d)
+        t = (time.perf_counter() - t0) / (repeat * len(docs))
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="tile codec benchmark")
+    ap.add_argument("--world", default="world_tiles")
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--codecs", nargs="*", default=CODECS, choices=CODECS)
+    args = ap.parse_args()
+
+    for name, docs in room_sets(random.Random(args.seed), args.world).items():
+        repeat = max(1, args.repeat // max(1, len(docs)))
+        print(f"\n{name} ({len(docs)} docs)")
+        print(f"{'codec':<20} {'bytes/doc':>10} {'encode us':>10} {'decode us':>10}")
+        for codec in args.codecs:
+            blobs = [encode(d, codec) for d in docs]
+            assert all(decode(b) == d for b, d in zip(blobs, docs)), codec
+            size = sum(len(b) for b in blobs) / len(blobs)
+            enc = timed(lambda d: encode(d, codec), docs, repeat)
+            dec = timed(decode, blobs, repeat)
+            print(f"{codec:<20} {size:10.0f} {enc * 1e6:10.1f} {dec * 1e6:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Commands/sec and per-command latency of the headless engine.
+
+    python bench/bench_engine.py
+    python bench/bench_engine.py --size 300 --sessions 16 --commands 20000
+
+Builds a synthetic grid world (size x size rooms, each with a few items,
+some of them chests) in a packed .cogw file in a temp folder, then runs
+scripted players against one shared World: mostly moves along open
+exits, plus look, look <item>, get <item> and inventory, in the mix a
+player at a keyboard might type them. Sessions take turns one command at
+a time, so the room cache sees them interleaved the way a server would.
+
+Nothing is drawn; this is engine.Session.handle() and the stores under it.
+Pickups go to overlays in the temp folder too, so the real world_overlays/
+is left alone.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world_store import PackedStore  # noqa: E402
+from room_cache import RoomCache  # noqa: E402
+from overlays import OverlayStore  # noqa: E402
+from engine import World, Session, DIRS  # noqa: E402
+
+THINGS = ["coin", "ring", "candle", "rope", "bone", "key", "map", "apple"]
+
+
+def build_world(path, size, rng):
+    store = PackedStore(path)
+    for tx in range(size):
+        for ty in range(size):
+            exits = {}
+            for d, (dx, dy, _) in DIRS.items():
+                inside = 0 <= tx + dx < size and 0 <= ty + dy < size
+                exits[d] = inside and (len(d) == 1 or rng.random() < 0.3)
+            items = [{"name": rng.choice(THINGS), "desc": "lying about", "contains": []}
+                     for _ in range(rng.randint(0, 4))]
+            if rng.random() < 0.3:
+                items.append({"name": "chest", "desc": "oak, iron bands", "contains": [
+                    {"name": rng.choice(THINGS), "desc": "", "contains": []}
+                    for _ in range(rng.randint(1, 5))]})
+            store.put(tx, ty, 0, {
+                "coords": {"x": tx, "y": ty, "z": 0},
+                "exits": exits,
+                "description": "A generated room. " * rng.randint(5, 40),
+                "items": items,
+            })
+    store.flush()
+    return store
+
+
+def next_command(session, rng):
+    r = rng.random()
+    room = session.room
+    if r < 0.6:
+        open_exits = [d for d, ok in room["exits"].items() if ok]
+        return "move", rng.choice(open_exits) if open_exits else "look"
+    if r < 0.7:
+        return "look", "look"
+    if r < 0.8 and room["items"]:
+        it = rng.choice(room["items"])
+        return "look item", "look " + it.get("name", "")
+    if r < 0.9 and room["items"]:
+        it = rng.choice(room["items"])
+        kids = it.get("contains", [])
+        if kids and rng.random() < 0.5:
+            return "get item", f"get {rng.choice(kids).get('name', '')} from {it.get('name', '')}"
+        return "get item", "get " + it.get("name", "")
+    return "inventory", "inventory"
+
+
+def pct(sorted_vals, p):
+    return sorted_vals[min(len(sorted_vals) - 1, int(p / 100 * len(sorted_vals)))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="headless engine benchmark")
+    ap.add_argument("--size", type=int, default=150, help="world is size x size rooms")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--commands", type=int, default=10000, help="total, across all sessions")
+    ap.add_argument("--cache-rooms", type=int, default=512)
+    ap.add_argument("--prefetch", type=int, default=0, help="prefetch hops (0 = off)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    tmp = tempfile.mkdtemp(prefix="cog_engine_")
+    try:
+        t0 = time.perf_counter()
+        store = build_world(os.path.join(tmp, "world.cogw"), args.size, rng)
+        print(f"built {len(store)} rooms in {time.perf_counter() - t0:.1f}s")
+
+        world = World(store, RoomCache(store, max_rooms=args.cache_rooms),
+                      OverlayStore(folder=os.path.join(tmp, "overlays")),
+                      prefetch_hops=args.prefetch)
+        world.start()
+        sessions = []
+        for n in range(args.sessions):
+            s = Session(world, {"name": f"bot {n}", "position": {
+                "x": rng.randrange(args.size), "y": rng.randrange(args.size), "z": 0}})
+            s.enter()
+            sessions.append(s)
+
+        times = {}
+        lines = 0
+        t_all = time.perf_counter()
+        for i in range(args.commands):
+            s = sessions[i % len(sessions)]
+            kind, cmd = next_command(s, rng)
+            t0 = time.perf_counter()
+            out = s.handle(cmd)
+            times.setdefault(kind, []).append(time.perf_counter() - t0)
+            lines += len(out)
+        total = time.perf_counter() - t_all
+        world.close()
+        store.close()
+
+        print(f"{args.commands} commands from {args.sessions} sessions in {total:.2f}s: "
+              f"{args.commands / total:,.0f} commands/sec, {lines / args.commands:.1f} lines each")
+        print(f"{'command':<10} {'count':>6} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'max us':>8}")
+        for kind in ("move", "look", "look item", "get item", "inventory"):
+            vals = sorted(times.get(kind, []))
+            if not vals:
+                continue
+            us = [1e6 * pct(vals, p) for p in (50, 95, 99)] + [1e6 * vals[-1]]
+            print(f"{kind:<10} {len(vals):6d} " + " ".join(f"{v:8.1f}" for v in us))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""ExitGraph on big synthetic worlds: build, memory, disk, updates and paths.
+
+    python bench/bench_exit_graph.py
+    python bench/bench_exit_graph.py --sizes 300 1000 --queries 50
+
+The world is a --size x --size cave: about a quarter of the positions are
+rock, every room has exits to each neighbouring room, and every 100
+columns a wall runs north-south with a gap every 250 rooms, so long paths
+have to find their way round. Tiles aren't written anywhere; the graph is
+fed the exits directly, which is what build_graph() does after reading them.
+
+  build     set_room() for every room, then components and links
+  MB        what the graph holds in memory (arrays, dicts, chunk level)
+  file      the saved .exits file, and how long load() takes
+  update    graph.update() for one edited tile (what the map builder does)
+  path      random pairs at least size/2 apart; the plain row is the same
+            A* over rooms without the corridor, on the first few pairs
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exit_graph import ExitGraph, chebyshev, MAX_NODES  # noqa: E402
+from room_model import EXIT_ORDER, EXIT_STEP  # noqa: E402
+
+
+def footprint_mb(graph):
+    # the arrays, the dicts holding them, and the chunk-level graph
+    size = sum(sys.getsizeof(d) for d in (graph.masks, graph.comps, graph.ncomps,
+                                         graph.links, graph.reps))
+    size += sum(sys.getsizeof(a) + sys.getsizeof(k) for k, a in graph.masks.items())
+    size += sum(sys.getsizeof(a) for a in graph.comps.values())
+    size += sum(sys.getsizeof(n) + sys.getsizeof(out) + sys.getsizeof(graph.reps[n])
+                + len(out) * 100 for n, out in graph.links.items())
+    return size / 2**20
+
+
+def cave(size, seed):
+    rng = random.Random(seed)
+    rock = bytearray(size * size)
+    for i in range(size * size):
+        rock[i] = rng.random() < 0.25
+    for x in range(100, size, 100):
+        for y in range(size):
+            rock[y * size + x] = y % 250 > 3
+    return rock
+
+
+def exits_at(rock, size, x, y):
+    out = {}
+    for d in EXIT_ORDER:
+        dx, dy, _ = EXIT_STEP[d]
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < size and 0 <= ny < size and not rock[ny * size + nx]:
+            out[d] = True
+    return out
+
+
+def pct(vals, p):
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(p / 100 * len(vals)))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="exit graph benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[300, 1000, 1200])
+    ap.add_argument("--queries", type=int, default=40)
+    ap.add_argument("--plain", type=int, default=5, help="queries also run without the corridor")
+    ap.add_argument("--updates", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    for size in args.sizes:
+        rock = cave(size, args.seed)
+        rooms = [(x, y) for y in range(size) for x in range(size) if not rock[y * size + x]]
+        t0 = time.perf_counter()
+        graph = ExitGraph()
+        for x, y in rooms:
+            graph.set_room(x, y, 0, exits_at(rock, size, x, y))
+        t_set = time.perf_counter() - t0
+        graph.build()
+        t_build = time.perf_counter() - t0
+        mb = footprint_mb(graph)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "world.exits")
+            t0 = time.perf_counter()
+            graph.save(path)
+            t_save = time.perf_counter() - t0
+            file_mb = os.path.getsize(path) / 2**20
+            t0 = time.perf_counter()
+            loaded = ExitGraph.load(path)
+            t_load = time.perf_counter() - t0
+            assert len(loaded) == len(graph) and loaded.links == graph.links
+
+        rng = random.Random(args.seed)
+        upd = []
+        for _ in range(args.updates):
+            x, y = rng.choice(rooms)
+            ex = exits_at(rock, size, x, y)
+            ex.pop(rng.choice(EXIT_ORDER), None)  # close one, as if edited in game.py
+            t0 = time.perf_counter()
+            graph.update(x, y, 0, ex)
+            upd.append(time.perf_counter() - t0)
+
+        print(f"{size}x{size}: {len(graph):,} rooms, {len(graph.reps):,} components, "
+              f"{len(graph.masks):,} chunks")
+        print(f"  build {t_build:.1f}s (set_room {t_set:.1f}s)  {mb:.1f} MB  "
+              f"file {file_mb:.1f} MB, save {t_save:.2f}s load {t_load:.2f}s  "
+              f"update p50 {1000 * pct(upd, 50):.1f} ms max {1000 * max(upd):.1f} ms")
+
+        times, lengths, plain_times, ratio, none = [], [], [], [], 0
+        q = 0
+        while q < args.queries:
+            a, b = rng.choice(rooms), rng.choice(rooms)
+            if chebyshev(a + (0,), b + (0,)) < size // 2:
+                continue
+            q += 1
+            t0 = time.perf_counter()
+            route = graph.path(a + (0,), b + (0,))
+            times.append(time.perf_counter() - t0)
+            if route is None:
+                none += 1
+                continue
+            lengths.append(len(route))
+            if len(plain_times) < args.plain:
+                t0 = time.perf_counter()
+                plain = graph._search(a + (0,), b + (0,), None, 10 * MAX_NODES)
+                plain_times.append(time.perf_counter() - t0)
+                if plain:
+                    ratio.append(len(route) / len(plain))
+        print(f"  path  {len(times)} queries, {none} unreachable, "
+              f"{sum(lengths) / max(1, len(lengths)):.0f} steps avg: "
+              f"p50 {1000 * pct(times, 50):.1f} ms  p95 {1000 * pct(times, 95):.1f} ms  "
+              f"max {1000 * max(times):.1f} ms")
+        if plain_times:
+            print(f"  plain A* on {len(plain_times)} of them: p50 {1000 * pct(plain_times, 50):.0f} ms  "
+                  f"max {1000 * max(plain_times):.0f} ms; corridor paths "
+                  f"{100 * (sum(ratio) / len(ratio) - 1):.1f}% longer on average")
+        del graph, loaded
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Per-frame cost of the map builder's item rows, 10 to 100,000 items.
+
+    python bench/bench_item_tree.py
+    python bench/bench_item_tree.py --frames 50
+
+"flatten" is what draw_items_panel used to do each frame: flatten the
+whole tree into row dicts, then use the first page of them. "view" is
+ItemTreeView.visible(), which keeps the flattened rows between frames.
+Its one-off costs are shown apart: a full rebuild (after a collapse or
+expand) and slotting in one added item.
+Trees are chests of 9 items, so about a tenth of the rows are containers.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from item_tree import ItemTreeView
+
+PAGE = 8  # rows that fit in the builder's items panel
+
+
+def make_items(n):
+    items = []
+    while n > 0:
+        kids = [{"name": f"coin {i}", "desc": "gold", "contains": []} for i in range(min(9, n - 1))]
+        items.append({"name": "chest", "desc": "oak", "contains": kids})
+        n -= 1 + len(kids)
+    return items
+
+
+def flatten_items_for_display(item_list, base_path, level, out):
+    for i, it in enumerate(item_list):
+        path = base_path + [i]
+        nm = it.get("name", "(no name)")
+        ds = it.get("desc", "").strip()
+        indent = "  " * level
+        out.append({"text": f"{indent}- {nm}: {ds}" if ds else f"{indent}- {nm}",
+                    "path": path, "plus_rect": None})
+        kids = it.get("contains", [])
+        if isinstance(kids, list) and kids:
+            flatten_items_for_display(kids, path, level + 1, out)
+
+
+def per_frame(fn, frames):
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / frames
+
+
+def main():
+    ap = argparse.ArgumentParser(description="item panel row benchmark")
+    ap.add_argument("--frames", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'items':>8} {'flatten ms/frame':>17} {'view ms/frame':>14} "
+          f"{'rebuild ms':>11} {'add ms':>7}")
+    for n in (10, 1_000, 10_000, 100_000):
+        items = make_items(n)
+
+        def old():
+            flat = []
+            flatten_items_for_display(items, [], 0, flat)
+            return flat[:PAGE]
+
+        view = ItemTreeView(items)
+        t0 = time.perf_counter()
+        view.rows
+        rebuild = 1000 * (time.perf_counter() - t0)
+        view.scroll(len(view.rows) // 2, PAGE)  # somewhere in the middle
+
+        parent = len(items) // 2
+        items[parent]["contains"].append({"name": "ring", "desc": "", "contains": []})
+        t0 = time.perf_counter()
+        view.added([parent, len(items[parent]["contains"]) - 1])
+        add = 1000 * (time.perf_counter() - t0)
+
+        print(f"{n:8d} {per_frame(old, args.frames):17.3f} "
+              f"{per_frame(lambda: view.visible(PAGE), args.frames * 100):14.4f} "
+              f"{rebuild:11.1f} {add:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""world_lint.py on a big generated world with known faults in it.
+
+    python bench/bench_lint.py                              # 1000 x 1000, packed
+    python bench/bench_lint.py --size 300 --layout folder --jobs 1 2 4
+
+Every room of a --size x --size grid gets exits to all its neighbours and
+an item in it, then --faults of each kind are planted: one-way exits,
+exits off the top of the map, rooms out past the edge with no way in,
+broken JSON (not for the region layout, where it would take a whole chunk
+with it), wrong coords, malformed items and plan.html-style tiles. The
+world is written to a temporary folder in the --layout picked, then
+linted once for each --jobs, reporting tiles/sec and whether everything
+planted was found.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world_store import open_world, PackedStore, FolderStore  # noqa: E402
+from room_model import EXIT_ORDER, EXIT_STEP  # noqa: E402
+from world_lint import lint, Report  # noqa: E402
+
+LAYOUTS = {"packed": "world.cogw", "folder": "world_tiles", "regions": "world.regions"}
+PLANTED = ("one-way", "missing", "island", "unreadable", "coords", "items", "schema")
+
+
+def grid_tile(size, x, y):
+    exits = {d: 0 <= x + EXIT_STEP[d][0] < size and 0 <= y + EXIT_STEP[d][1] < size
+             for d in EXIT_ORDER}
+    return {"coords": {"x": x, "y": y, "z": 0}, "last_move": None, "exits": exits,
+            "description": f"a plain room at {x},{y}",
+            "items": [{"name": "rock", "desc": "a grey rock",
+                       "contains": [{"name": "beetle", "desc": "", "contains": []}]}],
+            "saved_at": None}
+
+
+def make_world(path, size, faults, seed, progress=None):
+    """Write the world; returns {kind: how many were planted}."""
+    rng = random.Random(seed)
+    inside = rng.sample([(x, y) for x in range(1, size - 1) for y in range(1, size - 1)], 5 * faults)
+    kinds = ("one-way", "unreadable", "coords", "items", "schema")
+    odd = {c: kinds[n // faults] for n, c in enumerate(inside)}
+    for x in rng.sample(range(size), min(faults, size)):
+        odd[(x, size - 1)] = "missing"
+    planted = dict.fromkeys(PLANTED, 0)
+    broken = []
+    with open_world(path) as store:
+        for y in range(size):
+            for x in range(size):
+                tile = grid_tile(size, x, y)
+                kind = odd.get((x, y))
+                if kind == "one-way":
+                    tile["exits"]["e"] = False  # (x+1, y) still has w into here
+                elif kind == "missing":
+                    tile["exits"]["n"] = True   # off the top of the map
+                elif kind == "coords":
+                    tile["coords"]["x"] += 1
+                elif kind == "items":
+                    tile["items"].append({"desc": 3, "contains": "nothing"})
+                elif kind == "schema":
+                    tile = {"coords": [x, y, 0], "terrain": "moss", "objects": ["stone"],
+                            "exits": [d for d, ok in tile["exits"].items() if ok]}
+                elif kind == "unreadable":
+                    if isinstance(store, (PackedStore, FolderStore)):
+                        broken.append((x, y))
+                    else:
+                        kind = None
+                if kind:
+                    planted[kind] += 1
+                store.put(x, y, 0, tile)
+            if progress and y % 100 == 0:
+                progress(y * size)
+        for n in range(faults):
+            # out past the east edge, nothing in or out
+            tile = grid_tile(1, size + 2 + 2 * n, 0)
+            tile["coords"]["x"] = size + 2 + 2 * n
+            store.put(size + 2 + 2 * n, 0, 0, tile)
+            planted["island"] += 1
+        for x, y in broken:
+            if isinstance(store, PackedStore):
+                store._put_payload(x, y, 0, b'{"coords": {"x": ', 0)
+            else:
+                with open(store.filename(x, y, 0), "wb") as f:
+                    f.write(b'{"coords": {"x": ')
+    return planted
+
+
+def main():
+    ap = argparse.ArgumentParser(description="world linter benchmark")
+    ap.add_argument("--size", type=int, default=1000, help="world is size x size rooms")
+    ap.add_argument("--layout", choices=LAYOUTS, default="packed")
+    ap.add_argument("--faults", type=int, default=20, help="how many of each kind to plant")
+    ap.add_argument("--jobs", type=int, nargs="+", default=[os.cpu_count()])
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, LAYOUTS[args.layout])
+        t0 = time.perf_counter()
+        planted = make_world(path, args.size, args.faults, args.seed,
+                             progress=lambda n: print(f"  writing {n} tiles...", end="\r"))
+        print(f"{args.size}x{args.size} {args.layout} world written in "
+              f"{time.perf_counter() - t0:.0f}s; planted "
+              + ", ".join(f"{n} {k}" for k, n in planted.items() if n))
+        for jobs in args.jobs:
+            report = Report(quiet=True)
+            t0 = time.perf_counter()
+            _, checked, _ = lint(path, jobs, report=report)
+            took = time.perf_counter() - t0
+            found = report.counts
+            missed = [k for k, n in planted.items() if found[k] < n]
+            print(f"  {jobs} processes: {checked:,} tiles in {took:.1f}s "
+                  f"({checked / took:,.0f}/s); found "
+                  + ", ".join(f"{n} {k}" for k, n in found.items() if n)
+                  + (f"; MISSED {', '.join(missed)}" if missed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Move latency (p50/p99) with and without the room cache and prefetcher.
+
+Builds a synthetic grid world in a temp folder, wraps it in a store that
+sleeps on every stat/read to stand in for a slow (network / spinning) disk,
+and random-walks a player through it from a cold cache:
+
+    python bench/bench_move_latency.py --moves 300 --read-ms 8 --stat-ms 1
+
+"baseline" is the old load_room (straight to disk on every step).
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world_store import FolderStore  # noqa: E402
+from room_cache import RoomCache  # noqa: E402
+from prefetch import NeighbourPrefetcher  # noqa: E402
+
+DIRS = {
+    "n": (0, 1, 0), "ne": (1, 1, 0), "e": (1, 0, 0), "se": (1, -1, 0),
+    "s": (0, -1, 0), "sw": (-1, -1, 0), "w": (-1, 0, 0), "nw": (-1, 1, 0),
+}
+
+
+class SlowStore:
+    """Wraps a store and adds a fixed delay to every stat and read."""
+
+    def __init__(self, store, read_ms, stat_ms):
+        self.store = store
+        self.read_s = read_ms / 1000
+        self.stat_s = stat_ms / 1000
+
+    def stamp(self, x, y, z):
+        time.sleep(self.stat_s)
+        return self.store.stamp(x, y, z)
+
+    def get(self, x, y, z):
+        time.sleep(self.read_s)
+        return self.store.get(x, y, z)
+
+
+def build_world(path, size, rng):
+    store = FolderStore(path)
+    for tx in range(size):
+        for ty in range(size):
+            exits = {}
+            for d, (dx, dy, _) in DIRS.items():
+                inside = 0 <= tx + dx < size and 0 <= ty + dy < size
+                exits[d] = inside and (len(d) == 1 or rng.random() < 0.3)
+            store.put(tx, ty, 0, {
+                "coords": {"x": tx, "y": ty, "z": 0},
+                "exits": exits,
+                "description": "A generated room. " * rng.randint(5, 40),
+                "items": [{"name": f"thing {i}", "desc": "junk", "contains": []}
+                          for i in range(rng.randint(0, 6))],
+            })
+    return store
+
+
+def walk(store, mode, moves, think_ms, seed):
+    rng = random.Random(seed)
+    cache = prefetcher = None
+    if mode != "baseline":
+        cache = RoomCache(store, max_rooms=4096, max_age=1.0)
+    if mode.startswith("prefetch"):
+        prefetcher = NeighbourPrefetcher(cache, DIRS, hops=2 if mode == "prefetch2" else 1)
+        prefetcher.start()
+
+    def load(c):
+        return store.get(*c) if cache is None else cache.get(*c)
+
+    pos = (0, 0, 0)
+    room = load(pos)
+    if prefetcher:
+        prefetcher.room_entered(*pos, room["exits"])
+    samples = []
+    for _ in range(moves):
+        time.sleep(think_ms / 1000)  # the player typing the next command
+        open_dirs = [d for d, ok in room["exits"].items() if ok]
+        dx, dy, dz = DIRS[rng.choice(open_dirs)]
+        pos = (pos[0] + dx, pos[1] + dy, pos[2] + dz)
+        t0 = time.perf_counter()
+        room = load(pos)
+        if prefetcher:
+            prefetcher.room_entered(*pos, room["exits"])
+        samples.append((time.perf_counter() - t0) * 1000)
+    if prefetcher:
+        prefetcher.stop()
+    stats = cache.stats() if cache else None
+    return samples, stats
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="move latency benchmark")
+    ap.add_argument("--size", type=int, default=40, help="world is size x size rooms")
+    ap.add_argument("--moves", type=int, default=300)
+    ap.add_argument("--read-ms", type=float, default=8.0, help="simulated read latency")
+    ap.add_argument("--stat-ms", type=float, default=1.0, help="simulated stat latency")
+    ap.add_argument("--think-ms", type=float, default=40.0, help="pause between moves")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="cogworld-")
+    try:
+        base = build_world(os.path.join(tmp, "world_tiles"), args.size, random.Random(args.seed))
+        print(f"{args.size * args.size} rooms, read {args.read_ms}ms, stat {args.stat_ms}ms, "
+              f"think {args.think_ms}ms, {args.moves} moves")
+        print(f"{'mode':<10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  cache")
+        for mode in ("baseline", "cache", "prefetch", "prefetch2"):
+            slow = SlowStore(base, args.read_ms, args.stat_ms)
+            samples, stats = walk(slow, mode, args.moves, args.think_ms, args.seed)
+            extra = "" if stats is None else f"hit rate {stats['hit_rate']:.0%}"
+            print(f"{mode:<10} {pct(samples, 50):8.3f} {pct(samples, 99):8.3f} "
+                  f"{max(samples):8.3f}  {extra}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
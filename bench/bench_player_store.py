@@ -0,0 +1,110 @@
+"""Player files vs players.db, for 1,000 to 50,000 accounts.
+
+    python bench/bench_player_store.py
+    python bench/bench_player_store.py --counts 1000 10000 --saves 2000
+
+"files" is one JSON document per player, written with write_atomic the
+way player-1.json is. "sqlite" is PlayerStore. For each size:
+
+  migrate   copying all the player files into a new players.db
+  save      --saves saves of random players, then everything flushed
+            (files: one fsynced file each; sqlite: one transaction per batch)
+  load      reading a random player by name
+  who       everyone in one room: files have to open every player to
+            find out; sqlite uses the (x, y, z) index
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from saver import write_atomic  # noqa: E402
+from tile_codec import encode, load_file  # noqa: E402
+from engine import new_player_data  # noqa: E402
+from player_store import PlayerStore, migrate_files, position_of  # noqa: E402
+
+WORLD = 100  # players are scattered over a WORLD x WORLD grid
+
+
+def make_player(name, rng):
+    data = new_player_data(name)
+    data["position"] = {"x": rng.randrange(WORLD), "y": rng.randrange(WORLD), "z": 0}
+    data["inventory"] = [{"name": f"thing {i}", "desc": "junk", "contains": []}
+                         for i in range(rng.randint(0, 8))]
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description="player store benchmark")
+    ap.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 50000])
+    ap.add_argument("--saves", type=int, default=2000)
+    ap.add_argument("--loads", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'players':>8} {'migrate s':>10} | {'save/s files':>12} {'sqlite':>9} | "
+          f"{'load us files':>13} {'sqlite':>7} | {'who ms files':>12} {'sqlite':>7}")
+    for n in args.counts:
+        rng = random.Random(args.seed)
+        tmp = tempfile.mkdtemp(prefix="cog_players_")
+        try:
+            folder = os.path.join(tmp, "players")
+            os.makedirs(folder)
+            names = [f"player-{i}" for i in range(n)]
+            paths = [os.path.join(folder, name + ".json") for name in names]
+            for name, path in zip(names, paths):
+                with open(path, "wb") as f:
+                    f.write(encode(make_player(name, rng)))
+
+            store = PlayerStore(os.path.join(tmp, "players.db"))
+            t0 = time.perf_counter()
+            migrate_files(store, paths)
+            migrate = time.perf_counter() - t0
+
+            picks = [rng.randrange(n) for _ in range(args.saves)]
+            snaps = [make_player(names[i], rng) for i in picks]
+            t0 = time.perf_counter()
+            for i, data in zip(picks, snaps):
+                write_atomic(paths[i], encode(data))
+            files_save = len(picks) / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for i, data in zip(picks, snaps):
+                store.save(names[i], data)
+            store.flush()
+            sql_save = len(picks) / (time.perf_counter() - t0)
+
+            picks = [rng.randrange(n) for _ in range(args.loads)]
+            t0 = time.perf_counter()
+            for i in picks:
+                load_file(paths[i])
+            files_load = 1e6 * (time.perf_counter() - t0) / len(picks)
+            t0 = time.perf_counter()
+            for i in picks:
+                store.load(names[i])
+            sql_load = 1e6 * (time.perf_counter() - t0) / len(picks)
+
+            room = (WORLD // 2, WORLD // 2, 0)
+            t0 = time.perf_counter()
+            by_file = sorted(names[i] for i, p in enumerate(paths) if position_of(load_file(p)) == room)
+            files_who = 1000 * (time.perf_counter() - t0)
+            reps = 200
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                by_db = store.in_room(*room)
+            sql_who = 1000 * (time.perf_counter() - t0) / reps
+            assert sorted(by_db) == by_file, (by_db, by_file)  # both saw the same saves
+            store.close()
+
+            print(f"{n:8d} {migrate:10.2f} | {files_save:12,.0f} {sql_save:9,.0f} | "
+                  f"{files_load:13.1f} {sql_load:7.1f} | {files_who:12.1f} {sql_who:7.3f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
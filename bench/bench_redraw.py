@@ -0,0 +1,141 @@
+"""Idle CPU and frame cost: COG_REDRAW=always (old 60 fps flip) vs dirty.
+
+    python bench/bench_redraw.py
+    python bench/bench_redraw.py --seconds 10 --scripts game-main.py
+
+Each run starts the game (or the map builder) in a subprocess with SDL's
+dummy video driver, inside a temporary copy of the repo so saves don't
+touch your files, and measures two phases:
+
+  idle    nobody touches anything          -> CPU % of one core
+  typing  a key press every 50 ms          -> CPU % and CPU ms per frame
+
+"frames" counts every flip() or update() that reached the display.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(script, seconds):
+    import runpy
+    import pygame
+
+    if script == "game.py":
+        # the builder sizes its window from the desktop; dummy has none
+        class _Info:
+            current_w, current_h = 1280, 800
+        pygame.display.Info = lambda: _Info()
+
+    frames = [0]
+    for name in ("flip", "update"):
+        real = getattr(pygame.display, name)
+
+        def counted(*a, _real=real, **k):
+            frames[0] += 1
+            return _real(*a, **k)
+        setattr(pygame.display, name, counted)
+
+    mouse = {"pos": (0, 0), "pressed": False}
+    pygame.mouse.get_pos = lambda: mouse["pos"]
+    pygame.mouse.get_pressed = lambda *a: (mouse["pressed"], False, False)
+    results = {}
+
+    def phase(name, fn):
+        f0, c0, t0 = frames[0], time.process_time(), time.perf_counter()
+        fn()
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - c0
+        n = frames[0] - f0
+        results[name] = {"cpu_pct": 100 * cpu / wall, "frames": n,
+                         "ms_per_frame": 1000 * cpu / n if n else 0.0}
+
+    def press(key, ch=""):
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, unicode=ch, mod=0))
+
+    def typing():
+        end = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < end:
+            if i % 10 == 9:
+                press(pygame.K_BACKSPACE)
+            else:
+                press(ord("a"), "a")
+            i += 1
+            time.sleep(0.05)
+
+    def driver():
+        time.sleep(1.0)  # let it start up
+        if script == "game.py":
+            w, h = 1280, 800
+            mouse["pos"] = (w // 2, h // 2 + 80)  # "Map Builder"
+            mouse["pressed"] = True
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=mouse["pos"], button=1))
+            time.sleep(0.2)
+            mouse["pressed"] = False
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=mouse["pos"], button=1))
+            mouse["pos"] = (100, 520)  # focus the description box
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=mouse["pos"], button=1))
+            time.sleep(0.5)
+        phase("idle", lambda: time.sleep(seconds))
+        phase("typing", typing)
+        print("RESULT " + json.dumps(results), flush=True)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=driver, daemon=True).start()
+    sys.argv = [script]
+    sys.path.insert(0, os.getcwd())
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+
+
+def run(script, mode, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in os.listdir(ROOT):
+            src = os.path.join(ROOT, name)
+            if name.endswith(".py") or name == "player-1.json":
+                shutil.copy(src, tmp)
+            elif name == "world_tiles":
+                shutil.copytree(src, os.path.join(tmp, name))
+        env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+                   COG_REDRAW=mode, PYGAME_HIDE_SUPPORT_PROMPT="1")
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", script,
+                              "--seconds", str(seconds)],
+                             cwd=tmp, env=env, capture_output=True, text=True, timeout=seconds * 4 + 30)
+    for line in out.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[7:])
+    raise RuntimeError(f"{script} ({mode}) gave no result:\n{out.stderr[-2000:]}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="redraw mode benchmark")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--scripts", nargs="*", default=["game-main.py", "game.py"])
+    ap.add_argument("--child")
+    args = ap.parse_args()
+    if args.child:
+        return child(args.child, args.seconds)
+
+    print(f"{'script':<14} {'mode':<7} {'idle cpu':>9} {'idle fr':>8} "
+          f"{'type cpu':>9} {'type fr':>8} {'ms/frame':>9}")
+    for script in args.scripts:
+        for mode in ("always", "dirty"):
+            r = run(script, mode, args.seconds)
+            idle, typing = r["idle"], r["typing"]
+            print(f"{script:<14} {mode:<7} {idle['cpu_pct']:8.1f}% {idle['frames']:8d} "
+                  f"{typing['cpu_pct']:8.1f}% {typing['frames']:8d} {typing['ms_per_frame']:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
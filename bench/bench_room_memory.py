@@ -0,0 +1,87 @@
+"""Bytes per room: plain JSON dicts vs the compact room_model classes.
+
+    python bench/bench_room_memory.py --rooms 100000
+    python bench/bench_room_memory.py --rooms 1000000   # needs a few GB free
+
+Rooms are generated the way a real world tends to look: descriptions glued
+together from a shared pool of sentences, a handful of (nested) items, all
+eight exits present. Each room goes through json.loads like a tile file
+would, so the dict numbers include the per-tile key strings.
+"""
+import os
+import sys
+import gc
+import json
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_model import Room, EXIT_ORDER  # noqa: E402
+
+SENTENCES = [
+    "You find yourself in a damp stone chamber.",
+    "The air smells of earth and mildew.",
+    "Water drips somewhere in the dark.",
+    "A heavy wooden door stands to the north.",
+    "Moss covers the lower half of the walls.",
+    "Old bones are piled in one corner.",
+    "A cold draught comes from a crack in the ceiling.",
+    "Torchlight flickers across carved runes.",
+    "The floor is slick with green slime.",
+    "Something scuttles away as you enter.",
+] + [f"Faded writing on the wall reads '{w}'." for w in
+     ("beware", "turn back", "gold below", "the king lies", "north is death")]
+ITEM_NAMES = ["trunk", "knife", "gold coin", "old rock", "ring", "torch", "rope",
+              "bag", "bottle", "scroll", "bone", "helmet", "shield", "key"]
+
+
+def make_tile(rng, x, y):
+    def item(depth):
+        kids = [item(depth + 1) for _ in range(rng.randint(0, 2))] if depth < 2 else []
+        return {"name": rng.choice(ITEM_NAMES), "desc": rng.choice(SENTENCES), "contains": kids}
+    return {
+        "coords": {"x": x, "y": y, "z": 0},
+        "last_move": rng.choice([None] + EXIT_ORDER),
+        "exits": {d: rng.random() < 0.4 for d in EXIT_ORDER},
+        "description": " ".join(rng.sample(SENTENCES, rng.randint(2, 5))),
+        "items": [item(0) for _ in range(rng.randint(0, 3))],
+        "saved_at": f"2025-11-{rng.randint(1, 28):02d}T13:20:01.112291Z",
+    }
+
+
+def measure(n, seed, compact):
+    rng = random.Random(seed)
+    side = int(n ** 0.5) + 1
+    raw = [json.dumps(make_tile(rng, i % side, i // side)) for i in range(n)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    world = {}
+    for i, text in enumerate(raw):
+        tile = json.loads(text)
+        world[(i % side, i // side, 0)] = Room.from_json(tile) if compact else tile
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # the dict holding the world is the same either way; don't count it
+    return (used - sys.getsizeof(world)) / n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="room memory benchmark")
+    ap.add_argument("--rooms", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    dict_b = measure(args.rooms, args.seed, compact=False)
+    compact_b = measure(args.rooms, args.seed, compact=True)
+    print(f"{args.rooms} rooms")
+    print(f"{'model':<10} {'bytes/room':>11} {'1M rooms':>10}")
+    for name, b in (("dicts", dict_b), ("compact", compact_b)):
+        print(f"{name:<10} {b:11.0f} {b * 1e6 / 2**30:8.2f}GB")
+    print(f"compact uses {compact_b / dict_b:.0%} of the dict size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Load test for server.py: thousands of simulated players at once.
+
+    python bench/bench_server.py
+    python bench/bench_server.py --players 3000 --commands 30 --slow 50
+    python bench/bench_server.py --port 4000 --players 200   # an already running server
+
+Without --port it builds a synthetic world (see bench_engine.py) in a temp
+folder, scatters the players over it in a fresh players.db, starts
+server.py on a free port, and stops it afterwards.
+
+Every bot logs in, waits for the others, then sends --commands commands
+(moves along the exits it was shown, look, look/get an item, inventory),
+each time waiting for the prompt before the next, with --think-ms of
+random pause in between. Latency is send-to-prompt, so it includes the
+server's queueing behind everyone else.
+
+--slow adds bots that log in next to the others and keep sending "look"
+without ever reading. Backpressure should keep them from slowing everyone
+else down: their own commands stall, and others' news to them is dropped.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from bench_engine import build_world  # noqa: E402
+from player_store import PlayerStore  # noqa: E402
+from engine import new_player_data  # noqa: E402
+
+PROMPT = b"> "
+NEWS = (" appears.", " arrives from the ", " leaves ", " picks up the ", " fades away.")
+
+
+def parse_room(text):
+    exits, items, listing = [], [], False
+    for line in text.splitlines():
+        if line.startswith("Exits: "):
+            exits = line[7:].split(", ")
+        elif line == "You see:":
+            listing = True
+        elif listing and line.startswith("- "):
+            items.append(line[2:].split(":")[0])
+        else:
+            listing = False
+    return exits, items
+
+
+def pick(rng, exits, items):
+    r = rng.random()
+    if r < 0.6 and exits:
+        return "move", rng.choice(exits)
+    if r < 0.7:
+        return "look", "look"
+    if r < 0.8 and items:
+        return "look item", "look " + rng.choice(items)
+    if r < 0.9 and items:
+        return "get item", "get " + rng.choice(items)
+    return "inventory", "inventory"
+
+
+class Stats:
+    def __init__(self):
+        self.times = {}
+        self.news = 0
+        self.login = []
+        self.errors = 0
+
+
+async def bot(i, args, stats, ready, go, sem):
+    rng = random.Random(args.seed * 100003 + i)
+    try:
+        async with sem:
+            t0 = time.perf_counter()
+            reader, writer = await asyncio.open_connection(args.host, args.port, limit=1 << 20)
+            await reader.readuntil(PROMPT)
+            writer.write(f"bot{i}\r\n".encode())
+            text = (await reader.readuntil(PROMPT)).decode()
+            stats.login.append(time.perf_counter() - t0)
+    except (OSError, asyncio.IncompleteReadError):
+        stats.errors += 1
+        ready()
+        return
+    ready()
+    await go.wait()
+
+    exits, items = parse_room(text)
+    try:
+        for _ in range(args.commands):
+            if args.think_ms:
+                await asyncio.sleep(rng.random() * args.think_ms / 1000)
+            kind, cmd = pick(rng, exits, items)
+            t0 = time.perf_counter()
+            writer.write((cmd + "\r\n").encode())
+            text = (await reader.readuntil(PROMPT)).decode()
+            stats.times.setdefault(kind, []).append(time.perf_counter() - t0)
+            stats.news += sum(1 for line in text.splitlines() if any(n in line for n in NEWS))
+            if kind in ("move", "look"):
+                exits, items = parse_room(text)
+            elif kind == "get item" and "You pick up" in text:
+                items = [it for it in items if it != cmd[4:]]
+        writer.write(b"quit\r\n")
+        await writer.drain()
+    except (OSError, asyncio.IncompleteReadError):
+        stats.errors += 1
+    writer.close()
+
+
+async def slow_bot(i, args, ready, go, stop, sem):
+    # logs in, then only ever writes
+    try:
+        async with sem:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+            await reader.readuntil(PROMPT)
+            writer.write(f"slow{i}\r\n".encode())
+        ready()
+        await go.wait()
+        while not stop.is_set():
+            writer.write(b"look\r\n")
+            await asyncio.sleep(0.01)
+        writer.close()
+    except OSError:
+        ready()
+
+
+def pct(sorted_vals, p):
+    return sorted_vals[min(len(sorted_vals) - 1, int(p / 100 * len(sorted_vals)))]
+
+
+async def run(args):
+    stats = Stats()
+    go, stop = asyncio.Event(), asyncio.Event()
+    waiting = [args.players + args.slow]
+
+    def ready():
+        waiting[0] -= 1
+        if waiting[0] == 0:
+            go.set()
+
+    sem = asyncio.Semaphore(200)  # logins in flight; don't SYN-flood the listen queue
+    t_login = time.perf_counter()
+    slow = [asyncio.create_task(slow_bot(i, args, ready, go, stop, sem)) for i in range(args.slow)]
+    bots = [asyncio.create_task(bot(i, args, stats, ready, go, sem)) for i in range(args.players)]
+    await go.wait()
+    t_login = time.perf_counter() - t_login
+    t0 = time.perf_counter()
+    await asyncio.gather(*bots)
+    total = time.perf_counter() - t0
+    stop.set()
+    await asyncio.gather(*slow)
+    return stats, t_login, total
+
+
+def start_server(args, tmp):
+    rng = random.Random(args.seed)
+    print(f"building a {args.size}x{args.size} world...", flush=True)
+    store = build_world(os.path.join(tmp, "world.cogw"), args.size, rng)
+    store.close()
+    players = os.path.join(tmp, "players.db")
+    store = PlayerStore(players)
+    names = [f"bot{i}" for i in range(args.players)] + [f"slow{i}" for i in range(args.slow)]
+    for name in names:
+        data = new_player_data(name)
+        data["position"] = {"x": rng.randrange(args.size), "y": rng.randrange(args.size), "z": 0}
+        store.save(name, data)
+    store.close()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--port", "0",
+         "--world", os.path.join(tmp, "world.cogw"), "--players", players,
+         "--overlays", os.path.join(tmp, "overlays")],
+        stdout=subprocess.PIPE, text=True, cwd=tmp)
+    line = proc.stdout.readline()
+    args.port = int(line.rsplit(":", 1)[1])
+    return proc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="server.py load test")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, help="use a running server instead of starting one")
+    ap.add_argument("--players", type=int, default=2000)
+    ap.add_argument("--commands", type=int, default=20, help="per player")
+    ap.add_argument("--think-ms", type=float, default=0, help="random pause before each command, up to this")
+    ap.add_argument("--slow", type=int, default=0, help="extra bots that never read")
+    ap.add_argument("--size", type=int, default=60, help="world is size x size rooms")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    tmp = proc = None
+    if args.port is None:
+        tmp = tempfile.mkdtemp(prefix="cog_server_")
+        proc = start_server(args, tmp)
+    try:
+        stats, t_login, total = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            print(proc.communicate(timeout=30)[0].strip())
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    n = sum(len(v) for v in stats.times.values())
+    logins = sorted(stats.login)
+    print(f"{len(logins)} players logged in in {t_login:.2f}s "
+          f"(p50 {1000 * pct(logins, 50):.1f} ms, p99 {1000 * pct(logins, 99):.1f} ms), "
+          f"{args.slow} slow, {stats.errors} errors")
+    print(f"{n} commands in {total:.2f}s: {n / total:,.0f} commands/sec, "
+          f"{stats.news} news lines seen by the bots")
+    print(f"{'command':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    for kind in ("move", "look", "look item", "get item", "inventory"):
+        vals = sorted(stats.times.get(kind, []))
+        everything += vals
+        if vals:
+            ms = [1000 * pct(vals, p) for p in (50, 95, 99)] + [1000 * vals[-1]]
+            print(f"{kind:<10} {len(vals):6d} " + " ".join(f"{v:8.2f}" for v in ms))
+    everything.sort()
+    if everything:
+        ms = [1000 * pct(everything, p) for p in (50, 95, 99)] + [1000 * everything[-1]]
+        print(f"{'all':<10} {len(everything):6d} " + " ".join(f"{v:8.2f}" for v in ms))
+
+
+if __name__ == "__main__":
+    main()
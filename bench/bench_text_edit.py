@@ -0,0 +1,102 @@
+"""Cost per keystroke of the description box, as the text grows to 2,000 chars.
+
+    python bench/bench_text_edit.py
+
+"string" is what the builder used to do for every key: append to a str,
+then wrap the whole description twice (once to size the panel, once to
+draw it) with the old word-by-word wrap_text. "editor" is TextEditor:
+insert into the gap buffer, then lines(), which only re-wraps the
+paragraph that changed. Both type the same prose, in paragraphs of about
+300 characters, with the builder's font.
+
+A second run types into the middle of the text, which the old code could
+not do at all; "string" there is slicing the str plus the same two wraps.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from text_edit import TextEditor
+
+WIDTH = 260 - 24 - 12
+WORDS = ("the damp stone chamber smells of earth and old smoke while water drips "
+         "somewhere beyond the heavy oaken door ").split()
+
+
+def wrap_text(text, font, max_width):
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split(" ")
+        line = ""
+        for w in words:
+            test = (line + " " + w).strip() if line else w
+            if font.size(test)[0] <= max_width:
+                line = test
+            else:
+                if line:
+                    lines.append(line)
+                while font.size(w)[0] > max_width and len(w) > 1:
+                    cut = len(w)
+                    while cut > 1 and font.size(w[:cut])[0] > max_width:
+                        cut -= 1
+                    lines.append(w[:cut])
+                    w = w[cut:]
+                line = w
+        lines.append(line)
+    return lines
+
+
+def prose(n):
+    out = []
+    i = 0
+    while sum(len(w) + 1 for w in out) < n:
+        out.append(WORDS[i % len(WORDS)] + ("\n" if i % 50 == 49 else ""))
+        i += 1
+    return " ".join(out).replace("\n ", "\n")[:n]
+
+
+def main():
+    pygame.init()
+    font = pygame.font.SysFont(None, 26)
+    text = prose(2000)
+
+    print(f"{'typing':<8} {'chars':>6} {'string us/key':>14} {'editor us/key':>14}")
+    for where in ("end", "middle"):
+        for upto in (200, 1000, 2000):
+            chunk = text[:upto]
+            start = chunk[:upto - 200]
+            keys = chunk[upto - 200:]
+
+            s = start
+            pos = len(s) // 2
+            t0 = time.perf_counter()
+            for ch in keys:
+                if where == "end":
+                    s += ch
+                else:
+                    s = s[:pos] + ch + s[pos:]
+                    pos += 1
+                wrap_text(s, font, WIDTH)
+                wrap_text(s, font, WIDTH)
+            old = 1e6 * (time.perf_counter() - t0) / len(keys)
+
+            ed = TextEditor(font, start)
+            ed.lines(WIDTH)
+            if where == "middle":
+                ed.move_to(len(start) // 2)
+            t0 = time.perf_counter()
+            for ch in keys:
+                ed.type(ch)
+                ed.lines(WIDTH)
+                ed.lines(WIDTH)
+            new = 1e6 * (time.perf_counter() - t0) / len(keys)
+            print(f"{where:<8} {upto:6d} {old:14.1f} {new:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
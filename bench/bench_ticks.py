@@ -0,0 +1,105 @@
+"""Ticks/sec against creature count, with and without interest management.
+
+    python bench/bench_ticks.py
+    python bench/bench_ticks.py --counts 1000 100000 1000000 --players 100
+
+The world is a --size x --size open grid (4 exits per room, no tiles on
+disk, so this measures ticks.py alone). Creatures are scattered over all
+of it and step every 8 ticks. --players wander about, one step every
+--player-every ticks, so chunks keep waking up and dozing off.
+
+  near     only chunks near a player are simulated (ticks.Simulation default)
+  all      every chunk awake, as if there were no interest management
+
+For each it reports ticks/sec, how many creature steps a tick took, and for
+"near" how long waking a chunk took (the catch-up of its dormant creatures).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ticks import Simulation  # noqa: E402
+from engine import DIRS  # noqa: E402
+
+CARDINAL = ("n", "e", "s", "w")
+
+
+def grid_exits(size):
+    def exits_of(x, y, z):
+        return [d for d in CARDINAL
+                if 0 <= x + DIRS[d][0] < size and 0 <= y + DIRS[d][1] < size]
+    return exits_of
+
+
+def run(mode, n, args):
+    rng = random.Random(args.seed)
+    size = args.size
+    sim = Simulation(grid_exits(size), DIRS, radius=None if mode == "all" else (1, 1, 0))
+    for _ in range(n):
+        sim.add("rat", rng.randrange(size), rng.randrange(size), 0, every=8)
+    players = [[rng.randrange(size), rng.randrange(size)] for _ in range(args.players)]
+
+    wakes = []
+    original_wake = sim._wake
+
+    def timed_wake(key):
+        t0 = time.perf_counter()
+        original_wake(key)
+        wakes.append(time.perf_counter() - t0)
+    sim._wake = timed_wake
+
+    for i, p in enumerate(players):
+        sim.player_at(i, (p[0], p[1], 0))
+    wakes.clear()  # the first arrival is a one-off; time the walking about
+    for _ in range(args.warmup):
+        sim.tick()
+
+    steps0 = sim.steps
+    t0 = time.perf_counter()
+    ticks = 0
+    for t in range(args.ticks):
+        if t >= 10 and time.perf_counter() - t0 > args.seconds:
+            break  # "all" with a lot of creatures; enough to see the rate
+        ticks += 1
+        if t % args.player_every == 0:
+            for i, p in enumerate(players):
+                d = rng.choice(CARDINAL)
+                p[0] = min(size - 1, max(0, p[0] + DIRS[d][0]))
+                p[1] = min(size - 1, max(0, p[1] + DIRS[d][1]))
+                sim.player_at(i, (p[0], p[1], 0))
+        sim.tick()
+    elapsed = time.perf_counter() - t0
+    awake = n if mode == "all" else sum(len(sim.chunks.get(k, ())) for k in sim.interest)
+    wakes.sort()
+    wake_ms = (1000 * wakes[len(wakes) // 2], 1000 * wakes[-1]) if wakes else (0.0, 0.0)
+    return ticks / elapsed, (sim.steps - steps0) / ticks, awake, wake_ms
+
+
+def main():
+    ap = argparse.ArgumentParser(description="creature tick benchmark")
+    ap.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000, 300000])
+    ap.add_argument("--size", type=int, default=2048, help="world is size x size rooms")
+    ap.add_argument("--players", type=int, default=50)
+    ap.add_argument("--player-every", type=int, default=4, help="ticks between player steps")
+    ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--seconds", type=float, default=10, help="cut a run short after this long")
+    ap.add_argument("--warmup", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{args.size}x{args.size} rooms, {args.players} players, creatures step every 8 ticks")
+    print(f"{'creatures':>10} {'mode':>5} {'awake':>8} {'steps/tick':>10} {'ticks/s':>10} "
+          f"{'wake p50 ms':>11} {'max ms':>7}")
+    for n in args.counts:
+        for mode in ("near", "all"):
+            tps, steps, awake, (w50, wmax) = run(mode, n, args)
+            wake = f"{w50:11.3f} {wmax:7.2f}" if mode == "near" else f"{'-':>11} {'-':>7}"
+            print(f"{n:10,d} {mode:>5} {awake:8,d} {steps:10,.1f} {tps:10,.1f} {wake}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
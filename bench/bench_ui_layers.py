@@ -0,0 +1,129 @@
+"""Map builder draw calls per frame, with and without the cached UI layers.
+
+    python bench/bench_ui_layers.py
+    python bench/bench_ui_layers.py --frames 600
+
+Runs game.py's map builder under SDL's dummy video driver (COG_REDRAW=always,
+so every loop iteration draws a frame) in a temporary copy of the repo, with
+the mouse sweeping around the compass. It counts pygame.draw.* calls made
+while drawing each frame, and the CPU time per frame.
+
+"uncached" repaints every layer each time LAYERS.get() is asked for it,
+which is what the widgets did before they had static layers.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+W, H = 1280, 800
+
+
+def child(mode, frames):
+    import runpy
+    import pygame
+    sys.path.insert(0, os.getcwd())
+    import ui_layers
+
+    class _Info:
+        current_w, current_h = W, H
+    pygame.display.Info = lambda: _Info()
+
+    if mode == "uncached":
+        def repaint(self, key, size, paint):
+            surf = pygame.Surface(size, pygame.SRCALPHA)
+            paint(surf)
+            self.builds += 1
+            return surf
+        ui_layers.LayerCache.get = repaint
+
+    calls = [0]
+    for name in ("rect", "circle", "line", "lines", "polygon", "ellipse", "arc"):
+        real = getattr(pygame.draw, name)
+
+        def counted(*a, _real=real, **k):
+            calls[0] += 1
+            return _real(*a, **k)
+        setattr(pygame.draw, name, counted)
+
+    state = {"frame": 0, "calls": 0, "cpu": 0.0, "t0": time.process_time()}
+    warmup = 5
+
+    def mouse_pos():
+        i = state["frame"]
+        if i == 0:
+            return (W // 2, H // 2 + 80)  # "Map Builder"
+        a = i * 0.2
+        return (W // 2 + 120 + int(140 * math.cos(a)), H // 2 + 40 - int(140 * math.sin(a)))
+
+    pygame.mouse.get_pos = mouse_pos
+    pygame.mouse.get_pressed = lambda *a: (state["frame"] == 0, False, False)
+
+    real_get = pygame.event.get
+
+    def get(*a, **k):
+        real_get()
+        if state["frame"] >= frames + warmup:
+            return [pygame.event.Event(pygame.QUIT)]
+        calls[0] = 0
+        state["t0"] = time.process_time()
+        return []
+    pygame.event.get = get
+
+    def flip(*a):
+        if state["frame"] >= warmup:
+            state["calls"] += calls[0]
+            state["cpu"] += time.process_time() - state["t0"]
+        state["frame"] += 1
+    pygame.display.flip = flip
+
+    sys.argv = ["game.py"]
+    try:
+        runpy.run_path("game.py", run_name="__main__")
+    except SystemExit:
+        pass
+    print("RESULT " + json.dumps({"draw_calls": state["calls"] / frames,
+                                  "ms_per_frame": 1000 * state["cpu"] / frames}), flush=True)
+
+
+def run(mode, frames):
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in os.listdir(ROOT):
+            src = os.path.join(ROOT, name)
+            if name.endswith(".py"):
+                shutil.copy(src, tmp)
+            elif name == "world_tiles":
+                shutil.copytree(src, os.path.join(tmp, name))
+        env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+                   COG_REDRAW="always", PYGAME_HIDE_SUPPORT_PROMPT="1")
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                              "--frames", str(frames)],
+                             cwd=tmp, env=env, capture_output=True, text=True, timeout=300)
+    for line in out.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[7:])
+    raise RuntimeError(f"{mode} gave no result:\n{out.stderr[-2000:]}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="map builder UI layer benchmark")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--child")
+    args = ap.parse_args()
+    if args.child:
+        return child(args.child, args.frames)
+
+    print(f"{'mode':<9} {'draw calls/frame':>17} {'ms/frame':>9}")
+    for mode in ("uncached", "cached"):
+        r = run(mode, args.frames)
+        print(f"{mode:<9} {r['draw_calls']:17.1f} {r['ms_per_frame']:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""worldgen.py: rooms made up one at a time, and whole regions written out.
+
+    python bench/bench_worldgen.py                           # 1000 x 1000, packed
+    python bench/bench_worldgen.py --size 300 --layout folder --jobs 1 2 4
+
+First Generator.tile() is timed room by room, the way the engine makes
+rooms as players walk in. Then a --size x --size region is generated
+into a temporary world in the --layout picked, once for each --jobs (a
+fresh world each time), reporting rooms/sec. The last world is checked:
+a second run over the same box must add nothing, and a sample of its
+tiles must be what tile() gives room by room.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world_store import open_world  # noqa: E402
+from worldgen import Generator, generate_region  # noqa: E402
+
+LAYOUTS = {"packed": "world.cogw", "folder": "world_tiles", "regions": "world.regions"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="world generator benchmark")
+    ap.add_argument("--size", type=int, default=1000, help="region is size x size spots")
+    ap.add_argument("--layout", choices=LAYOUTS, default="packed")
+    ap.add_argument("--jobs", type=int, nargs="+", default=[os.cpu_count()])
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    gen = Generator(args.seed)
+    t0 = time.perf_counter()
+    n = 0
+    for y in range(100):
+        for x in range(100):
+            gen.tile(x, y, 0)
+            n += 1
+    took = time.perf_counter() - t0
+    print(f"one at a time: {n / took:,.0f} rooms/s ({1e6 * took / n:.0f} us each)")
+
+    half = args.size // 2
+    box = (-half, -half, args.size - half - 1, args.size - half - 1)
+    for jobs in args.jobs:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, LAYOUTS[args.layout])
+            with open_world(path) as store:
+                t0 = time.perf_counter()
+                made = generate_region(store, Generator(args.seed), *box, jobs=jobs)
+                took = time.perf_counter() - t0
+                print(f"  {jobs} processes: {len(made):,} rooms in {args.size ** 2:,} spots "
+                      f"in {took:.1f}s ({len(made) / took:,.0f} rooms/s)")
+                if jobs != args.jobs[-1]:
+                    continue
+                again = generate_region(store, Generator(args.seed), *box, jobs=jobs)
+                sample = random.Random(args.seed).sample([(x, y) for x, y, _ in made], min(2000, len(made)))
+                fresh = Generator(args.seed)
+                differ = sum(store.get(x, y, 0) != fresh.tile(x, y, 0) for x, y in sample)
+                print(f"  second run: {len(again)} new rooms; "
+                      f"{differ} of {len(sample)} sampled tiles differ from tile()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+"""The game itself, without a screen: rooms, movement, items and commands.
+
+game-main.py used to keep all of this in module globals next to its pygame
+loop. Here it is split in two:
+
+  World    what every player shares - the tile store, the room cache in
+           front of it, the pickup overlays and the neighbour prefetcher
+  Session  one player - position, health, inventory, the room they're in
+
+Session.handle("get coin from trunk") returns the lines to show the player.
+Nothing here imports pygame: game-main.py is a frontend that draws those
+lines, and bench/bench_engine.py drives sessions directly.
+
+Given an exit_graph.ExitGraph (or a GraphLoader still working on one),
+"goto x y z" walks the whole way there and "path to x y z" just tells you
+the way. A long search can take a while, so a server can look the route
+up on another thread instead: goto_request() says what to search for, and
+handle(cmd, route) takes the answer.
+
+Given a worldgen.Generator, a room that isn't in the store is made up when
+someone asks for it and saved; the same seed always makes the same room.
+
+With creatures=True the World also runs a ticks.Simulation: whoever owns
+the world calls world.sim.tick() on a clock and sets world.sim.on_move to
+hear about creatures wandering past players (creature_news() words it).
+
+Persistence stays with whoever owns the session: on_event(event) is called
+for every change worth saving ({"t": "move", ...}, {"t": "pickup", ...}),
+and to_data()/load_data() convert to and from the player file's schema.
+"""
+from datetime import datetime
+
+from world_store import clone_json
+from room_cache import RoomCache
+from prefetch import NeighbourPrefetcher
+from overlays import OverlayStore
+from item_index import ItemIndex
+from ticks import Simulation
+
+DIRS = {
+    "n":  (0,  1, 0),
+    "ne": (1,  1, 0),
+    "e":  (1,  0, 0),
+    "se": (1, -1, 0),
+    "s":  (0, -1, 0),
+    "sw": (-1,-1, 0),
+    "w":  (-1, 0, 0),
+    "nw": (-1, 1, 0),
+}
+EXIT_KEYS = ["n", "ne", "e", "se", "s", "sw", "w", "nw"]
+LONG_DIRS = {"north": "n", "northeast": "ne", "east": "e", "southeast": "se",
+             "south": "s", "southwest": "sw", "west": "w", "northwest": "nw"}
+DIR_NAMES = {d: long for long, d in LONG_DIRS.items()}
+OPPOSITE = {d: next(o for o, v in DIRS.items() if v == tuple(-c for c in dv))
+            for d, dv in DIRS.items()}
+GOTO_WORDS = ["goto", "path", "route"]
+SEARCH = object()  # handle(cmd, route=SEARCH): look the route up ourselves
+
+WELCOME = [
+    "Welcome to Cog World.",
+    "Type 'look' to inspect the room.",
+    "Type n/s/e/w/ne/nw/se/sw to move.",
+    "You can 'look trunk' to peek inside something.",
+    "Use 'get <item>' to pick something up.",
+    "'goto x y z' walks you to a room, 'path to x y z' shows the way.",
+]
+
+
+def new_player_data(name="Player One"):
+    return {
+        "name": name,
+        "stats": {"health": 100},
+        "position": {"x": 0, "y": 0, "z": 0},
+        "inventory": [],
+        "meta": {"last_save": None}
+    }
+
+
+def empty_room(description):
+    return {"description": description, "exits": {}, "items": [], "index": ItemIndex([])}
+
+
+def list_top_level_items(items_list):
+    lines = []
+    for it in items_list:
+        nm = it.get("name", "???")
+        ds = it.get("desc", "").strip()
+        if ds:
+            lines.append(f"- {nm}: {ds}")
+        else:
+            lines.append(f"- {nm}")
+    return lines
+
+
+def route_summary(route):
+    # ["n", "n", "n", "ne", "e", "e"] -> "3 n, ne, 2 e"
+    parts, i = [], 0
+    while i < len(route):
+        j = i
+        while j < len(route) and route[j] == route[i]:
+            j += 1
+        parts.append(route[i] if j - i == 1 else f"{j - i} {route[i]}")
+        i = j
+    return ", ".join(parts)
+
+
+def a_or_an(name):
+    return ("an " if name[:1].lower() in "aeiou" else "a ") + name
+
+
+def creature_news(creature, old, new, direction):
+    """{room: line} for a creature's step, as seen from either end."""
+    return {
+        old: f"The {creature.name} leaves {DIR_NAMES.get(direction, 'somewhere')}.",
+        new: f"{a_or_an(creature.name).capitalize()} arrives from the "
+             f"{DIR_NAMES.get(OPPOSITE.get(direction), 'somewhere')}.",
+    }
+
+
+class World:
+    def __init__(self, store, cache=None, overlays=None, prefetch_hops=1, creatures=False,
+                 graph=None, generator=None, path_max_nodes=None):
+        self.store = store
+        self.graph = graph  # exit_graph.ExitGraph, for goto / path to
+        self.path_max_nodes = path_max_nodes  # None: the graph's own limit
+        self.graph_holds = 0  # searches running on other threads
+        self.held_rooms = []  # graph updates waiting for them to finish
+        self.generator = generator  # worldgen.Generator, for rooms nobody has built
+        self.generated = 0
+        self.cache = cache if cache is not None else RoomCache(store)
+        self.overlays = overlays if overlays is not None else OverlayStore()
+        self.prefetch = (NeighbourPrefetcher(self.cache, DIRS, hops=prefetch_hops)
+                         if prefetch_hops else None)
+        self.sim = Simulation(self.exits_of, DIRS, spawns_in=self.spawns_in) if creatures else None
+
+    def start(self):
+        if self.prefetch is not None:
+            self.prefetch.start()
+
+    def close(self):
+        if self.prefetch is not None:
+            self.prefetch.stop()
+        if self.generated and self.graph is not None and self.graph.file:
+            try:
+                self.store.flush()
+                self.graph.save(store=self.store)
+            except OSError:
+                pass  # read-only world: open_graph rebuilds it next time
+
+    def generate_room(self, x, y, z):
+        """Make up and save the room at (x, y, z); returns the tile."""
+        tile = self.generator.tile(x, y, z, self.cache.warm)
+        self.store.put(x, y, z, tile)  # not flushed: the same seed makes it again anyway
+        if self.graph_holds:
+            self.held_rooms.append((x, y, z, tile["exits"]))
+        elif self.graph is not None:
+            self.graph.update(x, y, z, tile["exits"])
+        if self.sim is not None:
+            self.sim.room_changed(x, y, z)
+        self.generated += 1
+        return clone_json(tile)
+
+    def load_room(self, x, y, z):
+        """A room dict for (x, y, z): description, exits, items (+ their index)."""
+        try:
+            data = self.cache.get(x, y, z)
+            if data is None and self.generator is not None:
+                data = self.generate_room(x, y, z)
+            if data is None:
+                return empty_room("(This room does not exist yet.)")
+
+            raw_exits = data.get("exits", {})
+            exits_clean = {d: bool(raw_exits.get(d, False)) for d in EXIT_KEYS}
+            desc = data.get("description", "").strip()
+            its = data.get("items", [])
+            if not isinstance(its, list):
+                its = []
+            self.overlays.apply(x, y, z, its)
+
+            return {"description": desc, "exits": exits_clean, "items": its, "index": ItemIndex(its)}
+        except Exception as e:
+            return empty_room(f"(Error loading room: {e})")
+
+    def room_entered(self, x, y, z, exits, player=None):
+        if self.prefetch is not None:
+            self.prefetch.room_entered(x, y, z, exits)
+        if self.sim is not None and player is not None:
+            self.sim.player_at(player, (x, y, z))
+
+    def path(self, start, goal):
+        """Exit keys from start to goal, or None (also when there's no graph)."""
+        if self.graph is None:
+            return None
+        if self.path_max_nodes is None:
+            return self.graph.path(start, goal)
+        return self.graph.path(start, goal, self.path_max_nodes)
+
+    def hold_graph(self):
+        """Keep generated rooms out of the graph until release_graph(), so
+        path() can run on another thread meanwhile."""
+        self.graph_holds += 1
+
+    def release_graph(self):
+        self.graph_holds -= 1
+        if not self.graph_holds:
+            for x, y, z, exits in self.held_rooms:
+                self.graph.update(x, y, z, exits)
+            self.held_rooms.clear()
+
+    def player_left(self, player):
+        if self.sim is not None:
+            self.sim.player_left(player)
+
+    # --- for the creature simulation ---
+
+    def exits_of(self, x, y, z):
+        exits = self.cache.warm(x, y, z)
+        if exits is None:
+            return None
+        # only exits that lead somewhere; creatures don't wander off the map
+        return [d for d in EXIT_KEYS
+                if exits.get(d) and self.store.exists(*(c + dc for c, dc in zip((x, y, z), DIRS[d])))]
+
+    def spawns_in(self, key):
+        # creatures listed in the tiles of one chunk
+        sx, sy, sz = self.sim.chunk
+        kx, ky, kz = key
+        box = (kx * sx, kx * sx + sx - 1, ky * sy, ky * sy + sy - 1, kz * sz, kz * sz + sz - 1)
+        found = []
+        for coords, tile in self.store.rooms_in_box(*box):
+            for spec in tile.get("creatures", None) or []:
+                if isinstance(spec, dict):
+                    found.append((coords, spec))
+        return found
+
+    def creatures_at(self, x, y, z):
+        return self.sim.creatures_at(x, y, z) if self.sim is not None else []
+
+
+class Session:
+    def __init__(self, world, data=None, on_event=None):
+        self.world = world
+        self.on_event = on_event  # on_event(event) for every change worth saving
+        self.name = "Player One"
+        self.x = self.y = self.z = 0
+        self.health = 100
+        self.inventory = []
+        self.inventory_index = ItemIndex(self.inventory)
+        self.room = empty_room("You are nowhere. (Room failed to load.)")
+        self.done = False  # set by quit/exit
+        self.out = []
+        if data is not None:
+            self.load_data(data)
+
+    # --- player file ---
+
+    def load_data(self, data):
+        self.name = data.get("name", self.name)
+        pos = data.get("position", {})
+        self.x = pos.get("x", 0)
+        self.y = pos.get("y", 0)
+        self.z = pos.get("z", 0)
+        self.health = data.get("stats", {}).get("health", 100)
+        self.inventory[:] = clone_json(data.get("inventory", []))
+        self.inventory_index = ItemIndex(self.inventory)
+
+    def to_data(self):
+        # a copy, so later edits don't leak into a queued save
+        return {
+            "name": self.name,
+            "stats": {"health": self.health},
+            "position": {"x": self.x, "y": self.y, "z": self.z},
+            "inventory": clone_json(self.inventory),
+            "meta": {"last_save": datetime.utcnow().isoformat() + "Z"}
+        }
+
+    # --- output ---
+
+    def say(self, line):
+        self.out.append(line)
+
+    def take_output(self):
+        out, self.out = self.out, []
+        return out
+
+    def record(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # --- rooms ---
+
+    def enter(self):
+        """Load the room at the session's position and describe it."""
+        self.room = self.world.load_room(self.x, self.y, self.z)
+        self.world.room_entered(self.x, self.y, self.z, self.room["exits"], self)
+        self.describe_room()
+        return self.take_output()
+
+    def reload_room(self):
+        # someone else changed the room (took an item); re-read it quietly
+        self.room = self.world.load_room(self.x, self.y, self.z)
+
+    def describe_room(self):
+        room = self.room
+        if room["description"]:
+            for line in room["description"].split("\n"):
+                self.say(line)
+        open_exits = [d for d, ok in room["exits"].items() if ok]
+        if open_exits:
+            self.say("Exits: " + ", ".join(open_exits))
+        else:
+            self.say("There are no visible exits.")
+        if room["items"]:
+            self.say("You see:")
+            for line in list_top_level_items(room["items"]):
+                self.say(line)
+        else:
+            self.say("You see nothing of interest.")
+        for c in self.world.creatures_at(self.x, self.y, self.z):
+            self.say(f"{a_or_an(c.name).capitalize()} is here.")
+
+    def try_move(self, direction):
+        direction = direction.lower()
+        if direction not in DIRS:
+            self.say(f"You can't go '{direction}'.")
+            return
+        if not self.room["exits"].get(direction, False):
+            self.say("You can't go that way.")
+            return
+        dx, dy, dz = DIRS[direction]
+        self.x += dx
+        self.y += dy
+        self.z += dz
+        self.room = self.world.load_room(self.x, self.y, self.z)
+        self.world.room_entered(self.x, self.y, self.z, self.room["exits"], self)
+        self.say(f"You move {direction}.")
+        self.describe_room()
+        self.record({"t": "move", "x": self.x, "y": self.y, "z": self.z})
+
+    def goto_goal(self, tokens):
+        nums = [t for t in tokens[1:] if t != "to"]
+        try:
+            goal = tuple(int(t) for t in nums)
+        except ValueError:
+            return None
+        return goal if len(goal) == 3 else None
+
+    def goto_request(self, cmd):
+        """(start, goal) if cmd is a goto or path that needs a search, else None."""
+        tokens = cmd.lower().split()
+        graph = self.world.graph
+        if not tokens or tokens[0] not in GOTO_WORDS or graph is None or not graph.ready:
+            return None
+        goal = self.goto_goal(tokens)
+        return ((self.x, self.y, self.z), goal) if goal is not None else None
+
+    def handle_goto(self, tokens, walk, route=SEARCH):
+        goal = self.goto_goal(tokens)
+        if goal is None:
+            self.say(f"Usage: {tokens[0]} x y z")
+            return
+        if self.world.graph is None:
+            self.say("Nobody has mapped this world.")
+            return
+        if not self.world.graph.ready:
+            if self.world.graph.error is not None:
+                self.say(f"The map of this world couldn't be made: {self.world.graph.error}")
+            else:
+                self.say("Still mapping this world; try again in a moment.")
+            return
+        where = f"({goal[0]},{goal[1]},{goal[2]})"
+        if route is SEARCH:
+            route = self.world.path((self.x, self.y, self.z), goal)
+        if route is None:
+            self.say(f"You can't find a way to {where}.")
+            return
+        if not route:
+            self.say("You are already there.")
+            return
+        if not walk:
+            self.say(f"{where} is {len(route)} room{'s' * (len(route) != 1)} away: "
+                     f"{route_summary(route)}.")
+            return
+        walked = 0
+        for d in route:
+            # the graph may be behind the tiles; trust the room you're in
+            exits = self.world.cache.warm(self.x, self.y, self.z) or {}
+            if not exits.get(d):
+                self.say(f"The way {DIR_NAMES[d]} is blocked.")
+                break
+            dx, dy, dz = DIRS[d]
+            self.x += dx
+            self.y += dy
+            self.z += dz
+            walked += 1
+        if walked == 0:
+            return
+        self.room = self.world.load_room(self.x, self.y, self.z)
+        self.world.room_entered(self.x, self.y, self.z, self.room["exits"], self)
+        if walked == len(route):
+            self.say(f"You walk {walked} room{'s' * (walked != 1)} to {where}.")
+        else:
+            self.say(f"You walk {walked} of the {len(route)} rooms to {where}.")
+        self.describe_room()
+        self.record({"t": "move", "x": self.x, "y": self.y, "z": self.z})
+
+    # --- items ---
+
+    def resolve_item(self, index, tokens):
+        # "get ring", "look ring in old rock", "get coin from trunk"
+        target_name = " ".join(tokens[1:])
+        node, candidates = index.resolve(target_name)
+        if node is None and not candidates:
+            for i in range(len(tokens) - 2, 1, -1):
+                if tokens[i] in ("in", "from", "inside"):
+                    target_name = " ".join(tokens[1:i])
+                    node, candidates = index.resolve(target_name, inside=" ".join(tokens[i+1:]))
+                    break
+        if candidates:
+            where = ", ".join(f"the one {n.where()}" for n in candidates)
+            self.say(f"Which {target_name} do you mean: {where}?")
+        return node, candidates, target_name
+
+    def describe_container(self, item):
+        nm = item.get("name", "something")
+        ds = item.get("desc", "").strip()
+        if ds:
+            self.say(f"{nm}: {ds}")
+        kids = item.get("contains", [])
+        if kids and isinstance(kids, list) and len(kids) > 0:
+            self.say(f"Inside {nm}:")
+            for child in kids:
+                self.say(f"- {child.get('name','???')}: {child.get('desc','').strip()}")
+        else:
+            self.say(f"{nm} is empty.")
+
+    def handle_get(self, tokens):
+        if len(tokens) < 2:
+            self.say("Get what?")
+            return
+        index = self.room["index"]
+        node, candidates, target_name = self.resolve_item(index, tokens)
+        if candidates:
+            return
+        if node is None:
+            self.say(f"You can't find '{target_name}' here.")
+            return
+        item_path = index.item_path(node)
+        room_size = len(index.items)
+        got_item = index.remove(node)
+        try:
+            self.world.overlays.record_removed(self.x, self.y, self.z, item_path, room_size)
+        except Exception as e:
+            self.say(f"Error saving room change: {e}")
+        self.inventory_index.add(got_item)
+        self.say(f"You pick up the {got_item.get('name', target_name)}.")
+        self.record({"t": "pickup", "item": got_item, "room": [self.x, self.y, self.z]})
+
+    def handle_look(self, tokens):
+        if len(tokens) == 1:
+            self.describe_room()
+            return
+        node, candidates, target_name = self.resolve_item(self.room["index"], tokens)
+        if node is None and not candidates:
+            node, candidates, target_name = self.resolve_item(self.inventory_index, tokens)
+        if candidates:
+            return
+        if node is None:
+            for c in self.world.creatures_at(self.x, self.y, self.z):
+                if c.name.lower() == target_name:
+                    self.say(f"{c.name}: {c.desc or 'It ignores you.'}")
+                    return
+            self.say(f"You don't see '{target_name}' here.")
+            return
+        self.describe_container(node.item)
+
+    def handle_inventory(self):
+        if self.inventory:
+            self.say("You are carrying:")
+            for line in list_top_level_items(self.inventory):
+                self.say(line)
+        else:
+            self.say("You carry nothing.")
+
+    # --- commands ---
+
+    def handle(self, cmd, route=SEARCH):
+        """Run one command; returns the lines it printed.
+
+        For a goto or path, `route` is what world.path() gave for
+        goto_request(cmd), if the caller already looked it up."""
+        cmd = cmd.strip()
+        if cmd == "":
+            return []
+        tokens = cmd.lower().split()
+        if cmd.lower() in ["quit", "exit"]:
+            self.say("Game saved. Goodbye.")
+            self.done = True
+        elif cmd.lower() in ["inventory", "inv", "i"]:
+            self.handle_inventory()
+        elif tokens[0] in ["look", "l"]:
+            self.handle_look(tokens)
+        elif tokens[0] in ["get", "take", "grab"]:
+            self.handle_get(tokens)
+        elif tokens[0] == "goto":
+            self.handle_goto(tokens, walk=True, route=route)
+        elif tokens[0] in GOTO_WORDS:
+            self.handle_goto(tokens, walk=False, route=route)
+        elif cmd.lower() in DIRS:
+            self.try_move(cmd.lower())
+        elif (len(tokens) >= 2 and tokens[0] in ["go", "move", "walk"]
+              and LONG_DIRS.get(tokens[1], tokens[1]) in DIRS):
+            self.try_move(LONG_DIRS.get(tokens[1], tokens[1]))
+        else:
+            self.say(f"You can't '{cmd}'.")
+        return self.take_output()
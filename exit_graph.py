@@ -0,0 +1,701 @@
+"""How the whole world is connected: every room's exits, and paths through them.
+
+    graph = open_graph(store)                  # world_tiles.exits, or built from the tiles
+    graph.path((0, 0, 0), (412, -37, 0))       # ["n", "n", "ne", ...] or None
+    graph.update(x, y, z, tile["exits"])       # after saving a tile
+    graph.save(store=store)
+    loader = GraphLoader(store)                # open_graph() on a thread; loader.ready when done
+
+Rooms are kept per 16x16 patch of one level, in an array with one 16-bit
+cell per position: 0 for no room, otherwise 0x100 | the exit mask
+(room_model.EXIT_BIT). That is 2 bytes a room for a built-up world, so a
+million rooms take a few MB instead of a dict of dicts each.
+
+Long paths are found in two passes:
+
+  1. Inside each chunk, rooms joined by exits (either way round) form
+     components. Those are the nodes of a small graph, linked wherever an
+     exit crosses into another chunk. A* over it gives a corridor of
+     components, and it knows straight away when the goal can't be reached.
+  2. A* over the actual rooms, but only inside that corridor.
+
+So a path across the map touches a few thousand rooms rather than
+everything in reach of the start. The shortest path through the corridor
+isn't always the shortest there is, though: in a maze, and with one-way
+exits most of all, it can wind about for dozens of extra steps, or lead
+nowhere. Nothing is shorter than the straight-line distance, so a route
+within DETOUR_SLACK steps of that is kept as it is; otherwise A* runs
+again over the whole world, looking only for routes more than
+DETOUR_SLACK steps shorter. So what you get is at most DETOUR_SLACK steps
+longer than the very shortest path, unless making sure of that takes more
+than max_nodes rooms of searching, in which case you get the corridor's.
+Open ground gets the quick answer; long ways through a maze cost about
+what a plain A* would.
+
+The graph is saved next to the world (world_tiles.exits, world.cogw.exits)
+with the world's fingerprint (world_store's fingerprint()) from when it was
+last in step with the tiles, and rebuilt from the tiles if that file is
+missing or the world has changed since, by hand or by any other program.
+To rebuild it yourself:
+
+    python exit_graph.py build [world]
+    python exit_graph.py path 0 0 0 12 30 0 [--world world.cogw]
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import heapq
+import argparse
+import threading
+from array import array
+
+from world_store import open_world
+from room_model import EXIT_ORDER, EXIT_BIT, EXIT_STEP, exits_to_mask
+from saver import write_atomic
+
+MAGIC = b"COGX1\n"
+GRAPH_CHUNK = (16, 16, 1)  # flatter than world_store's chunks: most worlds are one level
+PRESENT = 0x100
+STEPS = [(EXIT_BIT[d], EXIT_STEP[d], d) for d in EXIT_ORDER]
+MAX_NODES = 200000  # rooms one search may expand before it gives up
+LEG = 6             # components per leg when following a corridor
+DETOUR_SLACK = 2    # steps longer than the shortest path that path() may give
+
+
+def graph_path_for(store):
+    return os.path.abspath(store.path).rstrip("/\\") + ".exits"
+
+
+def chebyshev(a, b):
+    # diagonal steps count as one, same as the exits do
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]), abs(a[2] - b[2]))
+
+
+class ExitGraph:
+    ready = True  # see GraphLoader
+    error = None
+
+    def __init__(self, chunk=GRAPH_CHUNK, file=None):
+        self.chunk = tuple(chunk)
+        self.file = file  # where save() writes
+        sx, sy, sz = self.chunk
+        self.cells = sx * sy * sz
+        self.masks = {}   # chunk key -> array("H"): 0, or PRESENT | exit mask
+        self.comps = {}   # chunk key -> array("H"): component of each room, from 1
+        self.ncomps = {}  # chunk key -> how many components it has
+        self.links = {}   # (kx, ky, kz, comp) -> {node: cost}, one way like the exits
+        self.reps = {}    # node -> one of its rooms, for distances
+        self.rooms = 0
+        self.world = None  # the store's fingerprint() when this was in step with it
+        self.local = [(i % sx, i // sx % sy, i // (sx * sy)) for i in range(self.cells)]
+        # local neighbour of each cell through each exit, -1 if it's in another chunk
+        self.inner = []
+        for _, (dx, dy, dz), _ in STEPS:
+            table = array("i", [-1]) * self.cells
+            for i in range(self.cells):
+                lx, ly, lz = i % sx, i // sx % sy, i // (sx * sy)
+                nx, ny, nz = lx + dx, ly + dy, lz + dz
+                if 0 <= nx < sx and 0 <= ny < sy and 0 <= nz < sz:
+                    table[i] = nx + sx * (ny + sy * nz)
+            self.inner.append(table)
+
+    # --- rooms ---
+
+    def _locate(self, x, y, z):
+        sx, sy, sz = self.chunk
+        kx, ky, kz = x // sx, y // sy, z // sz
+        return (kx, ky, kz), (x - kx * sx) + sx * ((y - ky * sy) + sy * (z - kz * sz))
+
+    def _coords(self, key, i):
+        sx, sy, sz = self.chunk
+        return (key[0] * sx + i % sx, key[1] * sy + i // sx % sy, key[2] * sz + i // (sx * sy))
+
+    def __len__(self):
+        return self.rooms
+
+    def __contains__(self, coords):
+        key, i = self._locate(*coords)
+        arr = self.masks.get(key)
+        return arr is not None and arr[i] != 0
+
+    def exits(self, x, y, z):
+        """Open exit keys of (x, y, z), or None if there's no room there."""
+        key, i = self._locate(x, y, z)
+        arr = self.masks.get(key)
+        if arr is None or not arr[i]:
+            return None
+        return [d for bit, _, d in STEPS if arr[i] & bit]
+
+    def mask(self, x, y, z):
+        """Exit mask of (x, y, z) (room_model.EXIT_BIT), or None if there's no room there."""
+        key, i = self._locate(x, y, z)
+        arr = self.masks.get(key)
+        if arr is None or not arr[i]:
+            return None
+        return arr[i] & 0xFF
+
+    def set_room(self, x, y, z, exits):
+        """Record a room's exits (None: no room) without relinking; see update().
+
+        `exits` is a tile's exits dict, or already an exit mask.
+        """
+        key, i = self._locate(x, y, z)
+        arr = self.masks.get(key)
+        if arr is None:
+            if exits is None:
+                return key
+            arr = self.masks[key] = array("H", bytes(2 * self.cells))
+        had = arr[i] != 0
+        if exits is not None and not isinstance(exits, int):
+            exits = exits_to_mask(exits)
+        arr[i] = 0 if exits is None else PRESENT | exits
+        self.rooms += (exits is not None) - had
+        if exits is None and not any(arr):
+            del self.masks[key]
+        return key
+
+    def update(self, x, y, z, exits):
+        """A tile was saved (exits dict) or deleted (None): fix up the graph."""
+        key = self.set_room(x, y, z, exits)
+        self._label(key)
+        # links into this chunk name its components, which may have been renumbered
+        for k in self._around(key):
+            self._link(k)
+
+    def _around(self, key):
+        kx, ky, kz = key
+        reach = {tuple(0 if v == 0 else (1 if v > 0 else -1) for v in step) for _, step, _ in STEPS}
+        out = {key}
+        for ax, ay, az in reach:
+            for ox in {0, ax}:
+                for oy in {0, ay}:
+                    for oz in {0, az}:
+                        out.add((kx + ox, ky + oy, kz + oz))
+        return out
+
+    def unmatched(self):
+        """Exits with no way back: ((x, y, z), exit key, the room's mask there or None).
+
+        None means the exit leads to no room at all.
+        """
+        for key, arr in self.masks.items():
+            rooms = [i for i, v in enumerate(arr) if v & 0xFF]
+            for b, (bit, _, d) in enumerate(STEPS):
+                table = self.inner[b]
+                back = STEPS[b ^ 4][0]  # EXIT_ORDER goes round the compass
+                for i in rooms:
+                    if not arr[i] & bit:
+                        continue
+                    j = table[i]
+                    if j >= 0:
+                        w = arr[j]
+                    else:
+                        tkey, j = self._step(key, i, b)
+                        tarr = self.masks.get(tkey)
+                        w = tarr[j] if tarr is not None else 0
+                    if not w & back:
+                        yield self._coords(key, i), d, (w & 0xFF if w else None)
+
+    def islands(self, start):
+        """Rooms that can't be reached from `start`, in groups that hang together.
+
+        Reaching follows exits the way they point; the groups join rooms by
+        exits either way round. Returns [(rooms in it, one of them), ...],
+        biggest first, or None if there's no room at `start`.
+        """
+        key, i = self._locate(*start)
+        if key not in self.masks or not self.masks[key][i]:
+            return None
+        seen = {k: bytearray(self.cells) for k in self.masks}
+        seen[key][i] = 1
+        todo = [(key, i)]
+        inner = self.inner
+        while todo:
+            key, i = todo.pop()
+            arr, marks = self.masks[key], seen[key]
+            v = arr[i]
+            for b, (bit, _, _) in enumerate(STEPS):
+                if not v & bit:
+                    continue
+                j = inner[b][i]
+                if j >= 0:
+                    if arr[j] and not marks[j]:
+                        marks[j] = 1
+                        todo.append((key, j))
+                    continue
+                nkey, j = self._step(key, i, b)
+                other = seen.get(nkey)
+                if other is not None and not other[j] and self.masks[nkey][j]:
+                    other[j] = 1
+                    todo.append((nkey, j))
+        out = []
+        for key, arr in self.masks.items():
+            marks = seen[key]
+            for i, v in enumerate(arr):
+                if v and not marks[i]:
+                    out.append((self._flood(seen, key, i), self._coords(key, i)))
+        out.sort(key=lambda isle: -isle[0])
+        return out
+
+    def _step(self, key, i, b):
+        # the cell through exit number b, possibly in the next chunk
+        j = self.inner[b][i]
+        if j >= 0:
+            return key, j
+        x, y, z = self._coords(key, i)
+        dx, dy, dz = STEPS[b][1]
+        return self._locate(x + dx, y + dy, z + dz)
+
+    def _flood(self, seen, key, i):
+        # mark everything joined to (key, i) that nothing reached yet; returns how many
+        seen[key][i] = 2
+        todo = [(key, i)]
+        n = 0
+        while todo:
+            key, i = todo.pop()
+            n += 1
+            v = self.masks[key][i]
+            for b, (bit, _, _) in enumerate(STEPS):
+                nkey, j = self._step(key, i, b)
+                marks = seen.get(nkey)
+                if marks is None or marks[j]:
+                    continue
+                w = self.masks[nkey][j]
+                if w and (v & bit or w & STEPS[b ^ 4][0]):
+                    marks[j] = 2
+                    todo.append((nkey, j))
+        return n
+
+    # --- the chunk level ---
+
+    def build(self, keys=None):
+        """Work out components and links for these chunks (all of them by default)."""
+        keys = list(self.masks) if keys is None else list(keys)
+        for key in keys:
+            self._label(key)
+        for key in keys:
+            self._link(key)
+
+    def _drop_nodes(self, key):
+        for c in range(1, self.ncomps.pop(key, 0) + 1):
+            self.links.pop(key + (c,), None)
+            self.reps.pop(key + (c,), None)
+
+    def _label(self, key):
+        # components by union-find, ignoring which way an exit points
+        self._drop_nodes(key)
+        arr = self.masks.get(key)
+        if arr is None:
+            self.comps.pop(key, None)
+            return
+        parent = list(range(self.cells))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        rooms = [i for i, v in enumerate(arr) if v]
+        for b, (bit, _, _) in enumerate(STEPS):
+            table = self.inner[b]
+            for i in rooms:
+                if arr[i] & bit:
+                    j = table[i]
+                    if j >= 0 and arr[j]:
+                        ri, rj = find(i), find(j)
+                        if ri != rj:
+                            parent[ri] = rj
+        comps = array("H", bytes(2 * self.cells))
+        ids = {}
+        for i in rooms:
+            root = find(i)
+            c = ids.get(root)
+            if c is None:
+                c = ids[root] = len(ids) + 1
+                self.reps[key + (c,)] = self._coords(key, i)
+            comps[i] = c
+        self.comps[key] = comps
+        self.ncomps[key] = len(ids)
+
+    def _link(self, key):
+        arr = self.masks.get(key)
+        if arr is None:
+            return
+        comps = self.comps[key]
+        for c in range(1, self.ncomps[key] + 1):
+            self.links[key + (c,)] = {}
+        rooms = [i for i, v in enumerate(arr) if v]
+        for b, (bit, (dx, dy, dz), _) in enumerate(STEPS):
+            table = self.inner[b]
+            for i in rooms:
+                if arr[i] & bit and table[i] < 0:
+                    x, y, z = self._coords(key, i)
+                    tkey, ti = self._locate(x + dx, y + dy, z + dz)
+                    tarr = self.masks.get(tkey)
+                    if tarr is None or not tarr[ti]:
+                        continue  # an exit into nothing
+                    src, dst = key + (comps[i],), tkey + (self.comps[tkey][ti],)
+                    out = self.links[src]
+                    if dst not in out:
+                        out[dst] = max(1, chebyshev(self.reps[src], self.reps[dst]))
+
+    def _node(self, coords):
+        key, i = self._locate(*coords)
+        return key + (self.comps[key][i],)
+
+    def corridor(self, start, goal):
+        """Components an A* over the chunk level passes through, in order; None if unreachable."""
+        first, last = self._node(start), self._node(goal)
+        best = {first: 0}
+        came = {first: None}
+        heap = [(chebyshev(start, goal), 0, first)]
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == last:
+                found = []
+                while node is not None:
+                    found.append(node)
+                    node = came[node]
+                found.reverse()
+                return found
+            if g > best[node]:
+                continue
+            for nxt, cost in self.links.get(node, {}).items():
+                ng = g + cost
+                if ng < best.get(nxt, ng + 1):
+                    best[nxt] = ng
+                    came[nxt] = node
+                    heapq.heappush(heap, (ng + chebyshev(self.reps[nxt], goal), ng, nxt))
+        return None
+
+    # --- paths ---
+
+    def path(self, start, goal, max_nodes=MAX_NODES):
+        """Exit keys that lead from start to goal: [] if they're the same room,
+        None if there is no way (or it's more than max_nodes rooms of searching).
+        At most DETOUR_SLACK steps longer than the shortest path, unless that
+        takes more than max_nodes rooms of searching to make sure of."""
+        start, goal = tuple(start), tuple(goal)
+        if start not in self or goal not in self:
+            return None
+        if start == goal:
+            return []
+        nodes = self.corridor(start, goal)
+        if nodes is None:
+            return None
+        # nothing is shorter than the straight line; if the corridor has led
+        # us further round than that, A* over the whole world either finds a
+        # route more than DETOUR_SLACK shorter or makes sure there isn't one
+        route = self._refine(start, goal, nodes, max_nodes)
+        if route is None or len(route) > chebyshev(start, goal) + DETOUR_SLACK:
+            shorter = None if route is None else len(route) - DETOUR_SLACK
+            route = self._search(start, goal, None, max_nodes, shorter=shorter) or route
+        return route
+
+    def _refine(self, start, goal, nodes, max_nodes):
+        # a few components at a time: each leg heads for the goal but stops
+        # as soon as it is LEG components further along, so the work grows
+        # with the length of the path, not with the detours in the corridor
+        route, cur, j = [], start, 0
+        while True:
+            t = min(j + LEG, len(nodes) - 1)
+            final = t == len(nodes) - 1
+            leg = self._search(cur, goal, nodes[j:t + 1], max_nodes, None if final else nodes[t])
+            if leg is None:
+                return None
+            route += leg
+            if final:
+                return route
+            for d in leg:
+                cur = tuple(c + dc for c, dc in zip(cur, EXIT_STEP[d]))
+            j = t
+
+    def _search(self, start, goal, corridor, max_nodes, until=None, shorter=None):
+        # A* from start to goal through the corridor components (None: anywhere);
+        # with `until`, done on reaching any room of that component instead;
+        # with `shorter`, None as soon as it's sure no route is shorter than that
+        # rooms are numbered chunk * cells + cell, chunks in the order the
+        # search reaches them; most steps stay inside a chunk and never need
+        # coordinates worked out
+        cells, inner, local = self.cells, self.inner, self.local
+        numbers, chunks = {}, []  # chunk key -> number; number -> what we need of it
+        allowed = None
+        if corridor is not None:
+            allowed = {}
+            for node in corridor:
+                allowed.setdefault(node[:3], set()).add(node[3])
+
+        def number(key):
+            n = numbers.get(key)
+            if n is None:
+                arr = self.masks.get(key)
+                ok = None if allowed is None else allowed.get(key, ())
+                if arr is None or ok == ():
+                    n = -1
+                else:
+                    sx, sy, sz = self.chunk
+                    n = len(chunks)
+                    chunks.append((key, arr, self.comps[key], ok,
+                                   (key[0] * sx, key[1] * sy, key[2] * sz)))
+                numbers[key] = n
+            return n
+
+        skey, si = self._locate(*start)
+        gkey, gi = self._locate(*goal)
+        first = number(skey) * cells + si
+        last = number(gkey) * cells + gi if number(gkey) >= 0 else -1
+        stop_chunk = number(until[:3]) if until is not None else -1
+        gx, gy, gz = goal
+        best = {first: 0}
+        came = {}
+        # ties go to the node furthest along, or an open floor has
+        # thousands of equally short paths to wade through
+        heap = [(chebyshev(start, goal), 0, first)]
+        expanded = 0
+        while heap:
+            f, neg, cur = heapq.heappop(heap)
+            if shorter is not None and f >= shorter:
+                return None
+            g = -neg
+            if cur == last or (cur // cells == stop_chunk and chunks[stop_chunk][2][cur % cells] == until[3]):
+                route = []
+                while cur != first:
+                    cur, d = came[cur]
+                    route.append(d)
+                route.reverse()
+                return route
+            if g > best[cur]:
+                continue
+            expanded += 1
+            if expanded > max_nodes:
+                return None
+            n, i = divmod(cur, cells)
+            key, arr, comps, ok, origin = chunks[n]
+            mask = arr[i]
+            ng = g + 1
+            for b, (bit, step, d) in enumerate(STEPS):
+                if not mask & bit:
+                    continue
+                j = inner[b][i]
+                if j >= 0:
+                    if not arr[j] or (ok is not None and comps[j] not in ok):
+                        continue
+                    nn, nchunk = n, chunks[n]
+                else:
+                    lx, ly, lz = local[i]
+                    nkey, j = self._locate(origin[0] + lx + step[0], origin[1] + ly + step[1],
+                                           origin[2] + lz + step[2])
+                    nn = number(nkey)
+                    if nn < 0:
+                        continue
+                    nchunk = chunks[nn]
+                    if not nchunk[1][j] or (nchunk[3] is not None and nchunk[2][j] not in nchunk[3]):
+                        continue
+                nxt = nn * cells + j
+                if ng < best.get(nxt, ng + 1):
+                    best[nxt] = ng
+                    came[nxt] = (cur, d)
+                    ox, oy, oz = nchunk[4]
+                    lx, ly, lz = local[j]
+                    h = max(abs(gx - ox - lx), abs(gy - oy - ly), abs(gz - oz - lz))
+                    heapq.heappush(heap, (ng + h, -ng, nxt))
+        return None
+
+    # --- on disk ---
+
+    def to_bytes(self):
+        keys = sorted(self.masks)
+        head = json.dumps({"chunk": self.chunk, "rooms": self.rooms, "chunks": len(keys),
+                           "byteorder": sys.byteorder, "world": self.world}).encode()
+        parts = [head, b"\n"]
+        for key in keys:
+            parts += [array("i", key).tobytes(), self.masks[key].tobytes(), self.comps[key].tobytes()]
+        nodes = sorted(self.reps)
+        parts.append(array("i", [len(nodes)]).tobytes())
+        parts.append(array("i", [v for n in nodes for v in n + self.reps[n]]).tobytes())
+        flat = [v for src, out in self.links.items() for dst, cost in out.items()
+                for v in src + dst + (cost,)]
+        parts.append(array("i", [len(flat) // 9]).tobytes())
+        parts.append(array("i", flat).tobytes())
+        return MAGIC + zlib.compress(b"".join(parts), 1)
+
+    @classmethod
+    def from_bytes(cls, blob, file=None):
+        if not blob.startswith(MAGIC):
+            raise ValueError("not an exit graph file")
+        raw = zlib.decompress(blob[len(MAGIC):])
+        end = raw.index(b"\n")
+        head = json.loads(raw[:end])
+        graph = cls(head["chunk"], file)
+        swap = head["byteorder"] != sys.byteorder
+        pos = end + 1
+
+        def take(code, count):
+            nonlocal pos
+            arr = array(code)
+            arr.frombytes(raw[pos:pos + count * arr.itemsize])
+            pos += count * arr.itemsize
+            if swap:
+                arr.byteswap()
+            return arr
+
+        for _ in range(head["chunks"]):
+            key = tuple(take("i", 3))
+            graph.masks[key] = take("H", graph.cells)
+            graph.comps[key] = take("H", graph.cells)
+        nodes = take("i", take("i", 1)[0] * 7)
+        for n in range(0, len(nodes), 7):
+            node = tuple(nodes[n:n + 4])
+            graph.reps[node] = tuple(nodes[n + 4:n + 7])
+            graph.links[node] = {}
+            graph.ncomps[node[:3]] = max(graph.ncomps.get(node[:3], 0), node[3])
+        flat = take("i", take("i", 1)[0] * 9)
+        for n in range(0, len(flat), 9):
+            graph.links[tuple(flat[n:n + 4])][tuple(flat[n + 4:n + 8])] = flat[n + 8]
+        graph.rooms = head["rooms"]
+        graph.world = head.get("world")
+        return graph
+
+    def save(self, path=None, store=None):
+        """Write the graph out; pass the store it's in step with, once that is
+        flushed, or open_graph() won't trust it next time."""
+        if store is not None:
+            self.world = store.fingerprint()
+        write_atomic(path or self.file, self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read(), path)
+
+
+def build_graph(store, chunk=GRAPH_CHUNK, progress=None):
+    """An ExitGraph of every tile in the store (reads them all once)."""
+    graph = ExitGraph(chunk, graph_path_for(store))
+    for n, coords in enumerate(store.coords(), 1):
+        try:
+            tile = store.get(*coords)
+        except ValueError:
+            tile = None  # broken JSON: a room with no way out, until world_lint.py finds it
+        exits = tile.get("exits") if isinstance(tile, dict) else None
+        graph.set_room(*coords, exits if isinstance(exits, dict) else {})
+        if progress and n % 10000 == 0:
+            progress(n)
+    graph.build()
+    return graph
+
+
+def open_graph(store, path=None):
+    """The saved graph for this world if the world hasn't changed since, else a fresh one."""
+    path = path or graph_path_for(store)
+    world = store.fingerprint()  # before reading the tiles: a put meanwhile changes it
+    if world is not None:
+        try:
+            graph = ExitGraph.load(path)
+            if graph.world == world:
+                return graph
+        except (OSError, ValueError, KeyError, zlib.error):
+            pass
+    graph = build_graph(store)
+    graph.file = path
+    graph.world = world
+    try:
+        graph.save()
+    except OSError:
+        pass  # read-only world: keep it in memory
+    return graph
+
+
+class GraphLoader:
+    """open_graph() on a thread, so a game can start before a big world is mapped.
+
+    Until `ready`, path() finds nothing and update()s are kept, to be
+    applied as soon as the graph is there. If loading fails, `error` says
+    why and it never becomes ready.
+    """
+
+    def __init__(self, store, path=None):
+        self.file = path or graph_path_for(store)
+        self.graph = None
+        self.error = None
+        self.pending = []  # update() calls waiting for the graph
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._load, args=(store,), name="exit-graph", daemon=True)
+        self.thread.start()
+
+    @property
+    def ready(self):
+        return self.graph is not None
+
+    def _load(self, store):
+        try:
+            graph = open_graph(store, self.file)
+        except Exception as e:  # a broken world shouldn't take the game down with it
+            self.error = e
+            return
+        with self.lock:
+            for args in self.pending:
+                graph.update(*args)
+            self.pending = None
+            self.graph = graph
+
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        return self.ready
+
+    def update(self, x, y, z, exits):
+        with self.lock:
+            if self.graph is None:
+                self.pending.append((x, y, z, None if exits is None else dict(exits)))
+                return
+        self.graph.update(x, y, z, exits)
+
+    def path(self, start, goal, max_nodes=MAX_NODES):
+        return self.graph.path(start, goal, max_nodes) if self.graph is not None else None
+
+    def save(self, path=None, store=None):
+        # not loaded yet: open_graph saves what it builds, and the world's
+        # fingerprint tells the next run about anything that came after
+        if self.graph is not None:
+            self.graph.save(path, store)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="read every tile and save the graph next to the world")
+    p.add_argument("world", nargs="?", help="world folder or file (default: $COG_WORLD or world_tiles/)")
+    p = sub.add_parser("path", help="print the exits from one room to another")
+    p.add_argument("coords", type=int, nargs=6, metavar="N", help="x y z of start, then of goal")
+    p.add_argument("--world")
+    args = ap.parse_args(argv)
+
+    store = open_world(args.world)
+    try:
+        if args.cmd == "build":
+            t0 = time.time()
+            world = store.fingerprint()
+            graph = build_graph(store, progress=lambda n: print(f"  {n} rooms...", flush=True))
+            graph.world = world
+            graph.save()
+            print(f"{len(graph)} rooms, {len(graph.reps)} components in {time.time() - t0:.1f}s "
+                  f"-> {graph.file}")
+            return 0
+        graph = open_graph(store)
+        t0 = time.perf_counter()
+        route = graph.path(args.coords[:3], args.coords[3:])
+        ms = 1000 * (time.perf_counter() - t0)
+        if route is None:
+            print(f"No way through ({ms:.1f} ms).")
+            return 1
+        print(f"{len(route)} steps ({ms:.1f} ms): {' '.join(route)}")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
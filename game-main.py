@@ -1,8 +1,20 @@
 import pygame
 import sys
 import os
-import json
-from datetime import datetime
+
+from world_store import open_world
+from room_cache import RoomCache
+from saver import WriteBehindSaver, write_atomic
+from journal import JournaledDocument
+from player_store import PlayerStore, DEFAULT_DB, player_name_for
+from overlays import OverlayStore
+from exit_graph import GraphLoader
+from worldgen import Generator
+from engine import World, Session, WELCOME, new_player_data, creature_news
+from tile_codec import encode, load_file
+from message_log import MessageLog
+from text_cache import render_text
+from redraw import REDRAW_MODE, wait_events
 
 pygame.init()
 
@@ -14,372 +26,247 @@ FONT_MAIN = pygame.font.SysFont(None, 28)
 FONT_INPUT = pygame.font.SysFont(None, 32)
 
 clock = pygame.time.Clock()
+BG_COLOR = (15,20,30)
+CARET_BLINK_MS = 500
 
 # -------------------------
 # FILE PATHS
 # -------------------------
 PLAYER_FILE = "player-1.json"
+SAVE_DEBOUNCE = 0.25  # seconds of quiet before the player file is written
+SAVE_MAX_LOSS = 2.0   # most seconds of play a crash can lose
+
+# "documents": rewrite player-1.json (write-behind) after each change
+# "journal":   append each change to player-1.journal, snapshot now and then
+# "sqlite":    keep the player as "player-1" in players.db (see player_store.py)
+PERSISTENCE = os.environ.get("COG_PERSIST", "documents")
+PLAYER_JOURNAL = os.path.splitext(PLAYER_FILE)[0] + ".journal"
+PLAYER_DB = os.environ.get("COG_PLAYER_DB", DEFAULT_DB)
+PLAYER_NAME = player_name_for(PLAYER_FILE)
+# how player-1.json is written (see tile_codec.py); loading works for any of them
+PLAYER_CODEC = os.environ.get("COG_PLAYER_CODEC", "json")
+# messages that scroll out of memory go here (rewritten each session)
+MESSAGE_SPILL = os.path.splitext(PLAYER_FILE)[0] + ".log"
+
+# in-game room changes (pickups) live in world_overlays/<scope>/, never in
+# the authored tiles: "world" = shared by everyone, "player" = per player
+OVERLAY_SCOPE = os.environ.get("COG_OVERLAY_SCOPE", "world")
+WORLD = open_world()  # world_tiles/ by default, or $COG_WORLD (e.g. world.cogw)
 
 # -------------------------
-# WORLD / PLAYER STATE
+# ROOM CACHE
 # -------------------------
+ROOM_CACHE_ROOMS = 512               # most rooms kept parsed in memory
+ROOM_CACHE_BYTES = 16 * 1024 * 1024  # rough memory budget for them
+ROOM_CACHE_MAX_AGE = 1.0             # seconds before a cached room is re-checked on disk
+PREFETCH_HOPS = 1                    # 2 = also warm the rooms beyond the next ones
+ROOM_CACHE = RoomCache(WORLD, ROOM_CACHE_ROOMS, ROOM_CACHE_BYTES, ROOM_CACHE_MAX_AGE)
+OVERLAYS = OverlayStore(scope=os.path.splitext(PLAYER_FILE)[0] if OVERLAY_SCOPE == "player" else "world")
+TICK_MS = 250                        # world tick: creatures near you move; 0 = no creatures
+EXIT_GRAPH = GraphLoader(WORLD)      # for goto; mapped on a thread if the saved one is out of date
+# $COG_WORLD_SEED: rooms nobody has built are made up from this seed (see worldgen.py)
+WORLD_SEED = os.environ.get("COG_WORLD_SEED")
+GAME_WORLD = World(WORLD, ROOM_CACHE, OVERLAYS, prefetch_hops=PREFETCH_HOPS, creatures=TICK_MS > 0,
+                   graph=EXIT_GRAPH, generator=Generator(int(WORLD_SEED)) if WORLD_SEED else None)
 
-player_x = 0
-player_y = 0
-player_z = 0
-player_health = 100
-player_inventory = []
+# -------------------------
+# PLAYER SESSION
+# -------------------------
+# all game rules live in engine.py; this file only draws, reads keys and saves
 
-current_room = {
-    "description": "You are nowhere. (Room failed to load.)",
-    "exits": {},
-    "items": []
-}
+session = Session(GAME_WORLD, on_event=lambda event: record_player_event(event))
 
-DIRS = {
-    "n":  (0,  1, 0),
-    "ne": (1,  1, 0),
-    "e":  (1,  0, 0),
-    "se": (1, -1, 0),
-    "s":  (0, -1, 0),
-    "sw": (-1,-1, 0),
-    "w":  (-1, 0, 0),
-    "nw": (-1, 1, 0),
-}
+message_log = MessageLog(WELCOME, spill_path=MESSAGE_SPILL)
+
+
+def creature_moved(creature, old, new, direction):
+    # only news from the room you're standing in
+    line = creature_news(creature, old, new, direction).get((session.x, session.y, session.z))
+    if line:
+        message_log.append(line)
+
+
+if GAME_WORLD.sim is not None:
+    GAME_WORLD.sim.on_move = creature_moved
 
-message_log = [
-    "Welcome to Cog World.",
-    "Type 'look' to inspect the room.",
-    "Type n/s/e/w/ne/nw/se/sw to move.",
-    "You can 'look trunk' to peek inside something.",
-    "Use 'get <item>' to pick something up.",
-]
 command_input = ""
+caret_on = True
+
+PLAYER_SAVER = WriteBehindSaver(
+    PLAYER_FILE, debounce=SAVE_DEBOUNCE, max_delay=SAVE_MAX_LOSS,
+    encode=lambda data: encode(data, PLAYER_CODEC),
+    on_error=lambda e: message_log.append(f"Error saving player file: {e}")
+)
+PLAYER_DOC = JournaledDocument(PLAYER_FILE, PLAYER_JOURNAL, codec=PLAYER_CODEC) if PERSISTENCE == "journal" else None
+PLAYER_STORE = PlayerStore(
+    PLAYER_DB, on_error=lambda e: message_log.append(f"Error saving player file: {e}")
+) if PERSISTENCE == "sqlite" else None
 
 # -------------------------
 # PLAYER LOAD/SAVE
 # -------------------------
 
 def load_player():
-    global player_x, player_y, player_z, player_health, player_inventory
-    if not os.path.exists(PLAYER_FILE):
-        data = {
-            "name": "Player One",
-            "stats": {"health": 100},
-            "position": {"x": 0, "y": 0, "z": 0},
-            "inventory": [],
-            "meta": {"last_save": None}
-        }
-        with open(PLAYER_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+    if PLAYER_STORE is not None:
+        try:
+            data = PLAYER_STORE.load(PLAYER_NAME)
+            if data is None and os.path.exists(PLAYER_FILE):
+                data = load_file(PLAYER_FILE)  # first run on sqlite: carry on from the file
+            if data is None:
+                data = new_player_data()
+            else:
+                session.load_data(data)
+                message_log.append(f"Player data loaded from {PLAYER_DB}.")
+            PLAYER_STORE.save(PLAYER_NAME, data)
+        except Exception as e:
+            message_log.append(f"Error loading player file: {e}")
+        return
+    if PLAYER_DOC is None and not os.path.exists(PLAYER_FILE):
+        write_atomic(PLAYER_FILE, encode(new_player_data(), PLAYER_CODEC))
         return
 
     try:
-        with open(PLAYER_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        pos = data.get("position", {})
-        player_x = pos.get("x", 0)
-        player_y = pos.get("y", 0)
-        player_z = pos.get("z", 0)
-
-        stats = data.get("stats", {})
-        player_health = stats.get("health", 100)
-
-        player_inventory[:] = data.get("inventory", [])
-
+        if PLAYER_DOC is not None:
+            data = PLAYER_DOC.load(new_player_data())
+        else:
+            data = load_file(PLAYER_FILE)
+        session.load_data(data)
         message_log.append("Player data loaded from player-1.json.")
     except Exception as e:
         message_log.append(f"Error loading player file: {e}")
 
 def save_player():
-    data = {
-        "name": "Player One",
-        "stats": {"health": player_health},
-        "position": {"x": player_x, "y": player_y, "z": player_z},
-        "inventory": player_inventory,
-        "meta": {"last_save": datetime.utcnow().isoformat() + "Z"}
-    }
-    try:
-        with open(PLAYER_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        message_log.append(f"Error saving player file: {e}")
-
-# -------------------------
-# HELPERS: WORLD + ITEMS
-# -------------------------
-
-def pad(n: int) -> str:
-    return f"-{abs(n):02d}" if n < 0 else f"{n:02d}"
-
-def room_filename(x, y, z):
-    folder = "world_tiles"
-    return os.path.join(folder, f"{pad(x)}-{pad(y)}-{pad(z)}.json")
-
-def load_room(x, y, z):
-    path = room_filename(x, y, z)
-
-    if not os.path.exists(path):
-        return {
-            "description": "(This room does not exist yet.)",
-            "exits": {},
-            "items": []
-        }
-
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        raw_exits = data.get("exits", {})
-        exits_clean = {d: bool(raw_exits.get(d, False)) for d in ["n","ne","e","se","s","sw","w","nw"]}
-        desc = data.get("description", "").strip()
-        its = data.get("items", [])
-        if not isinstance(its, list):
-            its = []
-
-        return {"description": desc, "exits": exits_clean, "items": its}
-    except Exception as e:
-        return {"description": f"(Error loading room: {e})", "exits": {}, "items": []}
-
-def list_top_level_items(items_list):
-    lines = []
-    for it in items_list:
-        nm = it.get("name", "???")
-        ds = it.get("desc", "").strip()
-        if ds:
-            lines.append(f"- {nm}: {ds}")
-        else:
-            lines.append(f"- {nm}")
-    return lines
-
-def find_item_recursive_and_remove(items_list, target_name):
-    target_name = target_name.lower().strip()
-    for i, it in enumerate(items_list):
-        if it.get("name", "").lower().strip() == target_name:
-            return items_list.pop(i)
-    for it in items_list:
-        kids = it.get("contains", [])
-        if isinstance(kids, list) and kids:
-            got = find_item_recursive_and_remove(kids, target_name)
-            if got is not None:
-                return got
-    return None
-
-def find_item_by_name(items_list, target_name):
-    target_name = target_name.lower().strip()
-    for it in items_list:
-        if it.get("name", "").lower().strip() == target_name:
-            return it
-    return None
-
-def describe_container(item):
-    nm = item.get("name", "something")
-    ds = item.get("desc", "").strip()
-    if ds:
-        message_log.append(f"{nm}: {ds}")
-    kids = item.get("contains", [])
-    if kids and isinstance(kids, list) and len(kids) > 0:
-        message_log.append(f"Inside {nm}:")
-        for child in kids:
-            message_log.append(f"- {child.get('name','???')}: {child.get('desc','').strip()}")
-    else:
-        message_log.append(f"{nm} is empty.")
-
-def describe_current_room():
-    room = current_room
-    if room["description"]:
-        for line in room["description"].split("\n"):
-            message_log.append(line)
-    open_exits = [d for d, ok in room["exits"].items() if ok]
-    if open_exits:
-        message_log.append("Exits: " + ", ".join(open_exits))
-    else:
-        message_log.append("There are no visible exits.")
-    if room["items"]:
-        message_log.append("You see:")
-        for line in list_top_level_items(room["items"]):
-            message_log.append(line)
+    if PLAYER_DOC is not None:
+        # journal mode: a full save means a fresh snapshot + empty journal
+        try:
+            PLAYER_DOC.compact()
+        except Exception as e:
+            message_log.append(f"Error saving player file: {e}")
+        return
+    # queued for the write-behind thread; to_data() is already a copy
+    if PLAYER_STORE is not None:
+        PLAYER_STORE.save(PLAYER_NAME, session.to_data())
     else:
-        message_log.append("You see nothing of interest.")
+        PLAYER_SAVER.submit(session.to_data())
 
-def try_move(direction):
-    global player_x, player_y, player_z, current_room
-    direction = direction.lower()
-    if direction not in DIRS:
-        message_log.append(f"You can't go '{direction}'.")
-        return
-    if not current_room["exits"].get(direction, False):
-        message_log.append("You can't go that way.")
+def record_player_event(event):
+    # journal mode writes just the change; otherwise fall back to a full save
+    if PLAYER_DOC is None:
+        save_player()
         return
-    dx, dy, dz = DIRS[direction]
-    player_x += dx
-    player_y += dy
-    player_z += dz
-    current_room = load_room(player_x, player_y, player_z)
-    message_log.append(f"You move {direction}.")
-    describe_current_room()
-    save_player()  # auto-save after moving
+    try:
+        PLAYER_DOC.record(event)
+    except Exception as e:
+        message_log.append(f"Error saving player file: {e}")
 
 # -------------------------
 # RENDERING
 # -------------------------
 
-def wrap_text(text, font, max_width):
-    words = text.split(' ')
-    lines = []
-    current_line = []
-    current_width = 0
-    
-    for word in words:
-        word_surface = font.render(word, True, (0, 0, 0))
-        word_width = word_surface.get_width()
-        
-        if current_width + word_width <= max_width:
-            current_line.append(word)
-            current_width += word_width + font.size(' ')[0]
-        else:
-            lines.append(' '.join(current_line))
-            current_line = [word]
-            current_width = word_width
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    return lines if lines else [text]
-
-def draw_text_block(lines, x, y, w, h, font, color=(220,220,220)):
-    # We build a new list of *wrapped* lines first.
-    wrapped_lines = []
-    usable_width = w - 16  # padding so text isn't right against border
-
-    for entry in lines:
-        # make sure it's a string
-        if not isinstance(entry, str):
-            entry = str(entry)
+def log_panel_rect():
+    return pygame.Rect(20, 40, WIDTH - 40, HEIGHT - 160)
 
-        # split into wrapped sub-lines
-        sublines = wrap_text(entry, font, usable_width)
-        wrapped_lines.extend(sublines)
+def scroll_log(pages=0, lines=0):
+    # PageUp/PageDown move a page (less one line of overlap), the wheel 3 lines
+    rect = log_panel_rect()
+    rows = rect.h // (FONT_MAIN.get_height() + 4)
+    message_log.scroll(FONT_MAIN, rect.w - 16, pages * max(1, rows - 1) + lines, rows)
 
-    # Now we figure out which of those wrapped lines can fit vertically.
-    visible_lines = []
-    total_h = 0
+def draw_text_block(log, x, y, w, h, font, color=(220,220,220)):
+    # the log keeps its lines wrapped already; just take the ones that fit
+    usable_width = w - 16  # padding so text isn't right against border
     line_h = font.get_height() + 4
+    visible_lines = log.window(font, usable_width, h // line_h)
 
-    # we go from the bottom (latest messages) upward, like a console log
-    for line in reversed(wrapped_lines):
-        if total_h + line_h > h:
-            break
-        visible_lines.append(line)
-        total_h += line_h
-
-    # draw them bottom-up
+    # draw them bottom-up, like a console log
     draw_y = y + h - line_h
-    for line in visible_lines:
-        img = font.render(line, True, color)
+    for line in reversed(visible_lines):
+        img = render_text(font, line, color)
         screen.blit(img, (x + 8, draw_y))
         draw_y -= line_h
 
-def render_scene():
-    screen.fill((15,20,30))
-    bar_rect = pygame.Rect(0, 0, WIDTH, 32)
+    if log.scrolled():
+        hint = render_text(font, "-- PgDn for newer --", (150,160,190))
+        screen.blit(hint, (x + w - hint.get_width() - 10, y + 4))
+
+def panel_rects():
+    return {
+        "bar": pygame.Rect(0, 0, WIDTH, 34),
+        "log": log_panel_rect(),
+        "hud": pygame.Rect(20, HEIGHT - 110, WIDTH - 40, 30),
+        "input": pygame.Rect(20, HEIGHT - 70, WIDTH - 40, 50),
+    }
+
+def panel_keys():
+    # what each panel is showing; in "dirty" mode a panel is redrawn only
+    # when its key changes
+    return {
+        "bar": None,
+        "log": (len(message_log), message_log.anchor),
+        "hud": (session.x, session.y, session.z, session.health, len(session.inventory)),
+        "input": (command_input, caret_on),
+    }
+
+def draw_command_bar(bar_rect):
+    bar_rect = pygame.Rect(bar_rect.x, bar_rect.y, bar_rect.w, 32)
     pygame.draw.rect(screen, (25,30,45), bar_rect)
     pygame.draw.line(screen, (80,100,140), (0, 32), (WIDTH, 32), 2)
     cmds = ["look", "look [name]", "get [name]", "inventory", "go [n/s/e/w]", "quit"]
     bar_text = "   Commands:  " + " · ".join(cmds)
-    bar_img = FONT_MAIN.render(bar_text, True, (180,200,255))
+    bar_img = render_text(FONT_MAIN, bar_text, (180,200,255))
     screen.blit(bar_img, (18, 7))
-    log_rect = pygame.Rect(20, 40, WIDTH - 40, HEIGHT - 160)
+
+def draw_log_panel(log_rect):
     pygame.draw.rect(screen, (40,45,60), log_rect, border_radius=8)
     pygame.draw.rect(screen, (120,130,160), log_rect, width=2, border_radius=8)
     draw_text_block(message_log, log_rect.x, log_rect.y, log_rect.w, log_rect.h, FONT_MAIN)
-    hud_rect = pygame.Rect(20, HEIGHT - 110, WIDTH - 40, 30)
+
+def draw_hud(hud_rect):
     pygame.draw.rect(screen, (30,35,50), hud_rect, border_radius=8)
     pygame.draw.rect(screen, (90,100,130), hud_rect, width=1, border_radius=8)
-    hud_text = f"Location: ({player_x},{player_y},{player_z})   Health: {player_health}   Inventory: {len(player_inventory)} items"
-    hud_img = FONT_MAIN.render(hud_text, True, (200,200,220))
+    hud_text = f"Location: ({session.x},{session.y},{session.z})   Health: {session.health}   Inventory: {len(session.inventory)} items"
+    hud_img = render_text(FONT_MAIN, hud_text, (200,200,220))
     screen.blit(hud_img, (hud_rect.x + 8, hud_rect.y + 5))
-    input_rect = pygame.Rect(20, HEIGHT - 70, WIDTH - 40, 50)
+
+def draw_input_line(input_rect):
     pygame.draw.rect(screen, (40,45,60), input_rect, border_radius=8)
     pygame.draw.rect(screen, (120,200,255), input_rect, width=2, border_radius=8)
     prompt = "> " + command_input
-    prompt_img = FONT_INPUT.render(prompt, True, (255,255,255))
+    prompt_img = render_text(FONT_INPUT, prompt, (255,255,255))
     screen.blit(prompt_img, (input_rect.x + 8, input_rect.y + 12))
-    pygame.display.flip()
-
-# -------------------------
-# COMMAND HANDLERS
-# -------------------------
-
-def handle_get_command(tokens):
-    if len(tokens) < 2:
-        message_log.append("Get what?")
-        return
-    target_name = " ".join(tokens[1:]).strip().lower()
-    got_item = find_item_recursive_and_remove(current_room["items"], target_name)
-    if got_item is None:
-        message_log.append(f"You can't find '{target_name}' here.")
-        return
-    player_inventory.append(got_item)
-    message_log.append(f"You pick up the {got_item.get('name', target_name)}.")
-    save_player()  # persist
+    if caret_on:
+        cx = input_rect.x + 8 + prompt_img.get_width() + 2
+        pygame.draw.line(screen, (255,255,255), (cx, input_rect.y + 12),
+                         (cx, input_rect.y + 12 + FONT_INPUT.get_height()), 1)
+
+PANEL_DRAW = {
+    "bar": draw_command_bar,
+    "log": draw_log_panel,
+    "hud": draw_hud,
+    "input": draw_input_line,
+}
 
-def handle_look_command(tokens):
-    if len(tokens) == 1:
-        describe_current_room()
-        return
-    target_name = " ".join(tokens[1:])
-    item = find_item_by_name(current_room["items"], target_name)
-    if item is None:
-        message_log.append(f"You don't see '{target_name}' here.")
-        return
-    describe_container(item)
-
-def handle_inventory_command():
-    if player_inventory:
-        message_log.append("You are carrying:")
-        for thing in player_inventory:
-            nm = thing.get("name", "???")
-            ds = thing.get("desc", "").strip()
-            if ds:
-                message_log.append(f"- {nm}: {ds}")
-            else:
-                message_log.append(f"- {nm}")
+def render_scene(only=None):
+    # only=None: draw everything and flip; else redraw and update just those panels
+    rects = panel_rects()
+    if only is None:
+        screen.fill(BG_COLOR)
+    for name, rect in rects.items():
+        if only is not None:
+            if name not in only:
+                continue
+            screen.fill(BG_COLOR, rect)
+        PANEL_DRAW[name](rect)
+    if only is None:
+        pygame.display.flip()
     else:
-        message_log.append("You carry nothing.")
+        pygame.display.update([rects[name] for name in only])
 
 def handle_command(cmd: str):
-    cmd = cmd.strip()
-    if cmd == "":
-        return None
-    tokens = cmd.lower().split()
-    if cmd.lower() in ["quit", "exit"]:
-        message_log.append("Game saved. Goodbye.")
+    message_log.extend(session.handle(cmd))
+    if session.done:
         save_player()
         return "QUIT"
-    if cmd.lower() in ["inventory", "inv", "i"]:
-        handle_inventory_command()
-        return None
-    if tokens[0] in ["look", "l"]:
-        handle_look_command(tokens)
-        return None
-    if tokens[0] in ["get", "take", "grab"]:
-        handle_get_command(tokens)
-        return None
-    if cmd.lower() in DIRS.keys():
-        try_move(cmd.lower())
-        return None
-    if len(tokens) >= 2 and tokens[0] in ["go", "move", "walk"]:
-        direction_word = tokens[1]
-        long_to_short = {"north": "n", "northeast": "ne", "east": "e", "southeast": "se",
-                         "south": "s", "southwest": "sw", "west": "w", "northwest": "nw"}
-        if direction_word in long_to_short:
-            direction_word = long_to_short[direction_word]
-        if direction_word in DIRS:
-            try_move(direction_word)
-            return None
-    message_log.append(f"You can't '{cmd}'.")
     return None
 
 # -------------------------
@@ -388,14 +275,29 @@ def handle_command(cmd: str):
 
 running = True
 load_player()
-current_room = load_room(player_x, player_y, player_z)
-describe_current_room()
+GAME_WORLD.start()
+message_log.extend(session.enter())
+
+drawn_keys = {}  # panel -> key it was last drawn with ("dirty" mode)
+next_tick = pygame.time.get_ticks() + TICK_MS
 
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
+    if REDRAW_MODE == "dirty":
+        # sleep until input arrives, the caret is due to blink or the world ticks
+        wait_ms = CARET_BLINK_MS - pygame.time.get_ticks() % CARET_BLINK_MS
+        if GAME_WORLD.sim is not None:
+            wait_ms = min(wait_ms, max(0, next_tick - pygame.time.get_ticks()))
+        events = wait_events(wait_ms)
+    else:
+        events = pygame.event.get()
+    for event in events:
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            drawn_keys = {}
+        elif event.type == pygame.QUIT:
             save_player()
             running = False
+        elif event.type == pygame.MOUSEWHEEL:
+            scroll_log(lines=3 * event.y)
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 save_player()
@@ -403,7 +305,12 @@ while running:
             elif event.key == pygame.K_BACKSPACE:
                 if len(command_input) > 0:
                     command_input = command_input[:-1]
+            elif event.key == pygame.K_PAGEUP:
+                scroll_log(pages=1)
+            elif event.key == pygame.K_PAGEDOWN:
+                scroll_log(pages=-1)
             elif event.key == pygame.K_RETURN:
+                message_log.scroll_to_bottom()
                 message_log.append("> " + command_input)
                 result = handle_command(command_input)
                 command_input = ""
@@ -415,8 +322,32 @@ while running:
                 ):
                     if len(command_input) < 80:
                         command_input += event.unicode
-    render_scene()
-    clock.tick(60)
-
+    if GAME_WORLD.sim is not None and running:
+        now_ms = pygame.time.get_ticks()
+        if now_ms - next_tick > 8 * TICK_MS:
+            next_tick = now_ms  # the window was stalled (dragged, asleep); skip the backlog
+        while now_ms >= next_tick:
+            GAME_WORLD.sim.tick()
+            next_tick += TICK_MS
+    caret_on = (pygame.time.get_ticks() // CARET_BLINK_MS) % 2 == 0
+    if REDRAW_MODE == "dirty":
+        keys = panel_keys()
+        dirty = [name for name, key in keys.items()
+                 if name not in drawn_keys or drawn_keys[name] != key]
+        if dirty:
+            render_scene(dirty if drawn_keys else None)
+        drawn_keys = keys
+    else:
+        render_scene()
+        clock.tick(60)
+
+PLAYER_SAVER.close()  # flush whatever is still pending
+if PLAYER_DOC is not None:
+    PLAYER_DOC.close()
+if PLAYER_STORE is not None:
+    PLAYER_STORE.close()
+GAME_WORLD.close()
+WORLD.close()
+message_log.close()
 pygame.quit()
 sys.exit()
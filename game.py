@@ -2,10 +2,19 @@ import pygame
 import sys
 import math
 import os
-import json
 import subprocess
 from datetime import datetime
 
+from world_store import open_world
+from journal import WorldJournal
+from exit_graph import GraphLoader
+from room_model import SCHEMA_VERSION
+from text_cache import render_text
+from redraw import REDRAW_MODE, wait_events
+from ui_layers import LayerCache
+from item_tree import ItemTreeView
+from text_edit import TextEditor
+
 # Windows-only beep
 try:
     import winsound
@@ -45,6 +54,9 @@ font_tiny = pygame.font.SysFont(None, 26)
 clock = pygame.time.Clock()
 current_screen = "menu"  # 'menu' or 'map_builder'
 
+# static parts of the builder widgets (frames, rings, outlines), painted once
+LAYERS = LayerCache()
+
 # --- World state ---
 x, y, z = 0, 0, 0
 last_move = None
@@ -55,31 +67,65 @@ save_message_ticks = 0
 # --- Room editor state ---
 EXIT_ORDER = ["n", "ne", "e", "se", "s", "sw", "w", "nw"]
 exits = {d: False for d in EXIT_ORDER}
-description_text = ""
+DESC_EDITOR = TextEditor(font_tiny, max_len=2000)  # edits go to the journal, see below
+DESC_TEXT_W = 260 - 24 - 12  # wrap width inside the description box
 desc_active = False
 caret_visible = True
 caret_timer = 0
 
 # --- Items state ---
 items = []  # list of {"name":str,"desc":str,"contains":[...]}
+ITEM_VIEW = ItemTreeView(items)  # flattened rows for the items panel
 adding_mode = False
 adding_parent_path = []
-new_item_name = ""
-new_item_desc = ""
+NAME_EDITOR = TextEditor(font_tiny, max_len=60, multiline=False)
+ITEM_DESC_EDITOR = TextEditor(font_tiny, max_len=2000)
 active_field = None
 
 # --- Scroll state for left column ---
 scroll_offset = 0  # shifts whole left column up/down
 
+# --- Minimap state ---
+MINIMAP_RADIUS = 3
+minimap_rooms = {}  # (x, y) -> exits, for saved tiles around us on this level
+minimap_version = 0  # bumped by refresh_minimap, for redraw keys
+hot_rects = []  # things drawn with a hover look this frame (buttons, compass points)
+
+
+WORLD = open_world()  # world_tiles/ by default, or $COG_WORLD (e.g. world.cogw)
+# tiles are written with $COG_CODEC if set (e.g. binary+zlib); any format loads
+
+# "documents": edits stay in memory until Save JSON / Update
+# "journal":   every edit is appended to world.journal as it happens
+PERSISTENCE = os.environ.get("COG_PERSIST", "documents")
+WORLD_JOURNAL_FILE = "world.journal"
+WORLD_JOURNAL = WorldJournal(WORLD, WORLD_JOURNAL_FILE) if PERSISTENCE == "journal" else None
+if WORLD_JOURNAL is not None and WORLD_JOURNAL.pending:
+    WORLD_JOURNAL.compact()  # edits left by a crash: into the tiles, where open_graph sees them
+EXIT_GRAPH = GraphLoader(WORLD)  # kept in step with every save, for goto in game-main.py
+exit_graph_dirty = False  # saves change it in memory; it's written when we leave
+
+
+def record_tile_event(event):
+    if WORLD_JOURNAL is not None:
+        WORLD_JOURNAL.record(x, y, z, event)
+        # journaled edits reach the tiles (and the world's fingerprint) when
+        # they're compacted, so the graph has to be written again too
+        if event.get("t") == "exit":
+            EXIT_GRAPH.update(x, y, z, exits)
+        mark_graph_dirty()
 
-def pad(n: int) -> str:
-    return f"-{abs(n):02d}" if n < 0 else f"{n:02d}"
 
+def record_desc_edit(i, deleted, inserted):
+    event = {"t": "desc", "i": i}
+    if deleted:
+        event["del"] = deleted
+    if inserted:
+        event["ins"] = inserted
+    record_tile_event(event)
 
-def coords_filename():
-    folder = "world_tiles"
-    os.makedirs(folder, exist_ok=True)
-    return os.path.join(folder, f"{pad(x)}-{pad(y)}-{pad(z)}.json")
+
+DESC_EDITOR.on_edit = record_desc_edit
 
 
 def get_item_by_path(path):
@@ -109,6 +155,8 @@ def add_item_under_path(parent_path, name, desc):
     }
     if parent_path == []:
         items.append(new_obj)
+        record_tile_event({"t": "item_add", "path": [], "item": new_obj})
+        ITEM_VIEW.added([len(items) - 1])
         return True
     parent = get_item_by_path(parent_path)
     if not parent:
@@ -116,70 +164,58 @@ def add_item_under_path(parent_path, name, desc):
     if "contains" not in parent or not isinstance(parent["contains"], list):
         parent["contains"] = []
     parent["contains"].append(new_obj)
+    record_tile_event({"t": "item_add", "path": list(parent_path), "item": new_obj})
+    ITEM_VIEW.added(list(parent_path) + [len(parent["contains"]) - 1])
     return True
 
 
-def flatten_items_for_display(item_list, base_path, level, out):
-    for i, it in enumerate(item_list):
-        path = base_path + [i]
-        nm = it.get("name", "(no name)")
-        ds = it.get("desc", "").strip()
-        indent = "  " * level
-        if ds:
-            line_text = f"{indent}- {nm}: {ds}"
-        else:
-            line_text = f"{indent}- {nm}"
-        out.append({
-            "text": line_text,
-            "path": path,
-            "plus_rect": None,
-        })
-        kids = it.get("contains", [])
-        if isinstance(kids, list) and kids:
-            flatten_items_for_display(kids, path, level+1, out)
-
-
 def load_tile():
-    global exits, description_text, last_move
+    global exits, last_move
     global save_message, save_message_ticks
     global items
 
-    path = coords_filename()
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            loaded_exits = data.get("exits", {})
-            exits_new = {d: bool(loaded_exits.get(d, False)) for d in EXIT_ORDER}
-            exits.clear()
-            exits.update(exits_new)
-
-            description_text = str(data.get("description", ""))
-            last_move = data.get("last_move")
-
-            items_loaded = data.get("items", [])
-            if not isinstance(items_loaded, list):
-                items_loaded = []
-            items[:] = items_loaded
-
-            save_message = f"Loaded from {path}"
-            save_message_ticks = 120
-        except Exception as e:
-            for k in EXIT_ORDER:
-                exits[k] = False
-            description_text = ""
-            items[:] = []
-            save_message = f"Load error: {e}"
-            save_message_ticks = 180
+    path = WORLD.location(x, y, z)
+    ITEM_VIEW.reset()
+    try:
+        if WORLD_JOURNAL is not None:
+            data = WORLD_JOURNAL.load(x, y, z)
+        else:
+            data = WORLD.get(x, y, z)
+    except Exception as e:
+        for k in EXIT_ORDER:
+            exits[k] = False
+        DESC_EDITOR.set_text("")
+        items[:] = []
+        save_message = f"Load error: {e}"
+        save_message_ticks = 180
+        refresh_minimap()
+        return
+
+    if data is not None:
+        loaded_exits = data.get("exits", {})
+        exits_new = {d: bool(loaded_exits.get(d, False)) for d in EXIT_ORDER}
+        exits.clear()
+        exits.update(exits_new)
+
+        DESC_EDITOR.set_text(str(data.get("description", "")))
+        last_move = data.get("last_move")
+
+        items_loaded = data.get("items", [])
+        if not isinstance(items_loaded, list):
+            items_loaded = []
+        items[:] = items_loaded
+
+        save_message = f"Loaded from {path}"
+        save_message_ticks = 120
     else:
         for k in EXIT_ORDER:
             exits[k] = False
-        description_text = ""
+        DESC_EDITOR.set_text("")
         last_move = None
         items[:] = []
         save_message = "New room (no file yet)"
         save_message_ticks = 90
+    refresh_minimap()
 
 
 def draw_button(text, center, mouse_pos, *,
@@ -187,10 +223,11 @@ def draw_button(text, center, mouse_pos, *,
                 padding=(30,16), radius=15,
                 font=font_btn, disabled=False):
     label_color = INK_DARK if not disabled else (60, 60, 60)
-    label = font.render(text, True, label_color)
+    label = render_text(font, text, label_color)
     rect = label.get_rect(center=center).inflate(*padding)
     base = (120, 120, 120) if disabled else fill_color
     color = base
+    hot_rects.append(rect)
     if rect.collidepoint(mouse_pos) and not disabled:
         color = hover_color
     pygame.draw.rect(screen, color, rect, border_radius=radius)
@@ -210,29 +247,78 @@ DIRS = [
 ]
 
 
-def draw_compass(center, radius, mouse_pos):
+def compass_buttons(center, radius):
     cx, cy = center
-    hit_rects = {}
-    pygame.draw.circle(screen, GREY, center, radius, width=2)
-
     for name, deg, _ in DIRS:
         rad = math.radians(deg)
-        bx = cx + int(radius * math.cos(rad))
-        by = cy - int(radius * math.sin(rad))
-        btn_radius = 34
-        hovered = (mouse_pos[0]-bx)**2 + (mouse_pos[1]-by)**2 <= btn_radius**2
-        pygame.draw.circle(screen, HOVER if hovered else CYAN, (bx, by), btn_radius)
-        label = font_small.render(name, True, INK_DARK)
-        screen.blit(label, label.get_rect(center=(bx, by)))
+        yield name, (cx + int(radius * math.cos(rad)), cy - int(radius * math.sin(rad)))
+
+
+def draw_compass(center, radius, mouse_pos):
+    cx, cy = center
+    btn_radius = 34
+    half = radius + btn_radius + 1
+
+    def paint(surf):
+        pygame.draw.circle(surf, GREY, (half, half), radius, width=2)
+        for name, (bx, by) in compass_buttons((half, half), radius):
+            pygame.draw.circle(surf, CYAN, (bx, by), btn_radius)
+            label = render_text(font_small, name, INK_DARK)
+            surf.blit(label, label.get_rect(center=(bx, by)))
+        pygame.draw.circle(surf, GREY, (half, half), 6)
+
+    ring = LAYERS.get(("compass", radius), (half * 2, half * 2), paint)
+    screen.blit(ring, (cx - half, cy - half))
+
+    hit_rects = {}
+    for name, (bx, by) in compass_buttons(center, radius):
+        if (mouse_pos[0]-bx)**2 + (mouse_pos[1]-by)**2 <= btn_radius**2:
+            pygame.draw.circle(screen, HOVER, (bx, by), btn_radius)
+            label = render_text(font_small, name, INK_DARK)
+            screen.blit(label, label.get_rect(center=(bx, by)))
         hit_rects[name] = pygame.Rect(
             bx - btn_radius, by - btn_radius,
             btn_radius*2, btn_radius*2
         )
-
-    pygame.draw.circle(screen, GREY, center, 6)
+        hot_rects.append(hit_rects[name])
     return hit_rects
 
 
+def refresh_minimap():
+    global minimap_version
+    minimap_version += 1
+    minimap_rooms.clear()
+    try:
+        for (tx, ty, _tz), data in WORLD.rooms_within(x, y, z, MINIMAP_RADIUS, z_radius=0):
+            ex = data.get("exits", {})
+            minimap_rooms[(tx, ty)] = {d: bool(ex.get(d, False)) for d in EXIT_ORDER}
+    except Exception:
+        pass
+
+
+def draw_minimap(x0, y0, cell=30):
+    size = (MINIMAP_RADIUS * 2 + 1) * cell
+    rect = pygame.Rect(x0, y0, size, size)
+    pygame.draw.rect(screen, BOX, rect.inflate(12, 12), border_radius=10)
+    pygame.draw.rect(screen, GREY, rect.inflate(12, 12), width=2, border_radius=10)
+
+    rooms = dict(minimap_rooms)
+    rooms[(x, y)] = exits  # show unsaved edits for the room we're on
+    for (tx, ty), ex in rooms.items():
+        col = tx - x + MINIMAP_RADIUS
+        row = MINIMAP_RADIUS - (ty - y)
+        cx = x0 + col * cell + cell // 2
+        cy = y0 + row * cell + cell // 2
+        for name, _, (dx, dy, _dz) in DIRS:
+            if ex.get(name):
+                pygame.draw.line(screen, GREY, (cx, cy),
+                                 (cx + dx * cell // 2, cy - dy * cell // 2), 2)
+        here = (tx, ty) == (x, y)
+        pygame.draw.rect(screen, OK if here else CYAN,
+                         pygame.Rect(cx - 7, cy - 7, 14, 14), border_radius=3)
+    return rect
+
+
 def move_vector(name):
     for nm, _, delta in DIRS:
         if nm == name:
@@ -251,118 +337,108 @@ def apply_move(name):
     load_tile()
 
 
-def wrap_text(text, font, max_width):
-    lines = []
-    for paragraph in text.split("\n"):
-        words = paragraph.split(" ")
-        line = ""
-        for w in words:
-            test = (line + " " + w).strip() if line else w
-            if font.size(test)[0] <= max_width:
-                line = test
-            else:
-                if line:
-                    lines.append(line)
-                while font.size(w)[0] > max_width and len(w) > 1:
-                    cut = len(w)
-                    while cut > 1 and font.size(w[:cut])[0] > max_width:
-                        cut -= 1
-                    lines.append(w[:cut])
-                    w = w[cut:]
-                line = w
-        lines.append(line)
-    return lines
+def field_text_rect(rect):
+    # where an input box's text goes, inside its border
+    return rect.inflate(-12, -8)
+
+
+def mark_graph_dirty():
+    # if we crash before writing it, the file's fingerprint no longer
+    # matches the world and open_graph rebuilds it
+    global exit_graph_dirty
+    exit_graph_dirty = True
+
+
+def write_graph():
+    """Write the exit graph if any save changed it (it's a few MB on big worlds)."""
+    global exit_graph_dirty, save_message, save_message_ticks
+    if exit_graph_dirty and EXIT_GRAPH.ready:  # else the next run maps the world again
+        try:
+            EXIT_GRAPH.save(store=WORLD)
+            exit_graph_dirty = False
+        except OSError as e:
+            save_message = f"Exit graph not saved: {e}"
+            save_message_ticks = 120
 
 
 def save_tile():
     global save_message, save_message_ticks
-    path = coords_filename()
     data = {
         "coords": {"x": x, "y": y, "z": z},
         "last_move": last_move,
         "exits": exits,
-        "description": description_text,
+        "description": DESC_EDITOR.text,
         "items": items,
         "saved_at": datetime.utcnow().isoformat() + "Z",
+        "schema_version": SCHEMA_VERSION,
     }
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    save_message = f"Saved to {path}"
+    if WORLD_JOURNAL is not None:
+        WORLD_JOURNAL.save_tile(x, y, z, data)
+    else:
+        WORLD.put(x, y, z, data)
+        WORLD.flush()
+    save_message = f"Saved to {WORLD.location(x, y, z)}"
+    EXIT_GRAPH.update(x, y, z, exits)
+    mark_graph_dirty()
     save_message_ticks = 120
+    refresh_minimap()
 
 
 def draw_room_editor(x0, y0):
     panel_w, panel_h = 260, 240
     rect_panel = pygame.Rect(x0, y0, panel_w, panel_h)
+    box_size = 20
 
-    pygame.draw.rect(screen, BOX, rect_panel, border_radius=12)
-    pygame.draw.rect(screen, GREY, rect_panel, width=2, border_radius=12)
-    title = font_small.render("Room Editor", True, WHITE)
-    screen.blit(title, (x0 + 12, y0 + 10))
-    sub = font_tiny.render("Exits (tick to allow):", True, GREY)
-    screen.blit(sub, (x0 + 12, y0 + 48))
+    def checkboxes(ox, oy):
+        pairs = [("n","ne"), ("e","se"), ("s","sw"), ("w","nw")]
+        for i, (d1, d2) in enumerate(pairs):
+            for j, d in enumerate((d1, d2)):
+                yield d, ox + (16 if j == 0 else 140), oy + 80 + i * 32
 
-    hit = {}
-    col1_x = x0 + 16
-    col2_x = x0 + 140
-    start_y = y0 + 80
-    step_y = 32
-    box_size = 20
+    def paint(surf):
+        local = surf.get_rect()
+        pygame.draw.rect(surf, BOX, local, border_radius=12)
+        pygame.draw.rect(surf, GREY, local, width=2, border_radius=12)
+        surf.blit(render_text(font_small, "Room Editor", WHITE), (12, 10))
+        surf.blit(render_text(font_tiny, "Exits (tick to allow):", GREY), (12, 48))
+        for d, cx, cy in checkboxes(0, 0):
+            pygame.draw.rect(surf, WHITE, (cx, cy, box_size, box_size), width=2, border_radius=4)
+            surf.blit(render_text(font_tiny, d, WHITE), (cx + box_size + 8, cy - 2))
+
+    screen.blit(LAYERS.get(("room_editor",), rect_panel.size, paint), rect_panel)
 
-    pairs = [("n","ne"), ("e","se"), ("s","sw"), ("w","nw")]
-    for i, (d1, d2) in enumerate(pairs):
-        for j, d in enumerate((d1, d2)):
-            cx = col1_x if j == 0 else col2_x
-            cy = start_y + i * step_y
-            rect = pygame.Rect(cx, cy, box_size, box_size)
-            pygame.draw.rect(screen, WHITE, rect, width=2, border_radius=4)
-            if exits[d]:
-                pygame.draw.line(screen, WHITE, (cx+4, cy+10),
-                                 (cx+9, cy+15), 2)
-                pygame.draw.line(screen, WHITE, (cx+9, cy+15),
-                                 (cx+16, cy+5), 2)
-            lab = font_tiny.render(d, True, WHITE)
-            screen.blit(lab, (cx + box_size + 8, cy - 2))
-            hit[d] = rect
+    hit = {}
+    for d, cx, cy in checkboxes(x0, y0):
+        if exits[d]:
+            pygame.draw.line(screen, WHITE, (cx+4, cy+10),
+                             (cx+9, cy+15), 2)
+            pygame.draw.line(screen, WHITE, (cx+9, cy+15),
+                             (cx+16, cy+5), 2)
+        hit[d] = pygame.Rect(cx, cy, box_size, box_size)
     return hit, rect_panel
 
 
 def draw_description_box(x0, y0, w, h):
-    global caret_visible, caret_timer
     panel_rect = pygame.Rect(x0, y0, w, h)
 
     focused_col = (120, 200, 255) if desc_active else GREY
-    pygame.draw.rect(screen, BOX, panel_rect, border_radius=12)
-    pygame.draw.rect(screen, focused_col, panel_rect, width=2, border_radius=12)
-    label = font_small.render("Description", True, WHITE)
-    screen.blit(label, (x0 + 12, y0 + 8))
 
-    inner = pygame.Rect(x0 + 12, y0 + 40, w - 24, h - 52)
-    pygame.draw.rect(screen, INPUT_BG, inner, border_radius=8)
-    pygame.draw.rect(screen, INPUT_BORDER, inner, width=1, border_radius=8)
+    def paint(surf):
+        local = surf.get_rect()
+        pygame.draw.rect(surf, BOX, local, border_radius=12)
+        pygame.draw.rect(surf, focused_col, local, width=2, border_radius=12)
+        surf.blit(render_text(font_small, "Description", WHITE), (12, 8))
+        inner = pygame.Rect(12, 40, w - 24, h - 52)
+        pygame.draw.rect(surf, INPUT_BG, inner, border_radius=8)
+        pygame.draw.rect(surf, INPUT_BORDER, inner, width=1, border_radius=8)
 
-    lines = wrap_text(description_text, font_tiny, inner.w - 10)
-    y_cursor = inner.y + 6
-    for line in lines[-200:]:
-        img = font_tiny.render(line, True, WHITE)
-        screen.blit(img, (inner.x + 6, y_cursor))
-        y_cursor += img.get_height() + 2
+    frame = LAYERS.get(("description", w, h, focused_col), panel_rect.size, paint)
+    screen.blit(frame, panel_rect)
 
-    caret_timer += clock.get_time()
-    if caret_timer >= 500:
-        caret_visible = not caret_visible
-        caret_timer = 0
+    inner = pygame.Rect(x0 + 12, y0 + 40, w - 24, h - 52)
+    text_rect = pygame.Rect(inner.x + 6, inner.y + 6, inner.w - 12, inner.h - 8)
 
-    if desc_active and caret_visible:
-        last_line = lines[-1] if lines else ""
-        caret_x = inner.x + 6 + font_tiny.size(last_line)[0]
-        caret_y = inner.y + 6 + (len(lines)-1) * (font_tiny.get_height() + 2)
-        pygame.draw.line(
-            screen, WHITE,
-            (caret_x, caret_y),
-            (caret_x, caret_y + font_tiny.get_height()),
-            1
-        )
+    DESC_EDITOR.draw(screen, text_rect, WHITE, caret=desc_active and caret_visible)
 
     update_center = (x0 + w//2, y0 + h + 30)
     update_rect = draw_button(
@@ -371,42 +447,49 @@ def draw_description_box(x0, y0, w, h):
         padding=(20,10), radius=10, font=font_tiny
     )
 
-    return panel_rect, update_rect
+    return panel_rect, update_rect, text_rect
+
+
+def draw_small_button(surf, rect, text, color, radius=6):
+    pygame.draw.rect(surf, color, rect, border_radius=radius)
+    label = render_text(font_tiny, text, INK_DARK)
+    surf.blit(label, label.get_rect(center=rect.center))
 
 
 def draw_items_panel(x0, y0, w, h):
     panel_rect = pygame.Rect(x0, y0, w, h)
-    pygame.draw.rect(screen, BOX, panel_rect, border_radius=12)
-    pygame.draw.rect(screen, GREY, panel_rect, width=2, border_radius=12)
 
-    title = font_small.render("Items", True, WHITE)
-    screen.blit(title, (x0 + 12, y0 + 10))
+    def paint(surf):
+        local = surf.get_rect()
+        pygame.draw.rect(surf, BOX, local, border_radius=12)
+        pygame.draw.rect(surf, GREY, local, width=2, border_radius=12)
+        surf.blit(render_text(font_small, "Items", WHITE), (12, 10))
+        draw_small_button(surf, pygame.Rect(w - 140, 8, 120, 28), "+ New Item", HOVER)
+        list_box = pygame.Rect(12, 48, w - 24, h - 60)
+        pygame.draw.rect(surf, INPUT_BG, list_box, border_radius=6)
+        pygame.draw.rect(surf, INPUT_BORDER, list_box, width=1, border_radius=6)
+
+    screen.blit(LAYERS.get(("items", w, h), panel_rect.size, paint), panel_rect)
 
     new_top_btn = pygame.Rect(x0 + w - 140, y0 + 8, 120, 28)
     mouse_pos = pygame.mouse.get_pos()
-    hov_top = new_top_btn.collidepoint(mouse_pos)
-    pygame.draw.rect(screen, CYAN if hov_top else HOVER, new_top_btn, border_radius=6)
-    txt_new = font_tiny.render("+ New Item", True, INK_DARK)
-    screen.blit(txt_new, txt_new.get_rect(center=new_top_btn.center))
+    if new_top_btn.collidepoint(mouse_pos):
+        draw_small_button(screen, new_top_btn, "+ New Item", CYAN)
 
     list_rect = pygame.Rect(x0 + 12, y0 + 48, w - 24, h - 60)
-    pygame.draw.rect(screen, INPUT_BG, list_rect, border_radius=6)
-    pygame.draw.rect(screen, INPUT_BORDER, list_rect, width=1, border_radius=6)
-
-    flat = []
-    flatten_items_for_display(items, [], 0, flat)
 
     plus_buttons = []
+    toggles = []
     row_y = list_rect.y + 6
     row_x = list_rect.x + 6
     row_h = font_tiny.get_height() + 8
+    page = max(1, (list_rect.h - 6) // row_h)
 
-    for row in flat:
-        label_text = row["text"]
-        path = row["path"]
-
-        txt_img = font_tiny.render(label_text, True, WHITE)
+    for row in ITEM_VIEW.visible(page):
+        txt_img = render_text(font_tiny, row.text, WHITE)
         screen.blit(txt_img, (row_x, row_y))
+        if row.container:
+            toggles.append((txt_img.get_rect(topleft=(row_x, row_y)), row.path))
 
         plus_rect = pygame.Rect(
             row_x + txt_img.get_width() + 10,
@@ -414,17 +497,19 @@ def draw_items_panel(x0, y0, w, h):
             28,
             22
         )
-        row["plus_rect"] = plus_rect
         hov_plus = plus_rect.collidepoint(mouse_pos)
-        pygame.draw.rect(screen, CYAN if hov_plus else HOVER, plus_rect, border_radius=4)
-        plus_label = font_tiny.render("+", True, INK_DARK)
-        screen.blit(plus_label, plus_label.get_rect(center=plus_rect.center))
+        draw_small_button(screen, plus_rect, "+", CYAN if hov_plus else HOVER, radius=4)
 
-        plus_buttons.append((plus_rect, path))
+        plus_buttons.append((plus_rect, row.path))
 
         row_y += row_h
-        if row_y > list_rect.bottom - row_h:
-            break
+
+    total = len(ITEM_VIEW.rows)
+    if total > page:
+        track = list_rect.inflate(0, -8)
+        thumb_h = max(12, track.h * page // total)
+        thumb_y = track.y + (track.h - thumb_h) * ITEM_VIEW.top // (total - page)
+        pygame.draw.rect(screen, GREY, (list_rect.right - 6, thumb_y, 4, thumb_h), border_radius=2)
 
     popup_info = None
     if adding_mode:
@@ -433,50 +518,45 @@ def draw_items_panel(x0, y0, w, h):
         popup_x = x0 + 20
         popup_y = y0 + h//2 - popup_h//2
         popup_rect = pygame.Rect(popup_x, popup_y, popup_w, popup_h)
-
-        pygame.draw.rect(screen, BOX, popup_rect, border_radius=12)
-        pygame.draw.rect(screen, CYAN, popup_rect, width=2, border_radius=12)
-
-        ttl = font_small.render("Add Item", True, WHITE)
-        screen.blit(ttl, (popup_x + 12, popup_y + 8))
-
-        name_label = font_tiny.render("Name:", True, GREY)
-        screen.blit(name_label, (popup_x + 12, popup_y + 40))
-        name_rect = pygame.Rect(popup_x + 80, popup_y + 36, popup_w - 92, 26)
-        pygame.draw.rect(screen, INPUT_BG, name_rect, border_radius=6)
-        pygame.draw.rect(
-            screen,
-            INPUT_ACTIVE_BORDER if active_field == "name" else INPUT_BORDER,
-            name_rect, width=1, border_radius=6
-        )
-        name_img = font_tiny.render(new_item_name, True, WHITE)
-        screen.blit(name_img, (name_rect.x + 6, name_rect.y + 4))
-
-        desc_label = font_tiny.render("Desc:", True, GREY)
-        screen.blit(desc_label, (popup_x + 12, popup_y + 74))
-        desc_rect = pygame.Rect(popup_x + 80, popup_y + 70, popup_w - 92, 40)
-        pygame.draw.rect(screen, INPUT_BG, desc_rect, border_radius=6)
-        pygame.draw.rect(
-            screen,
-            INPUT_ACTIVE_BORDER if active_field == "desc" else INPUT_BORDER,
-            desc_rect, width=1, border_radius=6
-        )
-
-        d_lines = wrap_text(new_item_desc, font_tiny, desc_rect.w - 10)
-        line_y = desc_rect.y + 4
-        for ln in d_lines[:3]:
-            img = font_tiny.render(ln, True, WHITE)
-            screen.blit(img, (desc_rect.x + 6, line_y))
-            line_y += font_tiny.get_height() + 2
-
-        add_btn = pygame.Rect(popup_x + popup_w - 180, popup_y + popup_h - 40, 80, 28)
-        cancel_btn = pygame.Rect(popup_x + popup_w - 90, popup_y + popup_h - 40, 80, 28)
+        # field and button rects relative to the popup
+        name_box = pygame.Rect(80, 36, popup_w - 92, 26)
+        desc_box = pygame.Rect(80, 70, popup_w - 92, 40)
+        buttons = [(pygame.Rect(popup_w - 180, popup_h - 40, 80, 28), "Add"),
+                   (pygame.Rect(popup_w - 90, popup_h - 40, 80, 28), "Cancel")]
+
+        def paint_popup(surf):
+            local = surf.get_rect()
+            pygame.draw.rect(surf, BOX, local, border_radius=12)
+            pygame.draw.rect(surf, CYAN, local, width=2, border_radius=12)
+            surf.blit(render_text(font_small, "Add Item", WHITE), (12, 8))
+            surf.blit(render_text(font_tiny, "Name:", GREY), (12, 40))
+            surf.blit(render_text(font_tiny, "Desc:", GREY), (12, 74))
+            for box in (name_box, desc_box):
+                pygame.draw.rect(surf, INPUT_BG, box, border_radius=6)
+                pygame.draw.rect(surf, INPUT_BORDER, box, width=1, border_radius=6)
+            for rct, lbl in buttons:
+                draw_small_button(surf, rct, lbl, HOVER)
+
+        screen.blit(LAYERS.get(("add_item", popup_w, popup_h), popup_rect.size, paint_popup),
+                    popup_rect)
+
+        name_rect = name_box.move(popup_x, popup_y)
+        desc_rect = desc_box.move(popup_x, popup_y)
+        active_rect = {"name": name_rect, "desc": desc_rect}.get(active_field)
+        if active_rect is not None:
+            pygame.draw.rect(screen, INPUT_ACTIVE_BORDER, active_rect, width=1, border_radius=6)
+
+        NAME_EDITOR.draw(screen, field_text_rect(name_rect), WHITE,
+                         caret=active_field == "name" and caret_visible)
+        ITEM_DESC_EDITOR.draw(screen, field_text_rect(desc_rect), WHITE,
+                              caret=active_field == "desc" and caret_visible)
+
+        add_btn = buttons[0][0].move(popup_x, popup_y)
+        cancel_btn = buttons[1][0].move(popup_x, popup_y)
 
         for rct, lbl in [(add_btn, "Add"), (cancel_btn, "Cancel")]:
-            hov = rct.collidepoint(mouse_pos)
-            pygame.draw.rect(screen, CYAN if hov else HOVER, rct, border_radius=6)
-            txt = font_tiny.render(lbl, True, INK_DARK)
-            screen.blit(txt, txt.get_rect(center=rct.center))
+            if rct.collidepoint(mouse_pos):
+                draw_small_button(screen, rct, lbl, CYAN)
 
         popup_info = {
             "popup_rect": popup_rect,
@@ -490,6 +570,9 @@ def draw_items_panel(x0, y0, w, h):
         "panel_rect": panel_rect,
         "new_top_btn": new_top_btn,
         "plus_buttons": plus_buttons,
+        "toggles": toggles,
+        "list_rect": list_rect,
+        "page": page,
         "popup": popup_info,
     }
 
@@ -498,20 +581,93 @@ def shifted(rect, dy):
     return pygame.Rect(rect.x, rect.y + dy, rect.w, rect.h)
 
 
+def screen_panels():
+    # regions redrawn separately in "dirty" redraw mode; together they cover the screen
+    if current_screen != "map_builder":
+        return {"menu": screen.get_rect()}
+    return {
+        "header":  pygame.Rect(0, 0, WIDTH, 140),
+        "column":  pygame.Rect(0, 140, 330, HEIGHT - 140),   # room editor, description, items
+        "compass": pygame.Rect(330, 140, WIDTH - 330, HEIGHT - 350),
+        "bottom":  pygame.Rect(330, HEIGHT - 210, WIDTH - 330, 210),  # toast + buttons
+    }
+
+
+def editor_key(ed):
+    return (ed.text, ed.cursor, ed.anchor, ed.first_line, ed.scroll_x)
+
+
+def panel_keys(mouse_pos):
+    # what each panel is showing; in "dirty" mode a panel is repainted only
+    # when its key changes. Things drawn across two panels (the minimap, the
+    # status line, the toast, the column scrolled up under the header) go in
+    # both keys.
+    panels = screen_panels()
+    hover = {name: tuple(tuple(r) for r in hot_rects
+                         if r.collidepoint(mouse_pos) and r.colliderect(rect))
+             for name, rect in panels.items()}
+    if current_screen != "map_builder":
+        return {"menu": (current_screen, hover["menu"])}
+    minimap = (x, y, z, tuple(exits.values()), minimap_version)
+    toast = save_message if save_message and save_message_ticks > 0 else None
+    column = (current_screen, x, y, z, pending_move, scroll_offset, tuple(exits.values()),
+              desc_active, desc_active and caret_visible, editor_key(DESC_EDITOR),
+              adding_mode, active_field, tuple(adding_parent_path),
+              active_field is not None and caret_visible,
+              editor_key(NAME_EDITOR), editor_key(ITEM_DESC_EDITOR),
+              ITEM_VIEW.version, ITEM_VIEW.top, toast, hover["column"])
+    return {
+        "header": (current_screen, x, y, z, scroll_offset, minimap, hover["header"],
+                   column if scroll_offset < 0 else None),
+        "column": column,
+        "compass": (current_screen, pending_move, minimap, toast, hover["compass"]),
+        "bottom": (current_screen, pending_move is None, toast, hover["bottom"]),
+    }
+
+
+def next_wakeup_ms():
+    # how long "dirty" mode may sleep with no input: until the caret blinks or the toast ends
+    waits = []
+    if current_screen == "map_builder" and (desc_active or active_field):
+        waits.append(500 - caret_timer)
+    if save_message and save_message_ticks > 0:
+        waits.append(save_message_ticks * 1000 / 60)
+    return min(waits) if waits else None
+
+
 # --- Main loop ---
 running = True
 prev_mouse_pressed = False
+items_panel_obj = None  # last frame's items panel, for wheel scrolling over the list
+drawn_keys = {}  # panel -> key it was last painted with ("dirty" mode)
+repaint_now = False  # this frame changed what a panel shows; paint it without waiting
 
 while running:
+    if REDRAW_MODE == "dirty":
+        events = wait_events(0 if repaint_now else next_wakeup_ms())
+    else:
+        events = pygame.event.get()
     mouse_pos_raw = pygame.mouse.get_pos()
     mouse_pressed = pygame.mouse.get_pressed()[0]
-    clicked_this_frame = mouse_pressed and not prev_mouse_pressed
+    # a press counts even if it was released again before this frame ran
+    clicked_this_frame = (mouse_pressed and not prev_mouse_pressed) or any(
+        e.type == pygame.MOUSEBUTTONDOWN and e.button == 1 for e in events)
+
+    for event in events:
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            drawn_keys = {}
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
+        elif event.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+            LAYERS.clear()  # cached widget layers were painted for the old display
+            drawn_keys = {}
+
+        elif event.type == pygame.QUIT:
             running = False
 
         elif event.type == pygame.MOUSEWHEEL and current_screen == "map_builder":
+            if items_panel_obj and items_panel_obj["list_rect"].collidepoint(mouse_pos_raw):
+                ITEM_VIEW.scroll(-event.y * 3, items_panel_obj["page"])
+                continue
             scroll_offset += event.y * 40
             if scroll_offset > 0:
                 scroll_offset = 0
@@ -523,61 +679,44 @@ while running:
             elif current_screen == "map_builder":
                 # typing into room description (only if it's active AND not in item popup)
                 if desc_active and not adding_mode:
-                    if event.key == pygame.K_BACKSPACE:
-                        if description_text:
-                            description_text = description_text[:-1]
-                        continue
-                    elif event.key == pygame.K_RETURN:
-                        description_text += "\n"
+                    if DESC_EDITOR.handle_key(event):
+                        caret_visible, caret_timer = True, 0
                         continue
-                    else:
-                        if event.unicode and (
-                            32 <= ord(event.unicode) <= 126 or ord(event.unicode) >= 160
-                        ):
-                            if len(description_text) < 2000:
-                                description_text += event.unicode
-                            continue
 
                 # typing into popup (adding item)
                 if adding_mode:
                     if active_field == "name":
-                        if event.key == pygame.K_BACKSPACE:
-                            if new_item_name:
-                                new_item_name = new_item_name[:-1]
-                            continue
-                        elif event.key == pygame.K_RETURN:
+                        if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
                             active_field = "desc"
                             continue
-                        else:
-                            if event.unicode and (
-                                32 <= ord(event.unicode) <= 126 or ord(event.unicode) >= 160
-                            ):
-                                if len(new_item_name) < 60:
-                                    new_item_name += event.unicode
-                                continue
+                        elif NAME_EDITOR.handle_key(event):
+                            caret_visible, caret_timer = True, 0
+                            continue
 
                     elif active_field == "desc":
-                        if event.key == pygame.K_BACKSPACE:
-                            if new_item_desc:
-                                new_item_desc = new_item_desc[:-1]
+                        if ITEM_DESC_EDITOR.handle_key(event):
+                            caret_visible, caret_timer = True, 0
                             continue
-                        elif event.key == pygame.K_RETURN:
-                            if len(new_item_desc) < 2000:
-                                new_item_desc += "\n"
-                            continue
-                        else:
-                            if event.unicode and (
-                                32 <= ord(event.unicode) <= 126 or ord(event.unicode) >= 160
-                            ):
-                                if len(new_item_desc) < 2000:
-                                    new_item_desc += event.unicode
-                                continue
 
+    caret_timer += clock.get_time()
+    if caret_timer >= 500:
+        caret_visible = not caret_visible
+        caret_timer = 0
+
+    if REDRAW_MODE == "dirty":
+        # the frame below still runs (it handles the clicks), but only paints
+        # inside the panels whose keys changed
+        keys = panel_keys(mouse_pos_raw)
+        panels = screen_panels()
+        dirty = [panels[name] for name, key in keys.items() if drawn_keys.get(name, ()) != key]
+        screen.set_clip(dirty[0].unionall(dirty[1:]) if dirty else pygame.Rect(0, 0, 0, 0))
+        drawn_keys = keys
+    hot_rects.clear()
     screen.fill(BG)
 
     # ========== MENU SCREEN ==========
     if current_screen == "menu":
-        title = font_big.render("Cog World", True, CYAN)
+        title = render_text(font_big, "Cog World", CYAN)
         screen.blit(title, title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 80)))
 
         play_rect_main = draw_button(
@@ -586,6 +725,10 @@ while running:
             mouse_pos_raw
         )
         if clicked_this_frame and play_rect_main.collidepoint(mouse_pos_raw):
+            if WORLD_JOURNAL is not None:
+                WORLD_JOURNAL.close()
+            write_graph()  # game-main.py loads it for goto
+            WORLD.close()
             subprocess.Popen([sys.executable, "game-main.py"])
             pygame.quit()
             sys.exit()
@@ -599,12 +742,12 @@ while running:
             current_screen = "map_builder"
             load_tile()
 
-        tip = font_small.render("Press ESC or Q to exit", True, GREY)
+        tip = render_text(font_small, "Press ESC or Q to exit", GREY)
         screen.blit(tip, tip.get_rect(center=(WIDTH // 2, HEIGHT - 60)))
 
     # ========== MAP BUILDER SCREEN ==========
     elif current_screen == "map_builder":
-        title = font_big.render("Map Builder", True, CYAN)
+        title = render_text(font_big, "Map Builder", CYAN)
         screen.blit(title, (40, 30))
 
         back_rect = draw_button(
@@ -623,23 +766,22 @@ while running:
             active_field = None
 
         coords_text = f"Coords: (x={x}, y={y}, z={z})"
-        screen.blit(font_small.render(coords_text, True, OK), (40, 150))
+        screen.blit(render_text(font_small, coords_text, OK), (40, 150))
 
         status = (
             f"Pending: {pending_move} (press Next to confirm)"
             if pending_move else
             "Click a direction"
         )
-        screen.blit(font_small.render(status, True, GREY), (320, 200))
+        screen.blit(render_text(font_small, status, GREY), (320, 200))
 
         scroll_hint = "Mouse wheel to scroll list"
-        screen.blit(font_tiny.render(scroll_hint, True, GREY), (40, 180))
+        screen.blit(render_text(font_tiny, scroll_hint, GREY), (40, 180))
 
         # SCROLL COLUMN positions
         y_room   = 200 + scroll_offset
         # dynamic height for description
-        max_width = 260 - 24
-        lines = wrap_text(description_text, font_tiny, max_width)
+        lines = DESC_EDITOR.lines(DESC_TEXT_W)
         line_h = font_tiny.get_height() + 2
         needed_h = 40 + len(lines) * line_h + 20
         desc_h = max(220, min(needed_h, 420))
@@ -648,50 +790,58 @@ while running:
         y_items  = y_desc + desc_h + 70  # push items down after bigger desc
 
         editor_hit, editor_rect = draw_room_editor(40, y_room)
-        desc_panel_rect, update_rect = draw_description_box(40, y_desc, 260, desc_h)
+        desc_panel_rect, update_rect, desc_text_rect = draw_description_box(40, y_desc, 260, desc_h)
         items_panel_obj = draw_items_panel(40, y_items, 260, 260)
 
         # Compass (fixed)
         compass_center = (WIDTH // 2 + 120, HEIGHT // 2 + 40)
         hit_rects = draw_compass(compass_center, 140, mouse_pos_raw)
+        draw_minimap(WIDTH - 40 - (MINIMAP_RADIUS * 2 + 1) * 30, 110)
 
         # handle clicks in scroll column
         if clicked_this_frame:
             if adding_mode and items_panel_obj["popup"]:
                 pop = items_panel_obj["popup"]
+                extend = bool(pygame.key.get_mods() & pygame.KMOD_SHIFT)
                 if shifted(pop["name_rect"], -scroll_offset).collidepoint(mouse_pos_raw):
                     active_field = "name"
+                    NAME_EDITOR.click(mouse_pos_raw, field_text_rect(pop["name_rect"]), select=extend)
                     beep()
 
                 elif shifted(pop["desc_rect"], -scroll_offset).collidepoint(mouse_pos_raw):
                     active_field = "desc"
+                    ITEM_DESC_EDITOR.click(mouse_pos_raw, field_text_rect(pop["desc_rect"]),
+                                           select=extend)
                     beep()
 
                 elif shifted(pop["add_btn"], -scroll_offset).collidepoint(mouse_pos_raw):
                     ok = add_item_under_path(
                         adding_parent_path,
-                        new_item_name,
-                        new_item_desc
+                        NAME_EDITOR.text,
+                        ITEM_DESC_EDITOR.text
                     )
                     if ok:
                         beep()
                     adding_mode = False
                     active_field = None
-                    new_item_name = ""
-                    new_item_desc = ""
+                    NAME_EDITOR.set_text("")
+                    ITEM_DESC_EDITOR.set_text("")
                     adding_parent_path = []
 
                 elif shifted(pop["cancel_btn"], -scroll_offset).collidepoint(mouse_pos_raw):
                     beep()
                     adding_mode = False
                     active_field = None
-                    new_item_name = ""
-                    new_item_desc = ""
+                    NAME_EDITOR.set_text("")
+                    ITEM_DESC_EDITOR.set_text("")
                     adding_parent_path = []
             else:
                 if shifted(desc_panel_rect, -scroll_offset).collidepoint(mouse_pos_raw):
                     if not desc_active:
                         beep()
+                    if desc_text_rect.collidepoint(mouse_pos_raw):
+                        DESC_EDITOR.click(mouse_pos_raw, desc_text_rect,
+                                          select=bool(pygame.key.get_mods() & pygame.KMOD_SHIFT))
                     desc_active = True
                     adding_mode = False
                     active_field = None
@@ -705,6 +855,7 @@ while running:
                     for d, r in editor_hit.items():
                         if shifted(r, -scroll_offset).collidepoint(mouse_pos_raw):
                             exits[d] = not exits[d]
+                            record_tile_event({"t": "exit", "d": d, "v": exits[d]})
                             beep()
                             did_click_exit = True
                             break
@@ -714,8 +865,8 @@ while running:
                             beep()
                             adding_mode = True
                             adding_parent_path = []
-                            new_item_name = ""
-                            new_item_desc = ""
+                            NAME_EDITOR.set_text("")
+                            ITEM_DESC_EDITOR.set_text("")
                             active_field = "name"
                             desc_active = False
 
@@ -726,14 +877,22 @@ while running:
                                     beep()
                                     adding_mode = True
                                     adding_parent_path = path[:]
-                                    new_item_name = ""
-                                    new_item_desc = ""
+                                    NAME_EDITOR.set_text("")
+                                    ITEM_DESC_EDITOR.set_text("")
                                     active_field = "name"
                                     desc_active = False
                                     clicked_plus = True
                                     break
 
-                            if not clicked_plus:
+                            clicked_toggle = False
+                            for tr, path in items_panel_obj["toggles"]:
+                                if shifted(tr, -scroll_offset).collidepoint(mouse_pos_raw):
+                                    ITEM_VIEW.toggle(path)  # open/close a container
+                                    beep()
+                                    clicked_toggle = True
+                                    break
+
+                            if not clicked_plus and not clicked_toggle:
                                 desc_active = False
                                 active_field = None
 
@@ -782,13 +941,25 @@ while running:
             color_for_toast = OK
             if save_message.startswith("Load error"):
                 color_for_toast = WARN
-            toast = font_small.render(save_message, True, color_for_toast)
+            toast = render_text(font_small, save_message, color_for_toast)
             screen.blit(toast, toast.get_rect(center=(WIDTH // 2, HEIGHT - 170)))
-            save_message_ticks -= 1
-
-    pygame.display.flip()
-    dt = clock.tick(60)
+            save_message_ticks -= max(1, clock.get_time() * 60 // 1000)  # counted in 60 fps frames
+
+    if REDRAW_MODE == "dirty":
+        screen.set_clip(None)
+        if dirty:
+            pygame.display.update(dirty)
+        # a click, a toast running out: show it now rather than at the next event
+        repaint_now = panel_keys(mouse_pos_raw) != drawn_keys
+        dt = clock.tick()
+    else:
+        pygame.display.flip()
+        dt = clock.tick(60)
     prev_mouse_pressed = mouse_pressed
 
+if WORLD_JOURNAL is not None:
+    WORLD_JOURNAL.close()  # folds pending edits into their tiles
+write_graph()
+WORLD.close()
 pygame.quit()
 sys.exit()
@@ -0,0 +1,145 @@
+"""Name index over a nested item list (a room's items or the inventory).
+
+Items are the usual {"name", "desc", "contains": [...]} dicts. The index
+maps a normalised name to every item with that name, wherever it is nested,
+and remembers each item's parent, so a lookup is a dict hit plus a walk up
+the (short) parent chain instead of a scan of the whole tree.
+
+The index wraps the list it was built from: go through add()/remove() to
+change the list, and the index stays in step.
+"""
+
+
+def norm_name(name):
+    return " ".join(str(name).lower().split())
+
+
+class ItemNode:
+    __slots__ = ("item", "parent", "depth")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.parent = parent  # ItemNode, or None for top-level items
+        self.depth = 0 if parent is None else parent.depth + 1
+
+    @property
+    def name(self):
+        return self.item.get("name", "???")
+
+    def name_path(self):
+        path = []
+        node = self
+        while node is not None:
+            path.append(node.item.get("name", ""))
+            node = node.parent
+        return path[::-1]
+
+    def where(self):
+        return "here" if self.parent is None else f"in the {self.parent.name}"
+
+    def is_inside(self, other):
+        node = self.parent
+        while node is not None:
+            if node is other:
+                return True
+            node = node.parent
+        return False
+
+
+class ItemIndex:
+    def __init__(self, items_list):
+        self.items = items_list
+        self.by_name = {}  # normalised name -> [ItemNode, ...]
+        self.nodes = {}    # id(item) -> ItemNode
+        for it in items_list:
+            self._index(it, None)
+
+    def _index(self, item, parent):
+        if not isinstance(item, dict):
+            return
+        node = ItemNode(item, parent)
+        self.nodes[id(item)] = node
+        self.by_name.setdefault(norm_name(item.get("name", "")), []).append(node)
+        kids = item.get("contains")
+        if isinstance(kids, list):
+            for child in kids:
+                self._index(child, node)
+
+    def _unindex(self, item):
+        node = self.nodes.pop(id(item), None)
+        if node is None:
+            return
+        key = norm_name(item.get("name", ""))
+        bucket = self.by_name.get(key, [])
+        for i, n in enumerate(bucket):
+            if n is node:
+                bucket.pop(i)
+                break
+        if not bucket:
+            self.by_name.pop(key, None)
+        kids = item.get("contains")
+        if isinstance(kids, list):
+            for child in kids:
+                self._unindex(child)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def find(self, name, inside=None):
+        """Every node called `name`, optionally only those inside a container
+        called `inside` (at any depth). Shallowest first."""
+        found = self.by_name.get(norm_name(name), [])
+        if inside is not None:
+            containers = self.by_name.get(norm_name(inside), [])
+            found = [n for n in found if any(n.is_inside(c) for c in containers)]
+        return sorted(found, key=lambda n: n.depth)
+
+    def resolve(self, name, inside=None):
+        """(node, []) for a clear match, (None, candidates) if it's ambiguous,
+        (None, []) if there's nothing by that name.
+
+        The shallowest matches win; several of them only count as ambiguous
+        when they sit in different places (two coins in one chest is fine).
+        """
+        found = self.find(name, inside)
+        if not found:
+            return None, []
+        best = {}
+        for n in found:
+            if n.depth == found[0].depth:
+                best.setdefault(id(n.parent), n)  # one per container
+        if len(best) > 1:
+            return None, list(best.values())
+        return found[0], []
+
+    def item_path(self, node):
+        """[[name, position in its list], ...] from the top level down to node."""
+        path = []
+        while node is not None:
+            siblings = self.items if node.parent is None else node.parent.item.get("contains", [])
+            pos = next(i for i, it in enumerate(siblings) if it is node.item)
+            path.append([node.item.get("name", ""), pos])
+            node = node.parent
+        return path[::-1]
+
+    def remove(self, node):
+        """Take node's item (and everything in it) out of the tree."""
+        siblings = self.items if node.parent is None else node.parent.item.get("contains", [])
+        for i, it in enumerate(siblings):
+            if it is node.item:
+                siblings.pop(i)
+                break
+        self._unindex(node.item)
+        return node.item
+
+    def add(self, item, parent=None):
+        """Append item to the top level, or into parent (an ItemNode)."""
+        if parent is None:
+            self.items.append(item)
+        else:
+            kids = parent.item.get("contains")
+            if not isinstance(kids, list):
+                kids = parent.item["contains"] = []
+            kids.append(item)
+        self._index(item, parent)
+        return self.nodes.get(id(item))
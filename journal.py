@@ -0,0 +1,254 @@
+"""Event-sourced persistence: an append-only journal plus snapshots.
+
+Instead of rewriting a whole document for every change, each change is one
+small JSON line in a .journal file. State = newest snapshot + the journal
+lines after it. When a journal grows past `compact_bytes` the current state
+is written out as a new snapshot and the journal starts over.
+
+  Journal            - the append-only file itself (seq-numbered JSON lines)
+  JournaledDocument  - one document (player-1.json) + its journal
+  WorldJournal       - map builder edits to tiles in a world store
+
+Every event carries a sequence number, and snapshots remember the last one
+they include, so replaying after a crash never applies an event twice.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+from saver import write_atomic
+from world_store import clone_json
+from room_model import SCHEMA_VERSION
+from tile_codec import encode, load_file
+
+EXIT_NAMES = ["n", "ne", "e", "se", "s", "sw", "w", "nw"]
+
+
+class Journal:
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.last_seq = 0
+        self.lock = threading.Lock()
+        good_end = self._scan()
+        self.f = open(path, "ab")
+        if self.f.tell() != good_end:
+            self.f.truncate(good_end)  # drop a torn last line
+
+    def _scan(self):
+        if not os.path.exists(self.path):
+            return 0
+        good_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self.last_seq = max(self.last_seq, ev.get("seq", 0))
+                good_end += len(line)
+        return good_end
+
+    def events(self, after=0):
+        """Yield events with seq > after, oldest first ("base" markers skipped)."""
+        with self.lock:
+            self.f.flush()
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                ev = json.loads(line)
+                if ev.get("seq", 0) > after and ev.get("t") != "base":
+                    yield ev
+
+    def append(self, event):
+        with self.lock:
+            seq = self.last_seq + 1
+            rec = {"seq": seq}
+            rec.update(event)
+            self.f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+            self.f.flush()
+            if self.fsync:
+                os.fsync(self.f.fileno())
+            self.last_seq = seq
+            return seq
+
+    def size(self):
+        with self.lock:
+            return self.f.tell()
+
+    def reset(self):
+        """Start an empty journal. Call only once everything is in a snapshot."""
+        with self.lock:
+            self.f.close()
+            # keep the seq counter going so old snapshots still compare right
+            marker = json.dumps({"seq": self.last_seq, "t": "base"}) + "\n"
+            write_atomic(self.path, marker)
+            self.f = open(self.path, "ab")
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.flush()
+                os.fsync(self.f.fileno())
+                self.f.close()
+
+
+# -------------------------
+# APPLYING EVENTS
+# -------------------------
+
+def apply_player_event(doc, ev):
+    t = ev.get("t")
+    if t == "move":
+        doc["position"] = {"x": ev["x"], "y": ev["y"], "z": ev["z"]}
+    elif t == "pickup":
+        doc.setdefault("inventory", []).append(clone_json(ev["item"]))
+
+
+def new_tile(x, y, z):
+    return {
+        "coords": {"x": x, "y": y, "z": z},
+        "last_move": None,
+        "exits": {d: False for d in EXIT_NAMES},
+        "description": "",
+        "items": [],
+        "schema_version": SCHEMA_VERSION,
+    }
+
+
+def apply_tile_event(tile, ev):
+    t = ev.get("t")
+    if t == "exit":
+        tile.setdefault("exits", {})[ev["d"]] = bool(ev["v"])
+    elif t == "desc":
+        # splice: delete `del` chars at `i`, then insert `ins` there
+        text = str(tile.get("description", ""))
+        i = ev.get("i", len(text))
+        tile["description"] = text[:i] + ev.get("ins", "") + text[i + ev.get("del", 0):]
+    elif t == "item_add":
+        ref = tile.setdefault("items", [])
+        for idx in ev.get("path", []):
+            if not (0 <= idx < len(ref)):
+                return
+            ref = ref[idx].setdefault("contains", [])
+        ref.append(clone_json(ev["item"]))
+
+
+# -------------------------
+# ONE DOCUMENT (PLAYER FILE)
+# -------------------------
+
+class JournaledDocument:
+    """A JSON document whose changes go to `journal_path` as events.
+
+    The snapshot is the normal document file, with meta.journal_seq saying
+    which events it already contains, so the file stays readable by the
+    plain (non-journal) loaders too.
+    """
+
+    def __init__(self, path, journal_path, apply=apply_player_event,
+                 compact_bytes=64 * 1024, fsync=False, codec="json"):
+        self.path = path
+        self.codec = codec
+        self.apply = apply
+        self.compact_bytes = compact_bytes
+        self.journal = Journal(journal_path, fsync=fsync)
+        self.doc = None
+
+    def load(self, default):
+        """Snapshot (or `default` if there's no file) with the journal tail replayed."""
+        if os.path.exists(self.path):
+            doc = load_file(self.path)
+        else:
+            doc = clone_json(default)
+        seq = doc.get("meta", {}).get("journal_seq", 0)
+        for ev in self.journal.events(after=seq):
+            self.apply(doc, ev)
+        self.doc = doc
+        return doc
+
+    def record(self, event):
+        seq = self.journal.append(event)
+        self.apply(self.doc, clone_json(event))
+        if self.journal.size() > self.compact_bytes:
+            self.compact()
+        return seq
+
+    def compact(self):
+        meta = self.doc.setdefault("meta", {})
+        meta["journal_seq"] = self.journal.last_seq
+        meta["last_save"] = datetime.utcnow().isoformat() + "Z"
+        write_atomic(self.path, encode(self.doc, self.codec))
+        self.journal.reset()
+
+    def close(self):
+        self.journal.close()
+
+
+# -------------------------
+# WORLD TILES (MAP BUILDER)
+# -------------------------
+
+class WorldJournal:
+    """Map builder edits journaled per tile on top of a world store.
+
+    Tiles in the store act as the snapshot: each carries "journal_seq", the
+    last event already folded into it. compact() folds every pending event
+    into its tile, flushes the store and resets the journal.
+    """
+
+    def __init__(self, store, journal_path, compact_bytes=256 * 1024, fsync=False):
+        self.store = store
+        self.compact_bytes = compact_bytes
+        self.journal = Journal(journal_path, fsync=fsync)
+        self.pending = {}  # (x, y, z) -> [event, ...] not yet in the store
+        for ev in self.journal.events():
+            self.pending.setdefault(tuple(ev["at"]), []).append(ev)
+
+    def load(self, x, y, z):
+        """The tile as the store has it plus any journaled edits (None if neither)."""
+        tile = self.store.get(x, y, z)
+        events = self.pending.get((x, y, z))
+        if not events:
+            return tile
+        if tile is None:
+            tile = new_tile(x, y, z)
+        done = tile.get("journal_seq", 0)
+        for ev in events:
+            if ev["seq"] > done:
+                apply_tile_event(tile, ev)
+        return tile
+
+    def record(self, x, y, z, event):
+        ev = clone_json(event)  # the caller keeps editing its own objects
+        ev["at"] = [x, y, z]
+        ev["seq"] = self.journal.append(ev)
+        self.pending.setdefault((x, y, z), []).append(ev)
+        if self.journal.size() > self.compact_bytes:
+            self.compact()
+        return ev["seq"]
+
+    def save_tile(self, x, y, z, data):
+        """Write a whole tile (the "Save JSON" button); it supersedes its events."""
+        data = dict(data, journal_seq=self.journal.last_seq)
+        self.store.put(x, y, z, data)
+        self.store.flush()
+        self.pending.pop((x, y, z), None)
+
+    def compact(self):
+        for (x, y, z) in list(self.pending):
+            tile = self.load(x, y, z)
+            tile["journal_seq"] = self.journal.last_seq
+            self.store.put(x, y, z, tile)
+        self.store.flush()
+        self.pending.clear()
+        self.journal.reset()
+
+    def close(self, compact=True):
+        if compact and self.pending:
+            self.compact()
+        self.journal.close()
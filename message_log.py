@@ -0,0 +1,207 @@
+"""The game's message log: bounded in memory, scrollable, spilled to disk.
+
+The old log was a plain list that got re-wrapped in full every frame, so a
+long session meant a slow renderer. MessageLog keeps
+
+  entries - the newest `max_entries` messages, as logged
+  wrapped - wrapped lines for the entries looked at recently (LRU, capped)
+
+append() only queues the text (cheap, and safe from the saver thread); it
+is picked up on the next window() call from the render loop. An entry is
+wrapped the first time it's drawn and again only if the font or width
+changes. Drawing walks back from the bottom of the view, so a frame costs
+the same after five minutes or five hours.
+
+With a `spill_path`, entries pushed out of memory go to an append-only file
+(one JSON string per line) and their byte offsets to `spill_path + ".idx"`
+(8 bytes each), so entry n of the session is one seek away however far
+back you scroll. Without one, old entries are simply dropped.
+"""
+import os
+import json
+import struct
+from collections import deque, OrderedDict
+
+_OFFSET = struct.Struct("<Q")
+
+
+def wrap_text(text, font, max_width):
+    """Split text into lines no wider than max_width, measuring with font.size."""
+    space = font.size(" ")[0]
+    lines = []
+    current_line = []
+    current_width = 0
+
+    for word in text.split(" "):
+        word_width = font.size(word)[0]
+        if not current_line or current_width + space + word_width <= max_width:
+            current_width += (space if current_line else 0) + word_width
+            current_line.append(word)
+        else:
+            lines.append(" ".join(current_line))
+            current_line = [word]
+            current_width = word_width
+
+    if current_line:
+        lines.append(" ".join(current_line))
+
+    return lines if lines else [text]
+
+
+class MessageLog:
+    def __init__(self, initial=(), max_entries=2000, max_wrapped=1000, spill_path=None):
+        self.entries = deque()
+        self.max_entries = max_entries
+        self.base = 0           # session-wide number of entries[0]
+        self.pending = deque()  # appended but not taken in yet
+        self.wrapped = OrderedDict()  # entry number -> tuple of lines
+        self.max_wrapped = max_wrapped
+        self.layout = None      # (font, width) the wrapped lines are for
+        self.anchor = None      # (entry, line) at the bottom of the view; None = follow
+        self.spill = self.spill_idx = None
+        if spill_path:
+            # one file per session: a new run starts a new scrollback
+            self.spill = open(spill_path, "w+b")
+            self.spill_idx = open(spill_path + ".idx", "w+b")
+        for text in initial:
+            self.append(text)
+
+    # --- list-ish API, so message_log.append(...) keeps working ---
+
+    def append(self, text):
+        self.pending.append(text if isinstance(text, str) else str(text))
+
+    def extend(self, texts):
+        for text in texts:
+            self.append(text)
+
+    def __len__(self):
+        return self.base + len(self.entries) + len(self.pending)
+
+    def __iter__(self):
+        self._take_pending()
+        return iter(list(self.entries))
+
+    def __getitem__(self, i):
+        self._take_pending()
+        return self.entries[i]
+
+    # --- storage ---
+
+    def _take_pending(self):
+        while self.pending:
+            self.entries.append(self.pending.popleft())
+            if len(self.entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        text = self.entries.popleft()
+        if self.spill is not None:
+            self.spill.seek(0, os.SEEK_END)
+            self.spill_idx.seek(0, os.SEEK_END)
+            self.spill_idx.write(_OFFSET.pack(self.spill.tell()))
+            self.spill.write(json.dumps(text, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.base += 1
+
+    def first(self):
+        """Number of the oldest entry we can still show."""
+        return 0 if self.spill is not None else self.base
+
+    def count(self):
+        return self.base + len(self.entries)
+
+    def text(self, n):
+        if n >= self.base:
+            return self.entries[n - self.base]
+        self.spill.flush()
+        self.spill_idx.flush()
+        self.spill_idx.seek(n * _OFFSET.size)
+        (offset,) = _OFFSET.unpack(self.spill_idx.read(_OFFSET.size))
+        self.spill.seek(offset)
+        return json.loads(self.spill.readline())
+
+    def lines(self, n):
+        got = self.wrapped.get(n)
+        if got is None:
+            font, width = self.layout
+            got = self.wrapped[n] = tuple(wrap_text(self.text(n), font, width))
+            if len(self.wrapped) > self.max_wrapped:
+                self.wrapped.popitem(last=False)
+        else:
+            self.wrapped.move_to_end(n)
+        return got
+
+    def close(self):
+        for f in (self.spill, self.spill_idx):
+            if f is not None:
+                f.close()
+
+    # --- view ---
+
+    def _set_layout(self, font, width):
+        self._take_pending()
+        if self.layout != (font, width):
+            self.layout = (font, width)
+            self.wrapped.clear()
+            if self.anchor is not None:
+                self.anchor = (self.anchor[0], 0)  # keep the entry, lines have moved
+        if self.anchor is not None and self.anchor[0] < self.first():
+            self.anchor = (self.first(), 0)  # what we were looking at is gone
+
+    def _bottom(self):
+        n = self.count() - 1
+        return None if n < self.first() else (n, len(self.lines(n)) - 1)
+
+    def scrolled(self):
+        return self.anchor is not None
+
+    def _back(self, n, j, delta):
+        first = self.first()
+        while j < delta and n > first:
+            delta -= j + 1
+            n -= 1
+            j = len(self.lines(n)) - 1
+        return (n, j - delta) if j >= delta else (n, 0)
+
+    def _forward(self, n, j, delta):
+        last = self.count() - 1
+        while len(self.lines(n)) - 1 - j < delta and n < last:
+            delta -= len(self.lines(n)) - j
+            n += 1
+            j = 0
+        return n, min(len(self.lines(n)) - 1, j + delta)
+
+    def scroll(self, font, width, delta, rows=1):
+        """Move the view `delta` lines (positive = back in time), keeping a
+        full `rows`-line page on screen at the top of the log."""
+        self._set_layout(font, width)
+        pos = self.anchor or self._bottom()
+        if pos is None:
+            return
+        if delta > 0:
+            pos = max(self._back(*pos, delta), self._forward(self.first(), 0, rows - 1))
+        else:
+            pos = self._forward(*pos, -delta)
+        self.anchor = None if pos >= self._bottom() else pos
+
+    def scroll_to_bottom(self):
+        self.anchor = None
+
+    def window(self, font, width, rows):
+        """The `rows` wrapped lines that end at the bottom of the view, oldest first."""
+        self._set_layout(font, width)
+        pos = self.anchor or self._bottom()
+        if pos is None:
+            return []
+        n, j = pos
+        first = self.first()
+        out = []
+        while len(out) < rows and n >= first:
+            lines = self.lines(n)
+            j = min(j, len(lines) - 1)
+            take = min(rows - len(out), j + 1)
+            out.extend(reversed(lines[j + 1 - take:j + 1]))
+            n -= 1
+            j = 1 << 30  # the previous entry's last line, once clamped above
+        out.reverse()
+        return out
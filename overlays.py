@@ -0,0 +1,128 @@
+"""Copy-on-write room overlays: in-game changes kept apart from authored tiles.
+
+The map builder owns world_tiles/; the game never writes there. When a
+player picks something up (or, later, drops something) the change goes to a
+small per-room overlay file instead:
+
+    world_overlays/<scope>/00-01-00.json
+    {"removed": [[["old rock", 2], ["ring", 0]]], "added": [{"name": ..., ...}]}
+
+Items are identified by their path from the top of the room: the name and
+position at each level ("old rock", third item / "ring", first inside it).
+The position tells two chests apart; the name lets the path survive the
+authored tile being edited (if the item at that position is called
+something else now, the first one with the right name is used). Paths of
+plain names, from older overlay files, still work.
+`scope` is "world" for changes everybody sees, or a player name for
+per-player rooms.
+"""
+import os
+import json
+import threading
+
+from saver import write_atomic
+from world_store import tile_filename, clone_json
+
+OVERLAY_FOLDER = "world_overlays"
+
+
+def _norm(name):
+    return str(name).lower().strip()
+
+
+def _find(items_list, step):
+    # step: [name, position], or just a name; index into items_list or None
+    if isinstance(step, list) and len(step) == 2:
+        name, pos = step
+    else:
+        name, pos = step, None
+    name = _norm(name)
+    if (isinstance(pos, int) and 0 <= pos < len(items_list) and isinstance(items_list[pos], dict)
+            and _norm(items_list[pos].get("name", "")) == name):
+        return pos
+    for i, it in enumerate(items_list):
+        if isinstance(it, dict) and _norm(it.get("name", "")) == name:
+            return i
+    return None
+
+
+def remove_by_name_path(items_list, name_path):
+    """Pop and return the item at name_path, or None."""
+    ref = items_list
+    for depth, step in enumerate(name_path):
+        i = _find(ref, step)
+        if i is None:
+            return None
+        if depth == len(name_path) - 1:
+            return ref.pop(i)
+        kids = ref[i].get("contains")
+        if not isinstance(kids, list):
+            return None
+        ref = kids
+    return None
+
+
+class OverlayStore:
+    def __init__(self, folder=OVERLAY_FOLDER, scope="world"):
+        self.folder = os.path.join(folder, scope)
+        self.overlays = {}  # (x, y, z) -> overlay dict, loaded lazily
+        self.lock = threading.Lock()
+
+    def filename(self, x, y, z):
+        return os.path.join(self.folder, tile_filename(x, y, z))
+
+    def get(self, x, y, z):
+        key = (x, y, z)
+        with self.lock:
+            ov = self.overlays.get(key)
+            if ov is None:
+                ov = {"removed": [], "added": []}
+                path = self.filename(x, y, z)
+                if os.path.exists(path):
+                    try:
+                        with open(path, "r", encoding="utf-8") as f:
+                            ov.update(json.load(f))
+                    except (OSError, ValueError):
+                        pass  # unreadable overlay: fall back to the authored room
+                self.overlays[key] = ov
+            return ov
+
+    def apply(self, x, y, z, items_list):
+        """Merge the room's overlay into items_list (a private copy) in place."""
+        ov = self.get(x, y, z)
+        for name_path in ov["removed"]:
+            remove_by_name_path(items_list, name_path)
+        items_list.extend(clone_json(ov["added"]))
+        return items_list
+
+    def _save(self, x, y, z, ov):
+        os.makedirs(self.folder, exist_ok=True)
+        write_atomic(self.filename(x, y, z),
+                     json.dumps(ov, ensure_ascii=False, separators=(",", ":")))
+
+    def record_removed(self, x, y, z, name_path, room_size=None):
+        """Note an item taken; room_size is how many top-level items the room had.
+
+        Dropped items sit after the authored ones (see apply()), so with
+        room_size the path's first position says which of the two it was.
+        """
+        ov = self.get(x, y, z)
+        path = [list(step) if isinstance(step, (list, tuple)) else step for step in name_path]
+        with self.lock:
+            first = path[0] if path else None
+            authored = (room_size - len(ov["added"])) if room_size is not None else None
+            if authored is not None and isinstance(first, list) and isinstance(first[1], int):
+                if first[1] >= authored:
+                    # taking back something that was dropped here: just forget the drop
+                    remove_by_name_path(ov["added"], [[first[0], first[1] - authored]] + path[1:])
+                else:
+                    ov["removed"].append(path)
+            elif remove_by_name_path(ov["added"], path) is None:
+                ov["removed"].append(path)
+            self._save(x, y, z, ov)
+
+    def record_added(self, x, y, z, item):
+        ov = self.get(x, y, z)
+        with self.lock:
+            ov["added"].append(clone_json(item))
+            self._save(x, y, z, ov)
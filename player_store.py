@@ -0,0 +1,270 @@
+"""Every player in one SQLite file, instead of one JSON document per player.
+
+    store = PlayerStore("players.db")
+    data = store.load("alice")            # the player-1.json dict, or None
+    store.save("alice", data)             # queued; written with the next batch
+    store.in_room(3, 4, 0)                # ["alice", "bob"]
+    store.close()                         # writes what's still queued
+
+One row per player: the whole document (any tile_codec codec, compact
+JSON by default) plus its name and x/y/z pulled out into indexed columns,
+so "load alice" and "who is in room (3,4,0)" are both index lookups
+rather than opening thousands of files.
+
+save() only queues; a background thread writes everything queued in one
+transaction every `flush_every` seconds (or sooner once `max_batch`
+players are waiting). Saving the same player twice before a flush writes
+once. Reads see queued saves straight away, so callers never notice the
+delay. WAL mode keeps readers in other processes from blocking the writer.
+
+Names are looked up case-insensitively. To bring old saves across:
+
+    python player_store.py migrate players.db player-*.json players/*.json
+
+Each file becomes the player named after it (player-1.json -> "player-1").
+"""
+import os
+import sys
+import glob
+import time
+import sqlite3
+import argparse
+import threading
+
+from world_store import clone_json
+from tile_codec import encode, decode, load_file
+
+DEFAULT_DB = "players.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name    TEXT PRIMARY KEY COLLATE NOCASE,
+    x       INTEGER NOT NULL DEFAULT 0,
+    y       INTEGER NOT NULL DEFAULT 0,
+    z       INTEGER NOT NULL DEFAULT 0,
+    data    BLOB NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_room ON players (x, y, z);
+"""
+UPSERT = """
+INSERT INTO players (name, x, y, z, data, updated) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    x = excluded.x, y = excluded.y, z = excluded.z,
+    data = excluded.data, updated = excluded.updated
+"""
+
+
+def position_of(data):
+    pos = data.get("position", {})
+    return (pos.get("x", 0), pos.get("y", 0), pos.get("z", 0))
+
+
+class PlayerStore:
+    def __init__(self, path=DEFAULT_DB, codec="json-compact", flush_every=0.25,
+                 max_batch=1000, on_error=None):
+        self.path = path
+        self.codec = codec
+        self.flush_every = flush_every
+        self.max_batch = max_batch
+        self.on_error = on_error
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: a crash loses at most the last batch
+        self.db.executescript(SCHEMA)
+        self.db_lock = threading.Lock()  # one connection, used from both threads
+        self.pending = {}  # name.lower() -> (name, data)
+        self.writing = {}  # the batch being committed right now, same shape
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()  # one batch in flight at a time (thread or flush)
+        self.closing = False
+        self.batches = 0
+        self.rows_written = 0
+        self.coalesced = 0
+        self.thread = threading.Thread(target=self._run, name="player-store", daemon=True)
+        self.thread.start()
+
+    # --- reads ---
+
+    def _queued(self):
+        # saves not committed yet, newest first in line
+        with self.cond:
+            return {**self.writing, **self.pending}
+
+    def load(self, name):
+        """The player's document, or None if there is no such player."""
+        queued = self._queued().get(name.lower())
+        if queued is not None:
+            return clone_json(queued[1])
+        with self.db_lock:
+            row = self.db.execute("SELECT data FROM players WHERE name = ?", (name,)).fetchone()
+        return decode(row[0]) if row else None
+
+    def exists(self, name):
+        return self.load(name) is not None
+
+    def names(self):
+        with self.db_lock:
+            stored = [r[0] for r in self.db.execute("SELECT name FROM players")]
+        queued = [n for n, _ in self._queued().values()]
+        seen = {n.lower() for n in stored}
+        return stored + [n for n in queued if n.lower() not in seen]
+
+    def __len__(self):
+        return len(self.names())
+
+    def in_room(self, x, y, z):
+        """Names of the players whose saved position is (x, y, z)."""
+        return self.in_rooms([(x, y, z)]).get((x, y, z), [])
+
+    def in_rooms(self, coords):
+        """{(x, y, z): [names]} for every given room that has anyone in it."""
+        coords = list(set(coords))
+        found = {}
+        with self.db_lock:
+            for i in range(0, len(coords), 300):  # SQLite caps bound variables
+                part = coords[i:i + 300]
+                values = ",".join("(?,?,?)" for _ in part)
+                args = [v for c in part for v in c]
+                rows = self.db.execute(
+                    f"SELECT name, x, y, z FROM players WHERE (x, y, z) IN (VALUES {values})", args)
+                for name, x, y, z in rows:
+                    found.setdefault((x, y, z), {})[name.lower()] = name
+        # queued saves win over what's on disk
+        queued = self._queued()
+        for names in found.values():
+            for key in names.keys() & queued.keys():
+                del names[key]
+        wanted = set(coords)
+        for key, (name, data) in queued.items():
+            pos = position_of(data)
+            if pos in wanted:
+                found.setdefault(pos, {})[key] = name
+        return {c: sorted(names.values(), key=str.lower) for c, names in found.items() if names}
+
+    # --- writes ---
+
+    def save(self, name, data):
+        """Queue a snapshot. Don't mutate `data` afterwards; pass a copy."""
+        with self.cond:
+            if name.lower() in self.pending:
+                self.coalesced += 1
+            self.pending[name.lower()] = (name, data)
+            if len(self.pending) >= self.max_batch:
+                self.cond.notify()
+
+    def delete(self, name):
+        self.flush()
+        with self.db_lock:
+            self.db.execute("DELETE FROM players WHERE name = ?", (name,))
+
+    def _write(self, batch):
+        now = time.time()
+        rows = [(name, *position_of(data), encode(data, self.codec), now)
+                for name, data in batch.values()]
+        with self.db_lock:
+            try:
+                self.db.execute("BEGIN")
+                self.db.executemany(UPSERT, rows)
+                self.db.execute("COMMIT")
+            except Exception as e:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                # put them back, unless something newer was queued meanwhile
+                with self.cond:
+                    for key, job in batch.items():
+                        self.pending.setdefault(key, job)
+                if self.on_error:
+                    self.on_error(e)
+                return False
+        self.batches += 1
+        self.rows_written += len(rows)
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.closing:
+                    self.cond.wait(self.flush_every)
+                if self.closing and not self.pending:
+                    return
+            self.flush()
+            if self.closing:
+                return
+
+    def flush(self):
+        """Write everything queued right now, on the calling thread."""
+        with self.write_lock:
+            with self.cond:
+                batch, self.pending = self.pending, {}
+                self.writing = batch
+            if batch:
+                self._write(batch)
+            with self.cond:
+                self.writing = {}
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+        self.thread.join(timeout=5)
+        self.flush()
+        with self.db_lock:
+            self.db.close()
+
+
+def player_name_for(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def migrate_files(store, paths, progress=None):
+    """Copy player JSON files into `store`; returns (copied, failed) lists."""
+    copied, failed = [], []
+    for path in paths:
+        try:
+            data = load_file(path)
+        except Exception as e:
+            failed.append((path, e))
+            continue
+        store.save(player_name_for(path), data)
+        copied.append(path)
+        if progress and len(copied) % 1000 == 0:
+            progress(len(copied))
+    store.flush()
+    return copied, failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("migrate", help="copy player-*.json style files into a player database")
+    p.add_argument("db")
+    p.add_argument("files", nargs="+", help="player files or glob patterns")
+    p = sub.add_parser("who", help="list the players saved in a room")
+    p.add_argument("db")
+    p.add_argument("x", type=int)
+    p.add_argument("y", type=int)
+    p.add_argument("z", type=int)
+    args = ap.parse_args(argv)
+
+    store = PlayerStore(args.db)
+    try:
+        if args.cmd == "migrate":
+            paths = []
+            for pattern in args.files:
+                paths.extend(sorted(glob.glob(pattern)) or [pattern])
+            t0 = time.time()
+            copied, failed = migrate_files(store, paths, lambda n: print(f"  {n} players...", flush=True))
+            print(f"Copied {len(copied)} players into {args.db} in {time.time() - t0:.1f}s.")
+            for path, e in failed:
+                print(f"  skipped {path}: {e}", file=sys.stderr)
+            return 1 if failed else 0
+        names = store.in_room(args.x, args.y, args.z)
+        print("\n".join(names) if names else "Nobody is there.")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
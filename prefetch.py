@@ -0,0 +1,82 @@
+"""Background prefetch of the rooms the player can walk into next.
+
+When the player enters a room, room_entered() queues every neighbour behind
+an open exit (and optionally the rooms one more hop out) and a worker thread
+pulls them into the RoomCache. By the time try_move() asks for the next
+room it is normally already parsed and in memory.
+"""
+import queue
+import threading
+
+
+class NeighbourPrefetcher:
+    def __init__(self, cache, dirs, hops=1):
+        # dirs: {"n": (dx, dy, dz), ...}, same as DIRS in game-main.py
+        self.cache = cache
+        self.dirs = dirs
+        self.hops = hops
+        self.jobs = queue.Queue()
+        self.generation = 0  # bumped on every move; older jobs are dropped
+        self.seen_generation = None
+        self.loaded = 0
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="room-prefetch", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def neighbours(self, x, y, z, exits):
+        for d, ok in exits.items():
+            if ok and d in self.dirs:
+                dx, dy, dz = self.dirs[d]
+                yield (x + dx, y + dy, z + dz)
+
+    def room_entered(self, x, y, z, exits):
+        self.generation += 1
+        gen = self.generation
+        for c in self.neighbours(x, y, z, exits):
+            self.jobs.put((gen, c, 1))
+
+    def _run(self):
+        seen = set()  # coords already handled for the current move
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            try:
+                self._do(job, seen)
+            finally:
+                self.jobs.task_done()
+
+    def _do(self, job, seen):
+        gen, coords, hop = job
+        if gen != self.generation:
+            return  # the player has already moved on
+        if gen != self.seen_generation:
+            seen.clear()
+            self.seen_generation = gen
+        if coords in seen:
+            return
+        seen.add(coords)
+        try:
+            exits = self.cache.warm(*coords)
+        except Exception:
+            return  # broken tile; load_room will report it properly
+        if exits is None:
+            return
+        self.loaded += 1
+        if hop < self.hops:
+            for c in self.neighbours(*coords, exits):
+                self.jobs.put((gen, c, hop + 1))
+
+    def wait_idle(self):
+        # handy for benchmarks; the game itself never blocks on the prefetcher
+        self.jobs.join()
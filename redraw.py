@@ -0,0 +1,33 @@
+"""Helpers for redrawing only when (and where) something changed.
+
+Both main loops used to redraw everything and flip at 60 fps whether or not
+anything happened. In the "dirty" redraw mode they instead
+
+  - block in wait_events() until there is input, or until a timer they
+    care about (caret blink, toast) runs out, and
+  - push only the changed parts of the screen with pygame.display.update.
+
+Each program keys its screen panels by what they show, and repaints only
+the panels whose key changed. game-main.py draws those panels on their own.
+game.py's builder screen is one pass that also works out what the clicks
+hit, so it still runs every frame, with the screen clipped to the changed
+panels.
+
+COG_REDRAW=always brings back the old behaviour (full flip every frame).
+"""
+import os
+import pygame
+
+REDRAW_MODE = os.environ.get("COG_REDRAW", "dirty")
+
+
+def wait_events(timeout_ms=None):
+    """Block until there are events (or timeout_ms passes); return them all."""
+    if timeout_ms is None:
+        first = pygame.event.wait()
+    else:
+        first = pygame.event.wait(max(1, int(timeout_ms)))  # 0 would mean forever
+    events = [] if first.type == pygame.NOEVENT else [first]
+    events.extend(pygame.event.get())
+    return events
+
@@ -0,0 +1,136 @@
+"""Process-wide LRU cache of parsed rooms, sitting in front of a world store.
+
+Each entry remembers the store's stamp() for the tile (mtime + size for the
+folder layout), so a tile edited by the map builder is re-read on the next
+get. get() always hands back a private copy: callers are free to pop items
+out of it without touching what everyone else sees.
+
+The cache is shared with the prefetch worker, so disk I/O is always done
+outside the lock; only the bookkeeping is serialised.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+from world_store import clone_json
+
+
+def approx_size(obj):
+    # rough byte count of a JSON-ish tree; only used for the memory budget
+    if isinstance(obj, dict):
+        return 64 + sum(len(k) + approx_size(v) for k, v in obj.items())
+    if isinstance(obj, list):
+        return 56 + sum(8 + approx_size(v) for v in obj)
+    if isinstance(obj, str):
+        return 49 + len(obj)
+    return 28
+
+
+class RoomCache:
+    def __init__(self, store, max_rooms=512, max_bytes=16 * 1024 * 1024, max_age=0.0):
+        # max_age: seconds an entry is trusted after its stamp was last
+        # checked. 0 means stat the tile on every get.
+        self.store = store
+        self.max_rooms = max_rooms
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.entries = OrderedDict()  # (x, y, z) -> [stamp, tile, nbytes, checked_at]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.RLock()
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def _insert(self, key, stamp, tile):
+        nbytes = approx_size(tile)
+        self._drop(key)
+        if nbytes > self.max_bytes:
+            return  # bigger than the whole budget, don't bother
+        self.entries[key] = [stamp, tile, nbytes, time.monotonic()]
+        self.bytes += nbytes
+        while len(self.entries) > self.max_rooms or self.bytes > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old[2]
+            self.evictions += 1
+
+    def _lookup(self, key, count):
+        """Cached tile for key if it is still current, else None (no copy)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[3] <= self.max_age:
+                self.entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry[1]
+        stamp = self.store.stamp(*key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if stamp is not None and entry[0] == stamp:
+                    entry[3] = time.monotonic()
+                    self.entries.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return entry[1]
+                self._drop(key)
+                self.invalidations += 1
+            if count:
+                self.misses += 1
+        if stamp is None:
+            return None
+        tile = self.store.get(*key)
+        if tile is None:
+            return None
+        with self.lock:
+            self._insert(key, stamp, tile)
+        return tile
+
+    def get(self, x, y, z):
+        """A private copy of the tile at (x, y, z), or None if there isn't one."""
+        tile = self._lookup((x, y, z), True)
+        return None if tile is None else clone_json(tile)
+
+    def warm(self, x, y, z):
+        """Make sure (x, y, z) is cached; returns its exits dict or None.
+
+        Used by the prefetcher, so it doesn't count towards hits/misses.
+        """
+        tile = self._lookup((x, y, z), False)
+        if tile is None:
+            return None
+        exits = tile.get("exits", {})
+        return dict(exits) if isinstance(exits, dict) else {}
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def invalidate(self, x, y, z):
+        with self.lock:
+            if (x, y, z) in self.entries:
+                self._drop((x, y, z))
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "rooms": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
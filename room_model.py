@@ -0,0 +1,198 @@
+"""Compact in-memory model for rooms and items.
+
+The JSON tiles become dicts of dicts when loaded, which costs a lot of
+memory per room (every key string, the 8-entry exits dict, one dict per
+item). For keeping a big world resident (caches, a server) use these
+instead:
+
+  Room  - __slots__ class, exits packed into an 8-bit mask in EXIT_ORDER,
+          description stored as interned sentence fragments
+  Item  - __slots__ class, children kept in a tuple
+
+Room.from_json(tile) / room.to_json() round-trip the tile schema exactly,
+unknown keys included (they ride along in `extra`).
+"""
+import re
+import sys
+
+EXIT_ORDER = ["n", "ne", "e", "se", "s", "sw", "w", "nw"]
+EXIT_BIT = {d: 1 << i for i, d in enumerate(EXIT_ORDER)}
+EXIT_STEP = {"n": (0, 1, 0), "ne": (1, 1, 0), "e": (1, 0, 0), "se": (1, -1, 0),
+             "s": (0, -1, 0), "sw": (-1, -1, 0), "w": (-1, 0, 0), "nw": (-1, 1, 0)}
+ALL_EXIT_KEYS = 0xFF
+# Room.flags: bits 0-7 say which exit keys the JSON had, then these two
+HAS_COORDS = 1 << 8
+HAS_EXITS = 1 << 9
+
+# tiles say which layout they use in "schema_version"; no field means 1.
+# world_migrate.py upgrades old ones, and whatever writes a tile stamps this
+SCHEMA_VERSION = 2
+
+ITEM_KEYS = ("name", "desc", "contains")
+ROOM_KEYS = ("coords", "exits", "description", "items", "last_move", "saved_at")
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]*(?:[.!?]+\s*|\n|$)")
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<missing>"
+
+
+_MISSING = _Missing()  # "key not in the JSON", as opposed to null
+
+
+def exits_to_mask(exits):
+    mask = 0
+    for d, ok in exits.items():
+        if ok and d in EXIT_BIT:
+            mask |= EXIT_BIT[d]
+    return mask
+
+
+def mask_to_exits(mask, keys=ALL_EXIT_KEYS):
+    return {d: bool(mask & bit) for d, bit in EXIT_BIT.items() if keys & bit}
+
+
+def split_fragments(text):
+    """Split text into interned sentence-sized pieces ("".join gives it back)."""
+    parts = [sys.intern(p) for p in _SENTENCE_RE.findall(text) if p]
+    if len(parts) == 1:
+        return parts[0]
+    return tuple(parts)
+
+
+def join_fragments(frags):
+    return frags if isinstance(frags, str) else "".join(frags)
+
+
+def _intern(s):
+    return sys.intern(s) if isinstance(s, str) else s
+
+
+class Item:
+    __slots__ = ("name", "desc", "children", "extra")
+
+    def __init__(self, name, desc="", children=(), extra=None):
+        self.name = name
+        self.desc = desc          # _MISSING = no "desc" key
+        self.children = children  # tuple of Item, _MISSING = no "contains" key
+        self.extra = extra        # dict of any other keys, or None
+
+    @classmethod
+    def from_json(cls, d):
+        extra = {k: v for k, v in d.items() if k not in ITEM_KEYS}
+        kids = d.get("contains", _MISSING)
+        if isinstance(kids, list) and all(isinstance(k, dict) for k in kids):
+            children = tuple(cls.from_json(k) for k in kids)
+        else:
+            children = _MISSING
+            if kids is not _MISSING:
+                extra["contains"] = kids  # odd value, keep it as-is
+        return cls(_intern(d.get("name", _MISSING)),
+                   _intern(d.get("desc", _MISSING)),
+                   children, extra or None)
+
+    def to_json(self):
+        d = {}
+        if self.name is not _MISSING:
+            d["name"] = self.name
+        if self.desc is not _MISSING:
+            d["desc"] = self.desc
+        if self.children is not _MISSING:
+            d["contains"] = [c.to_json() for c in self.children]
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+class Room:
+    __slots__ = ("x", "y", "z", "flags", "exits", "description",
+                 "items", "last_move", "saved_at", "extra")
+
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+        self.flags = ALL_EXIT_KEYS | HAS_EXITS
+        self.exits = 0
+        self.description = ""
+        self.items = ()
+        self.last_move = None
+        self.saved_at = None
+        self.extra = None
+
+    @property
+    def exits_dict(self):
+        return mask_to_exits(self.exits, self.flags & ALL_EXIT_KEYS)
+
+    @property
+    def description_text(self):
+        return "" if self.description is None else join_fragments(self.description)
+
+    def has_exit(self, d):
+        return bool(self.exits & EXIT_BIT.get(d, 0))
+
+    @classmethod
+    def from_json(cls, tile, x=0, y=0, z=0):
+        coords = tile.get("coords")
+        if isinstance(coords, dict):
+            x, y, z = coords.get("x", x), coords.get("y", y), coords.get("z", z)
+        room = cls(x, y, z)
+        extra = {k: v for k, v in tile.items() if k not in ROOM_KEYS}
+        if isinstance(coords, dict) and set(coords) == {"x", "y", "z"}:
+            room.flags = HAS_COORDS
+        elif "coords" in tile:
+            extra["coords"] = coords
+            room.flags = 0
+        else:
+            room.flags = 0
+        exits = tile.get("exits")
+        if isinstance(exits, dict) and all(k in EXIT_BIT and isinstance(v, bool)
+                                           for k, v in exits.items()):
+            room.flags |= HAS_EXITS | exits_to_mask({k: True for k in exits})
+            room.exits = exits_to_mask(exits)
+        elif "exits" in tile:
+            extra["exits"] = exits
+        desc = tile.get("description")
+        if isinstance(desc, str):
+            room.description = split_fragments(desc)
+        elif "description" in tile:
+            extra["description"] = desc
+        else:
+            room.description = None
+        its = tile.get("items")
+        if isinstance(its, list) and all(isinstance(i, dict) for i in its):
+            room.items = tuple(Item.from_json(i) for i in its)
+        elif "items" in tile:
+            extra["items"] = its
+            room.items = None
+        else:
+            room.items = None
+        room.last_move = _intern(tile["last_move"]) if "last_move" in tile else _MISSING
+        room.saved_at = tile["saved_at"] if "saved_at" in tile else _MISSING
+        room.extra = extra or None
+        return room
+
+    def to_json(self):
+        d = {}
+        if self.flags & HAS_COORDS:
+            d["coords"] = {"x": self.x, "y": self.y, "z": self.z}
+        if self.last_move is not _MISSING:
+            d["last_move"] = self.last_move
+        if self.flags & HAS_EXITS:
+            d["exits"] = self.exits_dict
+        if self.description is not None:
+            d["description"] = join_fragments(self.description)
+        if self.items is not None:
+            d["items"] = [i.to_json() for i in self.items]
+        if self.saved_at is not _MISSING:
+            d["saved_at"] = self.saved_at
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+def load_world_compact(store):
+    """Every tile in a world store as {(x, y, z): Room}."""
+    return {c: Room.from_json(store.get(*c), *c) for c in store.coords()}
@@ -0,0 +1,136 @@
+"""Atomic file writes and a write-behind saver for documents like player-1.json.
+
+WriteBehindSaver keeps only the newest snapshot you submit() and writes it
+on a background thread once things go quiet for `debounce` seconds, or at
+the latest `max_delay` seconds after the first unsaved change. That bounds
+how much play you can lose in a crash, while a burst of moves costs one
+write instead of one per move. Call flush() (or close()) before quitting.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+def write_atomic(path, data, fsync=True):
+    """Write bytes/str to path via a temp file + rename, so readers never see half a file.
+
+    fsync=False skips waiting for the disk: still all-or-nothing if the
+    program dies, just not if the machine does.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def encode_pretty_json(data):
+    return json.dumps(data, indent=2)
+
+
+class WriteBehindSaver:
+    def __init__(self, path, debounce=0.25, max_delay=2.0,
+                 encode=encode_pretty_json, on_error=None):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.encode = encode
+        self.on_error = on_error
+        self.pending = None
+        self.seq = 0          # bumped per submit()
+        self.written_seq = 0  # newest snapshot that made it to disk
+        self.done_seq = 0     # newest snapshot we tried to write (ok or not)
+        self.first_dirty = None  # monotonic time of the oldest unsaved change
+        self.last_dirty = None
+        self.writes = 0
+        self.coalesced = 0
+        self.cond = threading.Condition()
+        self.closing = False
+        self.write_lock = threading.Lock()  # one writer at a time (thread or flush)
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def submit(self, data):
+        """Queue a snapshot. Don't mutate `data` afterwards; pass a copy."""
+        with self.cond:
+            now = time.monotonic()
+            if self.pending is not None:
+                self.coalesced += 1
+            else:
+                self.first_dirty = now
+            self.seq += 1
+            self.pending = (self.seq, data)
+            self.last_dirty = now
+            self.cond.notify()
+
+    def _take(self):
+        job, self.pending = self.pending, None
+        self.first_dirty = self.last_dirty = None
+        return job
+
+    def _write(self, job):
+        # caller holds write_lock; never put an older snapshot over a newer one
+        seq, data = job
+        if seq > self.written_seq:
+            try:
+                write_atomic(self.path, self.encode(data))
+                self.written_seq = seq
+                self.writes += 1
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+        with self.cond:
+            self.done_seq = max(self.done_seq, seq)
+            self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closing:
+                    self.cond.wait()
+                if self.pending is None and self.closing:
+                    return
+                now = time.monotonic()
+                due = min(self.last_dirty + self.debounce, self.first_dirty + self.max_delay)
+                if now < due and not self.closing:
+                    self.cond.wait(due - now)
+                    continue
+                job = self._take()
+            with self.write_lock:
+                self._write(job)
+
+    def flush(self):
+        """Write any pending snapshot right now, on the calling thread.
+
+        Also waits for a write the background thread already has in flight.
+        """
+        with self.write_lock:
+            with self.cond:
+                job = self._take()
+                target = self.seq
+            if job is not None:
+                self._write(job)
+        with self.cond:
+            while self.done_seq < target:
+                self.cond.wait()
+
+    def close(self):
+        self.flush()
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+        self.thread.join(timeout=5)
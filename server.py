@@ -0,0 +1,436 @@
+"""Play Cog World over the network: many players, one shared world.
+
+    python server.py                          # port 4000, world from $COG_WORLD / world_tiles/
+    python server.py --port 4000 --world world.cogw
+    telnet localhost 4000                     # or nc; any line-based client will do
+
+Each connection asks for a name, loads that player from players.db (see
+player_store.py; made on first login), and then plays exactly like
+game-main.py does: one engine.Session per player, all of them on one
+engine.World, so the room cache and the pickup overlays are shared.
+Players in the same room see each other come and go and see things
+being picked up.
+
+Everything runs on one asyncio loop. Commands are short and the world is
+cached in memory, so Session.handle() is called right on the loop. So is
+loading a player (one indexed read); saves are queued and PlayerStore
+writes them in batches on its own thread. The one exception is the route
+search behind goto / path: on a big world with one-way exits it can wander
+through a lot of rooms, so it runs on a worker thread and gives up after
+--path-max-nodes rooms rather than the exit graph's much larger default.
+
+Backpressure: each client has a small queue of outgoing messages and the
+socket's own write buffer. A client's own command output waits for room
+in its queue, which simply stops us reading its next command. Messages
+about other players never wait: if the queue is full they are dropped
+(and the client is told how many), and a client that keeps missing them
+or stops reading altogether is disconnected.
+
+The world ticks every --tick-ms on the same loop (see ticks.py): creatures
+near players wander about, and players in the rooms they leave or enter
+hear about it like they hear about each other.
+
+With --seed (or $COG_WORLD_SEED), walking off the edge of the built world
+makes up new rooms from that seed (see worldgen.py).
+"""
+import os
+import re
+import sys
+import time
+import signal
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from world_store import open_world
+from room_cache import RoomCache
+from overlays import OverlayStore, OVERLAY_FOLDER
+from player_store import PlayerStore, DEFAULT_DB
+from exit_graph import open_graph
+from worldgen import Generator
+from engine import (World, Session, DIRS, DIR_NAMES, OPPOSITE, WELCOME,
+                    new_player_data, creature_news)
+
+PROMPT = "> "
+NAME_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_-]{0,19}$")
+# telnet option negotiation (IAC ...) that a real telnet client may send
+TELNET_CMD = re.compile(rb"\xff(?:[\xfb-\xfe].|\xfa.*?\xff\xf0|[\xf0-\xf9])", re.S)
+
+MAX_LINE = 512               # longest command we accept
+OUT_QUEUE = 64               # messages waiting for a client before we drop others' news
+MAX_DROPPED = 256            # dropped in a row before a client counts as gone
+STALL_TIMEOUT = 30.0         # seconds a client may leave its own output unread
+WRITE_HIGH_WATER = 64 * 1024 # socket buffer before drain() makes us wait
+SAVE_EVERY = 2.0             # seconds between saves of players who did something
+NAMES_SHOWN = 8              # "Also here:" lists at most this many
+MAX_LATE_TICKS = 8           # ticks we'll run late, back to back, before skipping some
+PATH_MAX_NODES = 20000       # rooms one goto may search (exit_graph allows 200000)
+PATH_WORKERS = 2             # route searches running at once; more wait their turn
+
+
+def direction_between(a, b):
+    step = tuple(q - p for p, q in zip(a, b))
+    return next((d for d, v in DIRS.items() if v == step), None)
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.out = asyncio.Queue(OUT_QUEUE)
+        self.dropped = 0
+        self.name = None
+        self.session = None
+        self.events = []     # on_event collects here until the command is done
+        self.dirty = False   # changed since the last save
+        self.closed = False
+        self.kicked = False  # closed by us for not keeping up
+        self.pump_task = asyncio.create_task(self.pump())
+
+    @property
+    def where(self):
+        s = self.session
+        return (s.x, s.y, s.z)
+
+    async def read_line(self):
+        """The next command, or None once the client has gone."""
+        if self.closed:
+            return None  # don't work through what it typed before we hung up
+        try:
+            raw = await self.reader.readline()
+        except ValueError:
+            return ""  # longer than MAX_LINE: skipped, answered with a bare prompt
+        if not raw:
+            return None
+        return TELNET_CMD.sub(b"", raw).decode("utf-8", "replace").strip()
+
+    async def send(self, lines, prompt=True):
+        # our own output: wait for room, so a client that doesn't read its
+        # replies stops being read from
+        if self.closed:
+            return  # nobody is pumping the queue any more
+        await asyncio.wait_for(self.out.put((lines, prompt)), STALL_TIMEOUT)
+
+    def notify(self, line):
+        # news about someone else: never wait on a slow client
+        if self.closed:
+            return
+        try:
+            self.out.put_nowait(([line], False))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped > MAX_DROPPED:
+                self.kicked = True
+                self.close()
+
+    async def pump(self):
+        try:
+            while True:
+                job = await self.out.get()
+                # whatever else piled up meanwhile goes out in the same write
+                parts = []
+                if self.dropped:
+                    parts.append(f"({self.dropped} messages missed)\r\n")
+                    self.dropped = 0
+                while job is not None:
+                    lines, prompt = job
+                    parts.extend(line + "\r\n" for line in lines)
+                    if prompt:
+                        parts.append(PROMPT)
+                    if self.out.empty():
+                        break
+                    job = self.out.get_nowait()
+                if parts:
+                    self.writer.write("".join(parts).encode("utf-8"))
+                    await self.writer.drain()
+                if job is None:
+                    return
+        except (ConnectionError, OSError):
+            self.close()
+
+    async def finish(self):
+        # let the last replies ("Goodbye.") go out before hanging up
+        if not self.closed:
+            try:
+                await asyncio.wait_for(self.out.put(None), 5)
+                await asyncio.wait_for(self.pump_task, 5)
+            except asyncio.TimeoutError:
+                self.kicked = True
+        self.close()
+        self.pump_task.cancel()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.kicked:
+                self.writer.transport.abort()  # close() would wait to flush to it
+            else:
+                self.writer.close()
+            # either way the reader sees EOF, so play() ends
+            while not self.out.empty():  # and a send() waiting for room wakes up
+                self.out.get_nowait()
+            self.out.put_nowait(None)  # and the pump stops
+
+
+class GameServer:
+    def __init__(self, world, players):
+        self.world = world
+        self.players = players  # a PlayerStore
+        self.online = {}  # lower-case name -> Client
+        self.rooms = {}   # (x, y, z) -> set of Clients standing there
+        self.handlers = {}  # every connected Client -> the task serving it
+        self.commands = 0
+        self.kicked = 0
+        self.pathfinder = ThreadPoolExecutor(PATH_WORKERS, thread_name_prefix="path")
+
+    # --- saving ---
+
+    def save(self, client):
+        client.dirty = False
+        self.players.save(client.name, client.session.to_data())
+
+    def save_dirty(self):
+        for client in list(self.online.values()):
+            if client.dirty:
+                self.save(client)
+
+    async def autosave(self):
+        while True:
+            await asyncio.sleep(SAVE_EVERY)
+            self.save_dirty()
+
+    # --- who is where ---
+
+    def others_in(self, coords, client):
+        return [c for c in self.rooms.get(coords, ()) if c is not client]
+
+    def place(self, client, coords):
+        self.rooms.setdefault(coords, set()).add(client)
+
+    def unplace(self, client, coords):
+        here = self.rooms.get(coords)
+        if here is not None:
+            here.discard(client)
+            if not here:
+                del self.rooms[coords]
+
+    def tell_room(self, coords, line, client=None):
+        for other in self.others_in(coords, client):
+            other.notify(line)
+
+    def also_here(self, client):
+        names = sorted(c.name for c in self.others_in(client.where, client))
+        if not names:
+            return []
+        if len(names) > NAMES_SHOWN:
+            names = names[:NAMES_SHOWN] + [f"{len(names) - NAMES_SHOWN} others"]
+        return ["Also here: " + ", ".join(names) + "."]
+
+    # --- connections ---
+
+    async def handle_client(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        client = Client(reader, writer)
+        self.handlers[client] = asyncio.current_task()
+        try:
+            if await self.login(client):
+                await self.play(client)
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.TimeoutError:
+            client.kicked = True
+            client.close()
+        finally:
+            self.logout(client)
+            await client.finish()
+            del self.handlers[client]
+            if client.kicked:
+                self.kicked += 1
+
+    async def login(self, client):
+        await client.send([WELCOME[0], "What is your name?"])
+        while True:
+            name = await client.read_line()
+            if name is None:
+                return False
+            if not NAME_RE.match(name):
+                await client.send(["Names are up to 20 letters, digits, _ or -, starting with a letter.",
+                                   "What is your name?"])
+            elif name.lower() in self.online:
+                await client.send([f"{name} is already playing.", "What is your name?"])
+            else:
+                break
+        self.online[name.lower()] = client  # before any await: no one else can take it
+        client.name = name
+        try:
+            data = self.players.load(name) or new_player_data(name)
+        except Exception as e:
+            self.logout(client)
+            await client.send([f"Error loading player file: {e}"], prompt=False)
+            return False
+
+        client.session = Session(self.world, data, on_event=client.events.append)
+        lines = WELCOME[1:] + client.session.enter()
+        self.tell_room(client.where, f"{client.name} appears.")
+        self.place(client, client.where)
+        await client.send(lines + self.also_here(client))
+        return True
+
+    async def play(self, client):
+        session = client.session
+        while not session.done:
+            cmd = await client.read_line()
+            if cmd is None:
+                return
+            before = client.where
+            request = session.goto_request(cmd)
+            if request is None:
+                lines = session.handle(cmd)
+            else:
+                route = await self.find_route(*request)
+                if client.closed:
+                    return  # gone while we searched; logout already saved them
+                lines = session.handle(cmd, route)
+            self.commands += 1
+            if client.events:
+                lines += self.after_events(client, before)
+            await client.send(lines, prompt=not session.done)
+
+    async def find_route(self, start, goal):
+        loop = asyncio.get_running_loop()
+        self.world.hold_graph()
+        try:
+            return await loop.run_in_executor(self.pathfinder, self.world.path, start, goal)
+        finally:
+            self.world.release_graph()
+
+    def after_events(self, client, before):
+        extra = []
+        for event in client.events:
+            if event["t"] == "pickup":
+                item = event["item"].get("name", "something")
+                for other in self.others_in(before, client):
+                    other.session.reload_room()  # or they could take it again
+                    other.notify(f"{client.name} picks up the {item}.")
+            elif event["t"] == "move":
+                now = client.where
+                d = direction_between(before, now)
+                self.unplace(client, before)
+                if d is None:  # goto: they came the long way round
+                    self.tell_room(before, f"{client.name} sets off.")
+                    self.tell_room(now, f"{client.name} arrives.")
+                else:
+                    self.tell_room(before, f"{client.name} leaves {DIR_NAMES[d]}.")
+                    self.tell_room(now, f"{client.name} arrives from the {DIR_NAMES[OPPOSITE[d]]}.")
+                self.place(client, now)
+                extra = self.also_here(client)
+        client.events.clear()
+        client.dirty = True
+        return extra
+
+    def logout(self, client):
+        if client.name is None or self.online.get(client.name.lower()) is not client:
+            return  # never got in, or already logged out by close()
+        del self.online[client.name.lower()]
+        if client.session is None:
+            return  # their player failed to load
+        self.world.player_left(client.session)
+        self.unplace(client, client.where)
+        self.tell_room(client.where, f"{client.name} fades away.")
+        self.save(client)
+
+    def creature_moved(self, creature, old, new, direction):
+        for coords, line in creature_news(creature, old, new, direction).items():
+            self.tell_room(coords, line)
+
+    async def run_ticks(self, every):
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while True:
+            due += every
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > MAX_LATE_TICKS * every:
+                due = loop.time()  # too far behind to catch up; drop the missed ticks
+            self.world.sim.tick()
+
+    async def close(self):
+        for client in list(self.online.values()):
+            self.logout(client)
+        for client in list(self.handlers):
+            client.close()
+        if self.handlers:
+            await asyncio.wait(list(self.handlers.values()), timeout=5)
+        self.pathfinder.shutdown(cancel_futures=True)
+
+
+async def serve(args):
+    store = open_world(args.world)
+    cache = RoomCache(store, max_rooms=args.cache_rooms, max_bytes=args.cache_mb * 1024 * 1024, max_age=1.0)
+    # the neighbour prefetcher follows one player at a time, so it stays off here
+    world = World(store, cache, OverlayStore(folder=args.overlays), prefetch_hops=0,
+                  creatures=args.tick_ms > 0, graph=open_graph(store),
+                  path_max_nodes=args.path_max_nodes,
+                  generator=Generator(args.seed) if args.seed is not None else None)
+    players = PlayerStore(args.players, on_error=lambda e: print(f"Error saving players: {e}", file=sys.stderr))
+    game = GameServer(world, players)
+    server = await asyncio.start_server(game.handle_client, args.host, args.port,
+                                        limit=MAX_LINE, backlog=args.backlog)
+    port = server.sockets[0].getsockname()[1]
+    print(f"Cog World listening on {args.host}:{port}", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C cancels serve() instead, and finally still runs
+    saver = asyncio.create_task(game.autosave())
+    ticker = None
+    if world.sim is not None:
+        world.sim.on_move = game.creature_moved
+        ticker = asyncio.create_task(game.run_ticks(args.tick_ms / 1000))
+    try:
+        await stop.wait()
+    finally:
+        saver.cancel()
+        if ticker is not None:
+            ticker.cancel()
+        server.close()
+        await game.close()
+        world.close()
+        store.close()
+        players.close()
+        ticks = f", {world.sim.now} ticks" if world.sim is not None else ""
+        print(f"Stopped after {game.commands} commands{ticks}, {time.process_time():.1f}s CPU "
+              f"({game.kicked} slow clients dropped).", flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=4000, help="0 = any free port")
+    ap.add_argument("--world", help="world folder or file (default: $COG_WORLD or world_tiles/)")
+    ap.add_argument("--players", default=DEFAULT_DB, help="player database (see player_store.py)")
+    ap.add_argument("--overlays", default=OVERLAY_FOLDER, help="folder for pickup overlays")
+    ap.add_argument("--cache-rooms", type=int, default=65536)
+    ap.add_argument("--cache-mb", type=int, default=256)
+    ap.add_argument("--backlog", type=int, default=1024, help="pending connections the OS may queue")
+    ap.add_argument("--tick-ms", type=float, default=250, help="world tick; 0 = no creatures")
+    ap.add_argument("--path-max-nodes", type=int, default=PATH_MAX_NODES,
+                    help="rooms one goto / path may search before giving up")
+    seed = os.environ.get("COG_WORLD_SEED")
+    ap.add_argument("--seed", type=int, default=int(seed) if seed else None,
+                    help="make up missing rooms from this seed (default: $COG_WORLD_SEED)")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
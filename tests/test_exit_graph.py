@@ -0,0 +1,133 @@
+"""ExitGraph paths against a plain breadth-first search, on seeded random worlds."""
+import random
+from collections import deque
+
+import pytest
+
+from exit_graph import ExitGraph, DETOUR_SLACK, chebyshev
+from room_model import EXIT_ORDER, EXIT_STEP
+
+OPPOSITE = {d: next(e for e in EXIT_ORDER if EXIT_STEP[e] == tuple(-c for c in EXIT_STEP[d]))
+            for d in EXIT_ORDER}
+
+
+def step(room, d):
+    return tuple(c + dc for c, dc in zip(room, EXIT_STEP[d]))
+
+
+def random_world(seed, size, one_way):
+    # 70% of positions are rooms and 60% of the ways between neighbours are
+    # exits: a maze, which is where the corridor goes the long way round
+    rng = random.Random(seed)
+    rooms = {(x, y, 0) for x in range(size) for y in range(size) if rng.random() < 0.7}
+    exits = {room: {} for room in rooms}
+    for room in sorted(rooms):
+        for d in EXIT_ORDER:
+            if step(room, d) in rooms and rng.random() < 0.6:
+                exits[room][d] = True
+                if not one_way:
+                    exits[step(room, d)][OPPOSITE[d]] = True
+    graph = ExitGraph()
+    for room, out in exits.items():
+        graph.set_room(*room, out)
+    graph.build()
+    return graph, exits
+
+
+def distances(exits, start):
+    dist = {start: 0}
+    todo = deque([start])
+    while todo:
+        room = todo.popleft()
+        for d in exits[room]:
+            nxt = step(room, d)
+            if nxt in exits and nxt not in dist:
+                dist[nxt] = dist[room] + 1
+                todo.append(nxt)
+    return dist
+
+
+def walk(exits, start, route):
+    room = start
+    for d in route:
+        assert exits[room].get(d), f"no {d} exit at {room}"
+        room = step(room, d)
+        assert room in exits
+    return room
+
+
+@pytest.mark.parametrize("one_way", [False, True])
+@pytest.mark.parametrize("seed", range(6))
+def test_path_matches_bfs(seed, one_way):
+    graph, exits = random_world(seed, 80, one_way)
+    rng = random.Random(seed)
+    rooms = sorted(exits)
+    for _ in range(8):
+        start = rng.choice(rooms)
+        dist = distances(exits, start)
+        for goal in rng.sample(rooms, 6):
+            route = graph.path(start, goal)
+            if goal not in dist:
+                assert route is None
+                continue
+            assert route is not None
+            assert walk(exits, start, route) == goal
+            assert dist[goal] <= len(route) <= dist[goal] + DETOUR_SLACK
+
+
+def test_path_around_a_one_way_wall():
+    # a wall with one door that only opens westwards, well off the straight line
+    graph, exits = ExitGraph(), {}
+    for x in range(48):
+        for y in range(48):
+            if x == 24 and y != 40:
+                continue
+            out = {}
+            for d in EXIT_ORDER:
+                nx, ny, _ = step((x, y, 0), d)
+                if 0 <= nx < 48 and 0 <= ny < 48 and (nx != 24 or ny == 40):
+                    out[d] = True
+            if x == 25 and y == 40:
+                out = {d: True for d in out if EXIT_STEP[d][0] <= 0}
+            if x == 24:
+                out = {d: True for d in out if EXIT_STEP[d][0] < 0}
+            exits[(x, y, 0)] = out
+            graph.set_room(x, y, 0, out)
+    graph.build()
+    assert graph.path((30, 5, 0), (10, 5, 0)) is not None
+    assert graph.path((10, 5, 0), (30, 5, 0)) is None
+    route = graph.path((30, 5, 0), (10, 5, 0))
+    assert len(route) <= distances(exits, (30, 5, 0))[(10, 5, 0)] + DETOUR_SLACK
+
+
+def test_small_budget_still_gives_the_corridor_route():
+    graph, exits = random_world(3, 80, False)
+    rooms = sorted(exits)
+    rng = random.Random(3)
+    for _ in range(20):
+        start, goal = rng.sample(rooms, 2)
+        full = graph.path(start, goal)
+        if full is not None and chebyshev(start, goal) > 30:
+            break
+    route = graph.path(start, goal, max_nodes=2000)
+    assert route is not None and walk(exits, start, route) == goal
+
+
+def test_update_and_round_trip():
+    graph, exits = random_world(7, 40, True)
+    blob = graph.to_bytes()
+    again = ExitGraph.from_bytes(blob)
+    assert len(again) == len(graph)
+    for room, out in exits.items():
+        assert again.exits(*room) == graph.exits(*room)
+    rooms = sorted(exits)
+    for start, goal in zip(rooms[::97], rooms[40::89]):
+        assert again.path(start, goal) == graph.path(start, goal)
+
+    # cut a room off and the way through it goes
+    room = rooms[len(rooms) // 2]
+    graph.update(*room, None)
+    assert room not in graph
+    assert graph.path(room, rooms[0]) is None
+    graph.update(*room, {})
+    assert room in graph and graph.exits(*room) == []
@@ -0,0 +1,123 @@
+"""Journal replay and compaction, for a player document and for world tiles."""
+import json
+
+from journal import Journal, JournaledDocument, WorldJournal, new_tile
+from world_store import open_world
+
+PLAYER = {"name": "player-1", "position": {"x": 0, "y": 0, "z": 0}, "inventory": []}
+
+
+def moves(doc, n, start=0):
+    for i in range(start, start + n):
+        doc.record({"t": "move", "x": i, "y": -i, "z": 0})
+
+
+def test_document_replays_its_journal(tmp_path):
+    path, jpath = str(tmp_path / "player-1.json"), str(tmp_path / "player-1.journal")
+    doc = JournaledDocument(path, jpath)
+    doc.load(PLAYER)
+    moves(doc, 5)
+    doc.record({"t": "pickup", "item": {"name": "rope"}})
+    doc.close()  # no snapshot yet: it's all in the journal
+
+    again = JournaledDocument(path, jpath)
+    state = again.load(PLAYER)
+    assert state["position"] == {"x": 4, "y": -4, "z": 0}
+    assert state["inventory"] == [{"name": "rope"}]
+    again.close()
+
+
+def test_document_compaction_applies_every_event_once(tmp_path):
+    path, jpath = str(tmp_path / "player-1.json"), str(tmp_path / "player-1.journal")
+    doc = JournaledDocument(path, jpath, compact_bytes=400)
+    doc.load(PLAYER)
+    for i in range(40):
+        doc.record({"t": "pickup", "item": {"name": f"pebble {i}"}})
+    doc.close()
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert 0 < snapshot["meta"]["journal_seq"] < 40  # compacted on the way
+
+    again = JournaledDocument(path, jpath)
+    state = again.load(PLAYER)
+    assert [it["name"] for it in state["inventory"]] == [f"pebble {i}" for i in range(40)]
+    # seq numbers keep counting across a reset, so nothing is applied twice
+    assert again.journal.last_seq == 40
+    again.close()
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    jpath = str(tmp_path / "x.journal")
+    j = Journal(jpath)
+    j.append({"t": "move", "x": 1, "y": 1, "z": 0})
+    j.append({"t": "move", "x": 2, "y": 2, "z": 0})
+    j.close()
+    with open(jpath, "ab") as f:
+        f.write(b'{"seq": 3, "t": "mo')
+    j = Journal(jpath)
+    assert j.last_seq == 2
+    assert [ev["x"] for ev in j.events()] == [1, 2]
+    assert j.append({"t": "move", "x": 3, "y": 3, "z": 0}) == 3
+    assert [ev["x"] for ev in j.events(after=1)] == [2, 3]
+    j.close()
+
+
+def edit(world, x, y, z):
+    world.record(x, y, z, {"t": "exit", "d": "n", "v": True})
+    world.record(x, y, z, {"t": "desc", "i": 0, "del": 0, "ins": "A cold cellar"})
+    world.record(x, y, z, {"t": "desc", "i": 7, "del": 6, "ins": "attic"})
+    world.record(x, y, z, {"t": "item_add", "path": [], "item": {"name": "box", "contains": []}})
+    world.record(x, y, z, {"t": "item_add", "path": [0], "item": {"name": "key"}})
+
+
+def expected(x, y, z):
+    tile = new_tile(x, y, z)
+    tile["exits"]["n"] = True
+    tile["description"] = "A cold attic"
+    tile["items"] = [{"name": "box", "contains": [{"name": "key"}]}]
+    return tile
+
+
+def test_world_journal_replay_and_compact(tmp_path):
+    world_path, jpath = str(tmp_path / "w.cogw"), str(tmp_path / "w.journal")
+    store = open_world(world_path)
+    world = WorldJournal(store, jpath)
+    edit(world, 1, 2, 0)
+    assert world.load(1, 2, 0) == expected(1, 2, 0)
+    assert store.get(1, 2, 0) is None  # only in the journal so far
+    world.close(compact=False)
+    store.close()
+
+    store = open_world(world_path)
+    world = WorldJournal(store, jpath)
+    assert world.load(1, 2, 0) == expected(1, 2, 0)
+    world.compact()
+    saved = store.get(1, 2, 0)
+    assert saved.pop("journal_seq") == 5
+    assert saved == expected(1, 2, 0)
+    world.record(1, 2, 0, {"t": "exit", "d": "s", "v": True})
+    world.close()
+    store.close()
+
+    store = open_world(world_path)
+    world = WorldJournal(store, jpath)
+    tile = world.load(1, 2, 0)
+    assert tile["exits"]["s"] and tile["description"] == "A cold attic"
+    assert tile["items"] == expected(1, 2, 0)["items"]  # not added a second time
+    world.close()
+    store.close()
+
+
+def test_save_tile_supersedes_its_events(tmp_path):
+    store = open_world(str(tmp_path / "tiles"))
+    world = WorldJournal(store, str(tmp_path / "w.journal"))
+    edit(world, 0, 0, 0)
+    by_hand = dict(new_tile(0, 0, 0), description="Written out whole")
+    world.save_tile(0, 0, 0, by_hand)
+    assert world.load(0, 0, 0)["description"] == "Written out whole"
+    world.close(compact=False)
+
+    world = WorldJournal(store, str(tmp_path / "w.journal"))
+    tile = world.load(0, 0, 0)  # the events are still in the journal, but older than the tile
+    assert tile["description"] == "Written out whole" and tile["items"] == []
+    world.close()
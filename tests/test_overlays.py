@@ -0,0 +1,72 @@
+"""Room overlays: the ways an item can be taken, and what the room looks like after."""
+from overlays import OverlayStore, remove_by_name_path
+from world_store import clone_json
+
+ROOM = [
+    {"name": "Chest", "desc": "the first chest", "contains": [{"name": "ring"}, {"name": "coin"}]},
+    {"name": "chest", "desc": "the second chest", "contains": [{"name": "ring"}]},
+    {"name": "old rock"},
+]
+
+
+def seen(store, items=ROOM, at=(0, 1, 0)):
+    return store.apply(*at, clone_json(items))
+
+
+def names(items):
+    return [(it["name"], it.get("desc"), [k["name"] for k in it.get("contains", [])]) for it in items]
+
+
+def test_take_from_the_second_of_two_chests(tmp_path):
+    store = OverlayStore(str(tmp_path))
+    store.record_removed(0, 1, 0, [["chest", 1], ["ring", 0]], room_size=3)
+    room = seen(store)
+    assert [k["name"] for k in room[0]["contains"]] == ["ring", "coin"]
+    assert room[1]["contains"] == []
+
+    # and it's still gone for the next player through
+    assert seen(OverlayStore(str(tmp_path))) == room
+    assert seen(OverlayStore(str(tmp_path), scope="player-2")) == ROOM
+
+
+def test_path_survives_the_room_being_edited(tmp_path):
+    store = OverlayStore(str(tmp_path))
+    store.record_removed(0, 1, 0, [["old rock", 2]], room_size=3)
+    edited = [{"name": "old rock"}, {"name": "lamp"}] + clone_json(ROOM[:2])
+    room = seen(OverlayStore(str(tmp_path)), edited)
+    assert [it["name"] for it in room] == ["lamp", "Chest", "chest"]
+
+
+def test_plain_name_paths_from_older_files(tmp_path):
+    items = clone_json(ROOM)
+    assert remove_by_name_path(items, ["CHEST ", "coin"]) == {"name": "coin"}
+    assert remove_by_name_path(items, ["chest", "nothing"]) is None
+    assert remove_by_name_path(items, ["old rock", "inside"]) is None
+    assert names(items)[0] == ("Chest", "the first chest", ["ring"])
+
+
+def test_dropped_then_taken_back_leaves_no_trace(tmp_path):
+    store = OverlayStore(str(tmp_path))
+    store.record_added(0, 1, 0, {"name": "torch"})
+    room = seen(store)
+    assert room[-1] == {"name": "torch"}
+    store.record_removed(0, 1, 0, [["torch", len(room) - 1]], room_size=len(room))
+    assert store.get(0, 1, 0) == {"removed": [], "added": []}
+    assert seen(OverlayStore(str(tmp_path))) == ROOM
+
+
+def test_taking_an_authored_item_with_the_same_name_as_a_dropped_one(tmp_path):
+    store = OverlayStore(str(tmp_path))
+    store.record_added(0, 1, 0, {"name": "old rock", "desc": "dropped"})
+    store.record_removed(0, 1, 0, [["old rock", 2]], room_size=4)
+    room = seen(OverlayStore(str(tmp_path)))
+    assert [it["name"] for it in room] == ["Chest", "chest", "old rock"]
+    assert room[-1]["desc"] == "dropped"
+
+
+def test_unreadable_overlay_falls_back_to_the_authored_room(tmp_path):
+    store = OverlayStore(str(tmp_path))
+    store.record_removed(0, 1, 0, [["old rock", 2]], room_size=3)
+    with open(store.filename(0, 1, 0), "w") as f:
+        f.write("{not json")
+    assert seen(OverlayStore(str(tmp_path))) == ROOM
@@ -0,0 +1,99 @@
+"""The gap buffer, wrapping, and the editor's incremental layout."""
+import random
+
+import pytest
+
+pytest.importorskip("pygame")
+
+from text_edit import GapBuffer, TextEditor, wrap_spans  # noqa: E402
+from journal import apply_tile_event  # noqa: E402
+
+WORDS = ["a", "cave", "damp", "tunnel", "glowing", "extraordinarily", "x" * 40, "\n", "\n\n"]
+
+
+class Font:
+    """Every character 8 pixels wide, like a fixed-width pygame font."""
+
+    def size(self, text):
+        return 8 * len(text), 16
+
+
+def test_gap_buffer_matches_a_string():
+    rng = random.Random(1)
+    buf, text = GapBuffer("start", gap=4), "start"
+    for _ in range(2000):
+        pos = rng.randint(0, len(text))
+        if rng.random() < 0.6:
+            s = rng.choice(WORDS) * rng.randint(1, 3)
+            buf.insert(pos, s)
+            text = text[:pos] + s + text[pos:]
+        else:
+            n = rng.randint(0, 12)
+            buf.delete(pos, n)
+            text = text[:pos] + text[pos + n:]
+        assert len(buf) == len(text)
+        if rng.random() < 0.2:
+            assert buf.text() == text
+    assert buf.text() == text
+
+
+@pytest.mark.parametrize("width", [8, 40, 100, 333])
+def test_wrap_spans(width):
+    rng = random.Random(width)
+    font = Font()
+    for _ in range(50):
+        text = " ".join(rng.choice(WORDS[:7]) for _ in range(rng.randint(0, 30)))
+        spans = wrap_spans(text, font, width)
+        assert spans[0][0] == 0 and spans[-1][1] == len(text)
+        for (s, e), (s2, _e2) in zip(spans, spans[1:]):
+            # the next line starts where this one stopped, or one on if it broke at a space
+            assert s2 in (e, e + 1) and (s2 == e or text[e] == " ")
+        for s, e in spans:
+            assert e > s or not text
+            assert font.size(text[s:e])[0] <= width or e - s == 1
+            if e < len(text) and text[e] != " ":
+                assert " " not in text[s + 1:e]  # only cut a word with no space to break at
+    assert wrap_spans("no wrapping at all", font, None) == [(0, 18)]
+
+
+def test_incremental_layout_matches_a_fresh_one():
+    rng = random.Random(7)
+    font = Font()
+    ed = TextEditor(font, "The first room.\n\nA second paragraph here.", max_len=5000)
+    for _ in range(300):
+        i = rng.randint(0, len(ed.text))
+        j = min(len(ed.text), i + rng.choice([0, 0, 1, 5, 30]))
+        ed.replace(i, j, rng.choice(WORDS) + rng.choice(["", " ", "\n"]))
+        width = rng.choice([120, 120, 120, 200])
+        fresh = TextEditor(font, ed.text, max_len=5000)
+        assert ed.lines(width) == fresh.lines(width)
+        assert "".join(line for _at, line in ed.lines(width)).replace(" ", "") == \
+            ed.text.replace("\n", "").replace(" ", "")
+
+
+def test_edits_replay_as_journal_events():
+    events = []
+    ed = TextEditor(Font(), "A cold cellar", max_len=40,
+                    on_edit=lambda i, deleted, inserted: events.append((i, deleted, inserted)))
+    ed.move_to(7)
+    ed.move_to(13, select=True)
+    assert ed.selected_text() == "cellar"
+    ed.type("attic")
+    ed.backspace()
+    ed.type("c!")
+    ed.move_to(0)
+    ed.delete_forward()
+    ed.type("A very, very, very, very long way down to a")  # cut at max_len
+    assert len(ed.text) == 40
+
+    tile = {"description": "A cold cellar"}
+    for i, deleted, inserted in events:
+        apply_tile_event(tile, {"t": "desc", "i": i, "del": deleted, "ins": inserted})
+    assert tile["description"] == ed.text
+
+
+def test_single_line_fields_keep_to_one_line():
+    ed = TextEditor(Font(), "", max_len=20, multiline=False)
+    ed.type("two\nlines")
+    assert ed.text == "two lines"
+    assert len(ed.lines(16)) == 1
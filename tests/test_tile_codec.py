@@ -0,0 +1,59 @@
+"""Every codec round-trips a tile, and decode() tells them apart by itself."""
+import json
+import zlib
+
+import pytest
+
+from tile_codec import CODECS, encode, decode, sniff, is_compressed, load_file
+
+TILE = {
+    "coords": {"x": -12, "y": 0, "z": 3},
+    "exits": {"n": True, "ne": False, "e": True},
+    "description": "A damp cavern.\nÉchos, 洞窟 and a ☃ drawn in the mud. " * 3,
+    "items": [{"name": "chest", "desc": "iron-bound",
+               "contains": [{"name": "coin", "desc": "worn", "value": 1.5},
+                            {"name": "gem", "big": 10 ** 30, "neg": -(2 ** 63), "none": None}]}],
+    "last_move": None,
+    "empty": {"list": [], "dict": {}, "str": ""},
+}
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip(codec):
+    data = encode(TILE, codec)
+    assert decode(data) == TILE
+    assert is_compressed(codec) == ("+" in codec)
+
+
+@pytest.mark.parametrize("codec, kind", [
+    ("json", "json"), ("json-compact", "json"), ("binary", "binary"),
+    ("json+zlib", "zlib"), ("binary+zlib", "zlib"), ("binary+lzma", "lzma"),
+])
+def test_sniff(codec, kind):
+    assert sniff(encode(TILE, codec)) == kind
+
+
+def test_older_files_still_load(tmp_path):
+    # bare zlib streams (region chunks from before codecs) and hand-saved JSON with a BOM
+    raw = zlib.compress(json.dumps(TILE).encode(), 6)
+    assert sniff(raw) == "raw-zlib"
+    assert decode(raw) == TILE
+    path = tmp_path / "00-00-00.json"
+    path.write_bytes(b"\xef\xbb\xbf" + json.dumps(TILE, indent=2).encode())
+    assert load_file(str(path)) == TILE
+
+
+def test_json_stays_readable():
+    assert json.loads(encode(TILE, "json")) == TILE
+    assert b"\n" not in encode(TILE, "json-compact")
+
+
+def test_bad_input():
+    with pytest.raises(ValueError):
+        encode(TILE, "yaml")
+    with pytest.raises(ValueError):
+        encode(TILE, "json+brotli")
+    with pytest.raises(ValueError):
+        decode(encode(TILE, "binary") + b"N")  # trailing bytes
+    with pytest.raises(ValueError):
+        decode(b"\x00CW?whatever")
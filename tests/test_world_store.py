@@ -0,0 +1,194 @@
+"""The packed (.cogw) and region (.regions) stores: round trips, crashes, compaction."""
+import os
+import random
+
+import pytest
+
+from tile_codec import sniff
+from world_store import (FolderStore, PackedStore, RegionStore, open_world, copy_world,
+                         HEADER, RECORD, FLAG_DEAD, _FLAGS_AT)
+
+
+def tile(x, y, z, text="A plain room", items=()):
+    return {"coords": {"x": x, "y": y, "z": z}, "exits": {"n": True, "s": False},
+            "description": text, "items": list(items)}
+
+
+def babble(n, seed=0):
+    # words that zlib can't squeeze back into the old slot
+    rng = random.Random(seed)
+    return " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(5))
+                    for _ in range(n))
+
+
+def fill(store, box=range(-3, 3), z=0, text="A plain room"):
+    tiles = {}
+    for x in box:
+        for y in box:
+            tiles[(x, y, z)] = tile(x, y, z, text)
+            store.put(x, y, z, tiles[(x, y, z)])
+    return tiles
+
+
+def record_flags(path, offset):
+    with open(path, "rb") as f:
+        f.seek(offset + _FLAGS_AT)
+        return f.read(1)[0]
+
+
+def header(path):
+    with open(path, "rb") as f:
+        return HEADER.unpack(f.read(HEADER.size))
+
+
+# --- packed ---
+
+def test_packed_round_trip(tmp_path):
+    path = str(tmp_path / "w.cogw")
+    with PackedStore(path) as store:
+        tiles = fill(store)
+        store.put(0, 0, 1, tile(0, 0, 1, "é, 大, and a very long description " * 20))
+        tiles[(0, 0, 1)] = store.get(0, 0, 1)
+    _magic, _version, token, index_offset, index_count = header(path)
+    assert index_offset and index_count == len(tiles) and token
+
+    with PackedStore(path) as store:
+        assert len(store) == len(tiles)
+        assert set(store.coords()) == set(tiles)
+        for c, t in tiles.items():
+            assert store.get(*c) == t
+        assert store.get(9, 9, 9) is None and not store.exists(9, 9, 9)
+
+
+def test_packed_overwrite_in_place_and_dead_records(tmp_path):
+    path = str(tmp_path / "w.cogw")
+    with PackedStore(path) as store:
+        store.put(1, 2, 3, tile(1, 2, 3, "short"))
+        first = store.index[(1, 2, 3)]
+        store.put(1, 2, 3, tile(1, 2, 3, "still short"))
+        assert store.index[(1, 2, 3)][0] == first[0]  # fitted in its slack
+        long_text = babble(200)
+        store.put(1, 2, 3, tile(1, 2, 3, long_text))
+        moved = store.index[(1, 2, 3)]
+        assert moved[0] > first[0]
+    assert record_flags(path, first[0]) & FLAG_DEAD
+    assert not record_flags(path, moved[0]) & FLAG_DEAD
+    with PackedStore(path) as store:
+        assert store.get(1, 2, 3)["description"] == long_text
+
+
+def test_packed_unclean_close_scans_records(tmp_path):
+    path = str(tmp_path / "w.cogw")
+    with PackedStore(path) as store:
+        tiles = fill(store)
+    store = PackedStore(path)
+    grown = babble(100)
+    store.put(0, 0, 0, tile(0, 0, 0, grown))  # re-appended: the old one is dead
+    store.put(5, 5, 5, tile(5, 5, 5, "new"))
+    store.f.close()  # a crash: no index written
+    assert header(path)[3] == 0  # the stale index was dropped at the first put
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(b"TILE", 7, 7, 7, 0, 500, 512) + b"torn")  # half an append
+
+    with PackedStore(path) as store:
+        assert store.get(0, 0, 0)["description"] == grown
+        assert store.get(5, 5, 5)["description"] == "new"
+        assert store.get(7, 7, 7) is None
+        assert len(store) == len(tiles) + 1
+    assert header(path)[3]  # and the index is back on close
+
+
+def test_packed_readonly_sees_a_scanned_file_but_never_writes(tmp_path):
+    path = str(tmp_path / "w.cogw")
+    store = PackedStore(path)
+    fill(store)
+    store.f.flush()
+    size = os.path.getsize(path)
+    with PackedStore(path, readonly=True) as reader:
+        assert reader.fingerprint() is None  # no index, so no token to trust
+        assert reader.get(1, 1, 0) == tile(1, 1, 0)
+        with pytest.raises(OSError):
+            reader.put(0, 0, 0, tile(0, 0, 0))
+    assert os.path.getsize(path) == size
+    store.close()
+
+
+def test_packed_compact(tmp_path):
+    path = str(tmp_path / "w.cogw")
+    with PackedStore(path) as store:
+        tiles = fill(store)
+        for c in list(tiles)[:10]:
+            tiles[c] = tile(*c, babble(50, seed=str(c)))
+            store.put(*c, tiles[c])
+        store.flush()
+        before = os.path.getsize(path)
+        seen = store.fingerprint()
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"left by a crashed compaction")
+        store.compact()
+        assert os.path.getsize(path) < before
+        assert not os.path.exists(path + ".tmp")
+        assert store.fingerprint() == seen  # the same tiles
+        for c, t in tiles.items():
+            assert store.get(*c) == t
+        store.put(9, 9, 9, tile(9, 9, 9))
+        assert store.fingerprint() != seen
+    with PackedStore(path) as store:
+        assert len(store) == len(tiles) + 1
+        for off, flags, _length, _cap in store.index.values():
+            assert not record_flags(path, off) & FLAG_DEAD
+
+
+def test_fingerprint_changes_with_every_write_after_it_was_seen(tmp_path):
+    for path in (str(tmp_path / "w.cogw"), str(tmp_path / "w.regions"), str(tmp_path / "tiles")):
+        store = open_world(path)
+        fill(store)
+        store.flush()
+        first = store.fingerprint()
+        assert first is not None and store.fingerprint() == first
+        store.put(0, 0, 0, tile(0, 0, 0, "changed, and longer than before"))
+        store.flush()
+        assert store.fingerprint() != first
+        store.close()
+
+
+# --- regions ---
+
+def test_region_chunk_files(tmp_path):
+    path = str(tmp_path / "w.regions")
+    with RegionStore(path, max_chunks=2) as store:  # so chunks get evicted, and written, early
+        tiles = fill(store, box=range(-20, 20))
+        assert store.get(-20, -20, 0) == tiles[(-20, -20, 0)]
+    names = sorted(n for n in os.listdir(path) if n.endswith(".cogr"))
+    assert "r.-1.-1.0.cogr" in names and "r.0.0.0.cogr" in names and len(names) == 16
+    with open(os.path.join(path, "r.0.0.0.cogr"), "rb") as f:
+        assert sniff(f.read()) == "raw-zlib"  # what chunks looked like before codecs
+
+    store = open_world(path)
+    assert isinstance(store, RegionStore)
+    assert set(store.coords()) == set(tiles)
+    for c, t in tiles.items():
+        assert store.get(*c) == t
+
+
+def test_region_box_queries(tmp_path):
+    with RegionStore(str(tmp_path / "w.regions")) as store:
+        fill(store, box=range(-20, 20))
+        fill(store, box=range(-20, 20), z=5)
+        assert store.coords_in_box(-17, -15, 14, 16, 0, 0) == [
+            (x, y, 0) for y in range(14, 17) for x in range(-17, -14)]
+        found = dict(store.rooms_in_box(-1, 0, -1, 0, 0, 5))
+        assert sorted(found) == sorted((x, y, z) for x in (-1, 0) for y in (-1, 0) for z in (0, 5))
+        assert found[(0, 0, 5)]["coords"] == {"x": 0, "y": 0, "z": 5}
+        near = {c for c, _t in store.rooms_within(0, 0, 0, 1, z_radius=0)}
+        assert near == {(x, y, 0) for x in (-1, 0, 1) for y in (-1, 0, 1)}
+
+
+def test_copy_between_layouts(tmp_path):
+    with FolderStore(str(tmp_path / "tiles")) as src:
+        tiles = fill(src)
+    for dst_path in (str(tmp_path / "w.cogw"), str(tmp_path / "w.regions")):
+        with open_world(str(tmp_path / "tiles")) as src, open_world(dst_path) as dst:
+            assert copy_world(src, dst) == len(tiles)
+        with open_world(dst_path) as dst:
+            assert {c: dst.get(*c) for c in dst.coords()} == tiles
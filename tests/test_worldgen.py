@@ -0,0 +1,63 @@
+"""Generated rooms: the same whichever way they're made."""
+import random
+
+import pytest
+
+import worldgen
+from worldgen import Generator, generate_region
+from world_store import open_world
+
+
+def region(gen, box, existing):
+    x0, x1, y0, y1 = box
+    return {(x, y): tile for x, y, tile in gen.region_rows(x0, x1, y0, y1, 0, existing)}
+
+
+def hand_built(seed):
+    # a few rooms already there, with exits the noise wouldn't have given them
+    rng = random.Random(seed)
+    out = {}
+    for _ in range(25):
+        c = (rng.randint(-10, 40), rng.randint(-10, 40), 0)
+        out[c] = {d: rng.random() < 0.5 for d in worldgen.EXIT_ORDER}
+    return out
+
+
+@pytest.mark.parametrize("seed", [0, 42, 2 ** 40 + 3])
+def test_numpy_and_rows_make_the_same_tiles(seed, monkeypatch):
+    pytest.importorskip("numpy")
+    assert worldgen.np is not None
+    box, existing = (-12, 37, -9, 41), hand_built(seed)
+    fast = region(Generator(seed), box, existing)
+    monkeypatch.setattr(worldgen, "np", None)
+    slow = region(Generator(seed), box, existing)
+    assert fast == slow
+    assert len(fast) > 500
+
+
+@pytest.mark.parametrize("seed", [0, 7])
+def test_region_matches_room_by_room(seed):
+    gen = Generator(seed)
+    existing = hand_built(seed)
+    made = region(gen, (-12, 37, -9, 41), existing)
+    lookup = lambda *c: existing.get(c)  # noqa: E731
+    for (x, y), tile in made.items():
+        assert tile == gen.tile(x, y, 0, lookup)
+    for x in range(-12, 38):
+        for y in range(-9, 42):
+            if (x, y, 0) not in existing and (x, y) not in made:
+                assert not gen.room_at(x, y, 0)
+
+
+def test_generate_region_keeps_hand_built_tiles(tmp_path):
+    store = open_world(str(tmp_path / "w.cogw"))
+    mine = {"coords": {"x": 3, "y": 3, "z": 0}, "exits": {"n": True, "e": False},
+            "description": "hand built", "items": []}
+    store.put(3, 3, 0, mine)
+    made = generate_region(store, Generator(9), 0, 0, 29, 29)
+    assert store.get(3, 3, 0) == mine
+    assert all(c != (3, 3) for c in ((x, y) for x, y, _t in made))
+    above = store.get(3, 4, 0)
+    assert above is not None and above["exits"]["s"]  # joined up to the exit going its way
+    assert generate_region(store, Generator(9), 0, 0, 29, 29) == []
+    store.close()
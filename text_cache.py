@@ -0,0 +1,70 @@
+"""Shared cache of rendered text surfaces for game.py and game-main.py.
+
+Most of what the two programs draw every frame is the same text over and
+over (titles, button captions, compass and exit labels, the command bar),
+and font.render is the expensive part of a frame. render_text() hands back
+the surface from last time when (font, text, colour, antialias, background)
+match, and keeps the cache within `max_items` surfaces / `max_bytes` of
+pixels, dropping the least recently used first.
+
+Surfaces coming out of the cache are shared: blit them, don't draw on them.
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_items=2048, max_bytes=16 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()  # key -> (surface, nbytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, antialias=True, background=None):
+        key = (font, text, tuple(color), antialias,
+               None if background is None else tuple(background))
+        got = self.surfaces.get(key)
+        if got is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return got[0]
+        self.misses += 1
+        if background is None:
+            surf = font.render(text, antialias, color)
+        else:
+            surf = font.render(text, antialias, color, background)
+        nbytes = surf.get_width() * surf.get_height() * surf.get_bytesize()
+        if nbytes > self.max_bytes:
+            return surf  # too big to be worth keeping
+        self.surfaces[key] = (surf, nbytes)
+        self.bytes += nbytes
+        while len(self.surfaces) > self.max_items or self.bytes > self.max_bytes:
+            _, (_, old_bytes) = self.surfaces.popitem(last=False)
+            self.bytes -= old_bytes
+            self.evictions += 1
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "surfaces": len(self.surfaces),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, color, antialias=True, background=None):
+    """font.render(text, antialias, color), through the shared TEXT_CACHE."""
+    return TEXT_CACHE.render(font, text, color, antialias, background)
@@ -0,0 +1,383 @@
+"""Text editing for the map builder's input boxes.
+
+The builder used to keep each field as a plain string, append to it on
+every keystroke and re-wrap the whole thing twice a frame, stepping a
+character at a time through long words with font.size(). TextEditor
+instead keeps
+
+  - the text in a GapBuffer, so typing or deleting at the cursor only
+    moves the characters between the old and new edit points,
+  - the wrapped layout per paragraph, so after an edit only the paragraphs
+    that actually changed are wrapped again, and
+  - a cursor and a selection, driven by handle_key(): arrows, Home/End,
+    Shift to select, Ctrl+A/C/X/V, Backspace/Delete.
+
+The description box and both fields of the Add Item popup are editors.
+on_edit(i, deleted, inserted) is called for every change to the text, with
+the same meaning as a journal "desc" event: replace `deleted` characters
+at i with `inserted`.
+"""
+import pygame
+
+from text_cache import render_text
+
+
+class GapBuffer:
+    """A list of characters with a movable hole at the edit point."""
+
+    def __init__(self, text="", gap=64):
+        self.buf = list(text) + [""] * gap
+        self.gap_start = len(text)
+        self.gap_end = len(self.buf)
+        self._text = text
+
+    def __len__(self):
+        return len(self.buf) - (self.gap_end - self.gap_start)
+
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self.buf[:self.gap_start]) + "".join(self.buf[self.gap_end:])
+        return self._text
+
+    def _move_gap(self, pos):
+        if pos < self.gap_start:
+            n = self.gap_start - pos
+            self.buf[self.gap_end - n:self.gap_end] = self.buf[pos:self.gap_start]
+            self.gap_start -= n
+            self.gap_end -= n
+        elif pos > self.gap_start:
+            n = pos - self.gap_start
+            self.buf[self.gap_start:self.gap_start + n] = self.buf[self.gap_end:self.gap_end + n]
+            self.gap_start += n
+            self.gap_end += n
+
+    def insert(self, pos, s):
+        self._move_gap(pos)
+        if len(s) > self.gap_end - self.gap_start:
+            grow = len(s) + len(self.buf) // 2 + 64
+            self.buf[self.gap_end:self.gap_end] = [""] * grow
+            self.gap_end += grow
+        self.buf[self.gap_start:self.gap_start + len(s)] = s
+        self.gap_start += len(s)
+        self._text = None
+
+    def delete(self, pos, n):
+        self._move_gap(pos)
+        self.gap_end = min(len(self.buf), self.gap_end + n)
+        self._text = None
+
+
+def wrap_spans(text, font, max_width):
+    """Break one paragraph into [(start, end), ...] lines no wider than max_width.
+
+    Lines break after the last space that fits; a word too long for a line
+    is cut where it stops fitting. The space a line breaks at is not part of
+    either line. max_width None means no wrapping.
+
+    Where a line ends is found by stepping forward about a line's worth of
+    characters at a time and then bisecting, so font.size() only ever sees
+    line-sized strings, a handful of times per line.
+    """
+    n = len(text)
+    if max_width is None:
+        return [(0, n)]
+    step = max(4, max_width // max(1, font.size("e")[0]))
+    spans = []
+    start = 0
+    while True:
+        lo, hi = start + 1, min(n, start + step)  # text[start:lo] is drawn even if it doesn't fit
+        while font.size(text[start:hi])[0] <= max_width:
+            if hi == n:
+                spans.append((start, n))
+                return spans
+            lo, hi = hi, min(n, hi + step)
+        hi -= 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if font.size(text[start:mid])[0] <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        brk = text.rfind(" ", start + 1, lo + 1)
+        if brk > start:
+            spans.append((start, brk))
+            start = brk + 1
+        else:
+            spans.append((start, lo))
+            start = lo
+
+
+class TextEditor:
+    def __init__(self, font, text="", max_len=2000, multiline=True, on_edit=None):
+        self.font = font
+        self.width = None  # wrap width, set by draw()
+        self.max_len = max_len
+        self.multiline = multiline
+        self.on_edit = on_edit
+        self.set_text(text)
+
+    # --- text ---
+
+    @property
+    def text(self):
+        return self.buf.text()
+
+    def set_text(self, text):
+        """Replace everything (loading a room, clearing a field); not an edit."""
+        self.buf = GapBuffer(text)
+        self.cursor = self.anchor = len(text)
+        self.paras = []      # [(paragraph text, [(start, end), ...]), ...]
+        self.layout_key = None
+        self._lines = (None, None, [])  # (text, width, lines) from the last lines() call
+        self.first_line = 0  # top line shown, when the box is too small
+        self.scroll_x = 0    # single-line fields slide sideways instead
+        self.goal_x = None   # x the cursor keeps while moving up/down
+
+    def replace(self, i, j, s):
+        """Put s in place of text[i:j], within max_len; returns what went in."""
+        if not self.multiline:
+            s = s.replace("\n", " ")
+        s = s[:max(0, self.max_len - (len(self.buf) - (j - i)))]
+        if j == i and not s:
+            return s
+        if j > i:
+            self.buf.delete(i, j - i)
+        if s:
+            self.buf.insert(i, s)
+        self.cursor = self.anchor = i + len(s)
+        self.goal_x = None
+        if self.on_edit is not None:
+            self.on_edit(i, j - i, s)
+        return s
+
+    # --- selection ---
+
+    def selection(self):
+        return min(self.cursor, self.anchor), max(self.cursor, self.anchor)
+
+    def selected_text(self):
+        i, j = self.selection()
+        return self.text[i:j]
+
+    def move_to(self, pos, select=False):
+        self.cursor = max(0, min(pos, len(self.buf)))
+        if not select:
+            self.anchor = self.cursor
+
+    def type(self, s):
+        i, j = self.selection()
+        self.replace(i, j, s)
+
+    def backspace(self):
+        i, j = self.selection()
+        if i == j and i > 0:
+            i -= 1
+        self.replace(i, j, "")
+
+    def delete_forward(self):
+        i, j = self.selection()
+        if i == j and j < len(self.buf):
+            j += 1
+        self.replace(i, j, "")
+
+    # --- layout ---
+
+    def layout(self, width):
+        """[(paragraph start, paragraph text, [(start, end), ...]), ...] for the text."""
+        key = (self.font, width)
+        new = self.text.split("\n")
+        old = self.paras if key == self.layout_key else []
+        # paragraphs the edit didn't touch keep their lines: match from both ends
+        same_head = 0
+        while same_head < min(len(old), len(new)) and old[same_head][0] == new[same_head]:
+            same_head += 1
+        same_tail = 0
+        while (same_tail < min(len(old), len(new)) - same_head
+               and old[-1 - same_tail][0] == new[-1 - same_tail]):
+            same_tail += 1
+        middle = [(p, wrap_spans(p, self.font, width))
+                  for p in new[same_head:len(new) - same_tail]]
+        self.paras = old[:same_head] + middle + old[len(old) - same_tail:]
+        self.layout_key = key
+
+        out = []
+        at = 0
+        for p, spans in self.paras:
+            out.append((at, p, spans))
+            at += len(p) + 1
+        return out
+
+    def lines(self, width=None):
+        """[(text offset, line text), ...] for every wrapped line.
+
+        width defaults to the width the editor was last drawn at.
+        """
+        width = (width or self.width) if self.multiline else None
+        text = self.text
+        if self._lines[0] is not text or self._lines[1] != width:
+            lines = [(at + s, p[s:e]) for at, p, spans in self.layout(width) for s, e in spans]
+            self._lines = (text, width, lines)
+        return self._lines[2]
+
+    def _line_of(self, lines, pos):
+        for n in range(len(lines) - 1, -1, -1):
+            if lines[n][0] <= pos:
+                return n
+        return 0
+
+    def move_line(self, step, select=False):
+        lines = self.lines()
+        n = self._line_of(lines, self.cursor)
+        start, line = lines[n]
+        if self.goal_x is None:
+            self.goal_x = self.font.size(line[:self.cursor - start])[0]
+        goal = self.goal_x
+        if 0 <= n + step < len(lines):
+            start, line = lines[n + step]
+            self.move_to(start + self._column(line, goal), select)
+        else:
+            self.move_to(0 if step < 0 else len(self.buf), select)
+        self.goal_x = goal
+
+    def _column(self, line, x):
+        # the character boundary in line nearest to x pixels
+        lo, hi = 0, len(line)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.font.size(line[:mid + 1])[0] <= x:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(line):
+            left = self.font.size(line[:lo])[0]
+            right = self.font.size(line[:lo + 1])[0]
+            if x - left > right - x:
+                lo += 1
+        return lo
+
+    def line_home_end(self, end, select=False):
+        lines = self.lines()
+        n = self._line_of(lines, self.cursor)
+        start, line = lines[n]
+        self.move_to(start + len(line) if end else start, select)
+
+    # --- input ---
+
+    def handle_key(self, event):
+        """Apply a KEYDOWN to the editor; False if it's not one the editor uses."""
+        shift = bool(event.mod & pygame.KMOD_SHIFT)
+        ctrl = bool(event.mod & (pygame.KMOD_CTRL | pygame.KMOD_META))
+        key = event.key
+        if ctrl and key == pygame.K_a:
+            self.anchor, self.cursor = 0, len(self.buf)
+        elif ctrl and key in (pygame.K_c, pygame.K_x):
+            if self.cursor != self.anchor:
+                clipboard_put(self.selected_text())
+                if key == pygame.K_x:
+                    self.type("")
+        elif ctrl and key == pygame.K_v:
+            self.type(clipboard_get())
+        elif key == pygame.K_BACKSPACE:
+            self.backspace()
+        elif key == pygame.K_DELETE:
+            self.delete_forward()
+        elif key == pygame.K_LEFT:
+            i, j = self.selection()
+            self.move_to(self.cursor - 1 if shift or i == j else i, shift)
+        elif key == pygame.K_RIGHT:
+            i, j = self.selection()
+            self.move_to(self.cursor + 1 if shift or i == j else j, shift)
+        elif key in (pygame.K_UP, pygame.K_DOWN) and self.multiline:
+            self.move_line(-1 if key == pygame.K_UP else 1, shift)
+        elif key == pygame.K_HOME:
+            if ctrl:
+                self.move_to(0, shift)
+            else:
+                self.line_home_end(False, shift)
+        elif key == pygame.K_END:
+            if ctrl:
+                self.move_to(len(self.buf), shift)
+            else:
+                self.line_home_end(True, shift)
+        elif key in (pygame.K_RETURN, pygame.K_KP_ENTER) and self.multiline:
+            self.type("\n")
+        elif (event.unicode and not ctrl
+              and (32 <= ord(event.unicode) <= 126 or ord(event.unicode) >= 160)):
+            self.type(event.unicode)
+        else:
+            return False
+        if key not in (pygame.K_UP, pygame.K_DOWN):
+            self.goal_x = None
+        return True
+
+    def click(self, pos, rect, line_gap=2, select=False):
+        """Put the cursor at the character nearest pos (as drawn by draw())."""
+        lines = self.lines(rect.w)
+        n = self.first_line + (pos[1] - rect.y) // (self.font.get_height() + line_gap)
+        n = max(0, min(n, len(lines) - 1))
+        start, line = lines[n]
+        self.move_to(start + self._column(line, pos[0] - rect.x + self.scroll_x), select)
+        self.goal_x = None
+
+    # --- drawing ---
+
+    def draw(self, surf, rect, color, caret=False, line_gap=2, select_color=(70, 110, 160)):
+        """Draw the text wrapped to rect.w, scrolled to keep the cursor in rect."""
+        font = self.font
+        self.width = rect.w
+        lines = self.lines()
+        line_h = font.get_height() + line_gap
+        rows = max(1, rect.h // line_h)
+        cur = self._line_of(lines, self.cursor)
+        if cur < self.first_line:
+            self.first_line = cur
+        elif cur >= self.first_line + rows:
+            self.first_line = cur - rows + 1
+        self.first_line = max(0, min(self.first_line, len(lines) - rows))
+        if not self.multiline:
+            cx = font.size(lines[0][1][:self.cursor])[0]
+            self.scroll_x = max(0, min(self.scroll_x, cx), cx - rect.w + 1)
+        x = rect.x - self.scroll_x
+
+        sel_i, sel_j = self.selection()
+        old_clip = surf.get_clip()
+        surf.set_clip(rect.clip(old_clip))
+        y = rect.y
+        for n in range(self.first_line, min(len(lines), self.first_line + rows + 1)):
+            start, line = lines[n]
+            if sel_i < sel_j and sel_i <= start + len(line) and sel_j >= start:
+                a = max(sel_i, start) - start
+                b = min(sel_j, start + len(line)) - start
+                x0 = x + font.size(line[:a])[0]
+                x1 = x + font.size(line[:b])[0]
+                if sel_j > start + len(line):
+                    x1 += font.size(" ")[0]  # the line break is selected too
+                pygame.draw.rect(surf, select_color, (x0, y, x1 - x0, font.get_height()))
+            if line:
+                surf.blit(render_text(font, line, color), (x, y))
+            if caret and n == cur:
+                cx = x + font.size(line[:self.cursor - start])[0]
+                pygame.draw.line(surf, color, (cx, y), (cx, y + font.get_height()), 1)
+            y += line_h
+        surf.set_clip(old_clip)
+
+
+_clipboard = [""]  # used when the system clipboard isn't available
+
+
+def clipboard_put(text):
+    _clipboard[0] = text
+    try:
+        pygame.scrap.put_text(text)
+    except (AttributeError, pygame.error):
+        pass
+
+
+def clipboard_get():
+    try:
+        text = pygame.scrap.get_text()
+        if text:
+            return text.replace("\r\n", "\n").replace("\r", "\n")
+    except (AttributeError, pygame.error):
+        pass
+    return _clipboard[0]
@@ -0,0 +1,301 @@
+"""Things that happen on their own: wandering creatures and delayed actions.
+
+  TimingWheel  after(delay, fn, *args) is O(1); each tick only touches the
+               one slot that is due, however much is scheduled further out
+  Simulation   the creatures, kept per chunk (world_store.chunk_of)
+
+Only chunks near a player are awake. Creatures there take a step every
+`every` ticks, driven by the wheel. Everywhere else nothing runs at all;
+a chunk just remembers nothing happened. When a player comes near, the
+chunk wakes and each creature first takes the steps it would have taken
+while nobody was watching (at most CATCH_UP_STEPS; after that long it
+could be anywhere nearby anyway), then carries on in step with the rest.
+So the cost of a tick follows the number of creatures near players, not
+the number in the world.
+
+Creatures come from the tiles, read the first time their chunk wakes:
+
+    "creatures": [{"name": "goblin", "desc": "green and snarling", "every": 12}]
+
+Each one wanders from the room it was listed in, picking among the open
+exits with its own small random generator.
+"""
+from world_store import CHUNK_SIZE, chunk_of
+
+CATCH_UP_STEPS = 32   # most steps a creature replays when its chunk wakes
+DEFAULT_EVERY = 8     # ticks between steps when a tile doesn't say
+MASK64 = (1 << 64) - 1
+
+
+class TimingWheel:
+    """A hashed timing wheel: one slot per tick, modulo the wheel size.
+
+    Things due further out than one turn of the wheel wait in their slot
+    and are skipped until their turn comes round.
+    """
+
+    def __init__(self, slots=512):
+        self.slots = [[] for _ in range(slots)]
+        self.now = 0
+
+    def after(self, delay, fn, *args):
+        due = self.now + max(1, int(delay))
+        self.slots[due % len(self.slots)].append((due, fn, args))
+        return due
+
+    def advance(self):
+        """Move to the next tick and run what is due; returns how many ran."""
+        self.now += 1
+        now = self.now
+        i = now % len(self.slots)
+        slot = self.slots[i]
+        if not slot:
+            return 0
+        self.slots[i] = [job for job in slot if job[0] != now]
+        ran = 0
+        for due, fn, args in slot:
+            if due == now:
+                fn(*args)
+                ran += 1
+        return ran
+
+    def __len__(self):
+        return sum(len(s) for s in self.slots)
+
+
+class Creature:
+    __slots__ = ("id", "name", "desc", "x", "y", "z", "every", "rng", "last", "due", "gen", "key")
+
+    def __init__(self, cid, name, desc, x, y, z, every, seed):
+        self.id = cid
+        self.name = name
+        self.desc = desc
+        self.x, self.y, self.z = x, y, z
+        self.every = max(1, int(every))
+        self.rng = (seed * 0x9E3779B97F4A7C15 + cid * 0xBF58476D1CE4E5B9 + 1) & MASK64 or 1
+        self.last = 0  # tick of its last step (or of its spawn)
+        self.due = 0   # tick of its next step on the wheel; 0 while asleep
+        self.gen = 0   # bumped to call off a step already on the wheel
+        self.key = None  # the chunk it's filed under
+
+    @property
+    def where(self):
+        return (self.x, self.y, self.z)
+
+    def roll(self, n):
+        # xorshift64: cheap, and the same walk every time for the same seed
+        r = self.rng
+        r ^= (r << 13) & MASK64
+        r ^= r >> 7
+        r ^= (r << 17) & MASK64
+        self.rng = r
+        return r % n
+
+
+class Simulation:
+    def __init__(self, exits_of, dirs, spawns_in=None, chunk=CHUNK_SIZE, radius=(1, 1, 0),
+                 seed=0, slots=512):
+        # exits_of(x, y, z): open exit keys of that room, or None if there's no room
+        # spawns_in(chunk_key): [((x, y, z), {"name": ..., ...}), ...] for that chunk
+        # radius: chunks around a player kept awake; None keeps everything awake
+        self.exits_of = exits_of
+        self.dirs = dirs
+        self.spawns_in = spawns_in
+        self.chunk = chunk
+        self.radius = radius
+        self.seed = seed
+        self.wheel = TimingWheel(slots)
+        self.on_move = None  # on_move(creature, old, new, direction), for awake chunks
+        self.chunks = {}     # chunk -> set of creatures in it
+        self.rooms = {}      # (x, y, z) -> creatures there, oldest arrival first
+        self.interest = {}   # chunk -> how many players keep it awake
+        self.players = {}    # player key -> set of chunks it keeps awake
+        self.spawned = set() # chunks whose tiles have been read for creatures
+        self.exit_memo = {}  # chunk -> {(x, y, z): open exits}, while it's awake
+        self.next_id = 1
+        self.steps = 0       # steps taken live
+        self.replayed = 0    # steps taken while catching up
+
+    @property
+    def now(self):
+        return self.wheel.now
+
+    def after(self, delay, fn, *args):
+        """Run fn(*args) `delay` ticks from now."""
+        return self.wheel.after(delay, fn, *args)
+
+    def tick(self):
+        return self.wheel.advance()
+
+    # --- creatures ---
+
+    def add(self, name, x, y, z, desc="", every=DEFAULT_EVERY):
+        c = Creature(self.next_id, name, desc, x, y, z, every, self.seed)
+        self.next_id += 1
+        c.last = self.now
+        self._place(c)
+        if self.awake(c.key):
+            # start out of step with the others, or they'd all move on one tick
+            self._schedule(c, 1 + c.roll(c.every))
+        return c
+
+    def remove(self, c):
+        self._cancel(c)
+        self._unplace(c)
+
+    def creatures_at(self, x, y, z):
+        return list(self.rooms.get((x, y, z), ()))
+
+    def __len__(self):
+        return sum(len(s) for s in self.chunks.values())
+
+    def _place(self, c):
+        c.key = chunk_of(c.x, c.y, c.z, self.chunk)
+        self.chunks.setdefault(c.key, set()).add(c)
+        self.rooms.setdefault((c.x, c.y, c.z), []).append(c)
+
+    def _unplace(self, c):
+        members = self.chunks.get(c.key)
+        if members is not None:
+            members.discard(c)
+            if not members:
+                del self.chunks[c.key]
+        where = (c.x, c.y, c.z)
+        here = self.rooms.get(where)
+        if here is not None:
+            here.remove(c)
+            if not here:
+                del self.rooms[where]
+
+    def _schedule(self, c, delay):
+        c.gen += 1
+        c.due = self.wheel.after(delay, self._step, c, c.gen)
+
+    def _cancel(self, c):
+        c.gen += 1  # whatever was on the wheel for it is void now
+        c.due = 0
+
+    def _move(self, c):
+        # one step through a random open exit; returns (old, new, dir) or None
+        old = (c.x, c.y, c.z)
+        memo = self.exit_memo.get(c.key)
+        if memo is None:
+            memo = self.exit_memo[c.key] = {}
+        exits = memo.get(old)
+        if exits is None:
+            exits = memo[old] = tuple(self.exits_of(*old) or ())
+        if not exits:
+            return None
+        d = exits[c.roll(len(exits))]
+        dx, dy, dz = self.dirs[d]
+        self._unplace(c)
+        c.x += dx
+        c.y += dy
+        c.z += dz
+        self._place(c)
+        return old, (c.x, c.y, c.z), d
+
+    def _step(self, c, gen):
+        if gen != c.gen:
+            return  # called off: it went to sleep, or was rescheduled
+        moved = self._move(c)
+        self.steps += 1
+        c.last = self.now
+        c.due = 0
+        if self.awake(c.key):
+            self._schedule(c, c.every)
+        # else it walked out of everyone's range and dozes off where it is
+        if moved is not None and self.on_move is not None:
+            self.on_move(c, *moved)
+
+    # --- who is watching ---
+
+    def awake(self, key):
+        return self.radius is None or key in self.interest
+
+    def chunks_around(self, coords):
+        cx, cy, cz = chunk_of(*coords, self.chunk)
+        rx, ry, rz = self.radius
+        return {(cx + i, cy + j, cz + k)
+                for i in range(-rx, rx + 1)
+                for j in range(-ry, ry + 1)
+                for k in range(-rz, rz + 1)}
+
+    def player_at(self, key, coords):
+        """Player `key` (anything hashable) is now at coords."""
+        if self.radius is None:
+            self._spawn_around(coords)
+            return
+        new = self.chunks_around(coords)
+        old = self.players.get(key, set())
+        if new == old:
+            return
+        self.players[key] = new
+        for ch in new - old:
+            self.interest[ch] = self.interest.get(ch, 0) + 1
+            if self.interest[ch] == 1:
+                self._wake(ch)
+        self._release(old - new)
+
+    def player_left(self, key):
+        self._release(self.players.pop(key, set()))
+
+    def _release(self, chunks):
+        for ch in chunks:
+            self.interest[ch] -= 1
+            if self.interest[ch] == 0:
+                del self.interest[ch]
+                self._sleep(ch)
+
+    def _spawn(self, key):
+        if key in self.spawned:
+            return
+        self.spawned.add(key)
+        if self.spawns_in is None:
+            return
+        for (x, y, z), spec in self.spawns_in(key):
+            self.add(spec.get("name", "creature"), x, y, z,
+                     desc=spec.get("desc", ""), every=spec.get("every", DEFAULT_EVERY))
+
+    def _spawn_around(self, coords):
+        for ch in self.chunks_around(coords) if self.radius else [chunk_of(*coords, self.chunk)]:
+            self._spawn(ch)
+
+    def _wake(self, key):
+        self._spawn(key)  # its creatures are scheduled by add()
+        now = self.now
+        passed = set()  # sleeping chunks the catch-up walked through
+        for c in list(self.chunks.get(key, ())):
+            if c.due:
+                continue  # just spawned, or wandered in from an awake chunk
+            missed = (now - c.last) // c.every
+            if missed:
+                replay = min(missed, CATCH_UP_STEPS)
+                for _ in range(replay):
+                    passed.add(c.key)  # _move() files the exits under the chunk it leaves
+                    self._move(c)
+                self.replayed += replay
+                c.last += missed * c.every
+            if self.awake(c.key):
+                self._schedule(c, c.every - (now - c.last))
+            # else the replay took it somewhere nobody is; it sleeps there
+        # exits looked up on the way through chunks that are still asleep
+        # would never be dropped by _sleep(), and could go stale there
+        for ch in passed:
+            if not self.awake(ch):
+                self.exit_memo.pop(ch, None)
+
+    def room_changed(self, x, y, z):
+        """The tile at (x, y, z) was saved: forget the exits remembered for it
+        and its neighbours (whose exits may lead somewhere new now)."""
+        for dx, dy, dz in [(0, 0, 0)] + list(self.dirs.values()):
+            c = (x + dx, y + dy, z + dz)
+            memo = self.exit_memo.get(chunk_of(*c, self.chunk))
+            if memo is not None:
+                memo.pop(c, None)
+
+    def _sleep(self, key):
+        for c in self.chunks.get(key, ()):
+            self._cancel(c)
+        # forget the exits looked up there; the tiles may change meanwhile
+        self.exit_memo.pop(key, None)
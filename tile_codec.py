@@ -0,0 +1,210 @@
+"""Serialization codecs for tiles and saves, with format sniffing on read.
+
+A codec name is a base format plus an optional compressor:
+
+  json           pretty JSON (indent=2), the original hand-editable files
+  json-compact   JSON without whitespace
+  binary         tagged, length-prefixed binary encoding of the same data
+  ...+zlib       any of the above, zlib-compressed   (e.g. "json-compact+zlib")
+  ...+lzma       any of the above, lzma-compressed   (e.g. "binary+lzma")
+
+encode(obj, codec) gives bytes; decode(data) works out the format by itself,
+so files written with different codecs can sit side by side and a world can
+be switched to a new codec without converting it first.
+"""
+import json
+import lzma
+import struct
+import zlib
+
+DEFAULT_CODEC = "json"
+CODECS = [
+    "json", "json-compact", "binary",
+    "json+zlib", "json-compact+zlib", "binary+zlib",
+    "json-compact+lzma", "binary+lzma",
+]
+
+# non-JSON payloads start with "\0CW" and a kind byte
+MAGIC = b"\x00CW"
+KIND_BINARY = b"B"
+KIND_ZLIB = b"Z"
+KIND_LZMA = b"X"
+
+_F64 = struct.Struct("<d")
+_I64 = struct.Struct("<q")
+
+
+# -------------------------
+# BINARY FORMAT
+# -------------------------
+#
+# value = tag byte + body
+#   N null   T true   F false
+#   i int64 (8 bytes)     I big int (varint length + decimal text)
+#   d float64 (8 bytes)   s str (varint length + utf-8)
+#   l list (varint count + values)
+#   m dict (varint count + (varint length + utf-8 key, value) pairs)
+
+def _varint(n, out):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _enc(obj, out):
+    if obj is None:
+        out += b"N"
+    elif obj is True:
+        out += b"T"
+    elif obj is False:
+        out += b"F"
+    elif isinstance(obj, str):
+        b = obj.encode("utf-8")
+        out += b"s"
+        _varint(len(b), out)
+        out += b
+    elif isinstance(obj, int):
+        if -(1 << 63) <= obj < (1 << 63):
+            out += b"i"
+            out += _I64.pack(obj)
+        else:
+            b = str(obj).encode("ascii")
+            out += b"I"
+            _varint(len(b), out)
+            out += b
+    elif isinstance(obj, float):
+        out += b"d"
+        out += _F64.pack(obj)
+    elif isinstance(obj, dict):
+        out += b"m"
+        _varint(len(obj), out)
+        for k, v in obj.items():
+            kb = str(k).encode("utf-8")
+            _varint(len(kb), out)
+            out += kb
+            _enc(v, out)
+    elif isinstance(obj, (list, tuple)):
+        out += b"l"
+        _varint(len(obj), out)
+        for v in obj:
+            _enc(v, out)
+    else:
+        raise TypeError(f"can't encode {type(obj).__name__}")
+
+
+def _read_varint(buf, pos):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _dec(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == 0x73:  # s
+        n, pos = _read_varint(buf, pos)
+        return str(buf[pos:pos + n], "utf-8"), pos + n
+    if tag == 0x6D:  # m
+        count, pos = _read_varint(buf, pos)
+        d = {}
+        for _ in range(count):
+            n, pos = _read_varint(buf, pos)
+            key = str(buf[pos:pos + n], "utf-8")
+            d[key], pos = _dec(buf, pos + n)
+        return d, pos
+    if tag == 0x6C:  # l
+        count, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(count):
+            v, pos = _dec(buf, pos)
+            items.append(v)
+        return items, pos
+    if tag == 0x4E:  # N
+        return None, pos
+    if tag == 0x54:  # T
+        return True, pos
+    if tag == 0x46:  # F
+        return False, pos
+    if tag == 0x69:  # i
+        return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == 0x64:  # d
+        return _F64.unpack_from(buf, pos)[0], pos + 8
+    if tag == 0x49:  # I
+        n, pos = _read_varint(buf, pos)
+        return int(str(buf[pos:pos + n], "ascii")), pos + n
+    raise ValueError(f"bad binary tag {tag!r} at {pos - 1}")
+
+
+def encode_binary(obj):
+    out = bytearray(MAGIC + KIND_BINARY)
+    _enc(obj, out)
+    return bytes(out)
+
+
+def decode_binary(data):
+    obj, pos = _dec(memoryview(data), len(MAGIC) + 1)
+    if pos != len(data):
+        raise ValueError("trailing bytes after binary value")
+    return obj
+
+
+# -------------------------
+# ENCODE / DECODE
+# -------------------------
+
+def encode(obj, codec=DEFAULT_CODEC):
+    base, _, comp = codec.partition("+")
+    if base == "json":
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    elif base == "json-compact":
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    elif base == "binary":
+        data = encode_binary(obj)
+    else:
+        raise ValueError(f"unknown codec {codec!r}")
+    if comp == "zlib":
+        return MAGIC + KIND_ZLIB + zlib.compress(data, 6)
+    if comp == "lzma":
+        return MAGIC + KIND_LZMA + lzma.compress(data, preset=6)
+    if comp:
+        raise ValueError(f"unknown compression {comp!r}")
+    return data
+
+
+def sniff(data):
+    """Name of the outer format of `data`: json, binary, zlib, lzma or raw-zlib."""
+    if data[:3] == MAGIC:
+        return {KIND_BINARY: "binary", KIND_ZLIB: "zlib", KIND_LZMA: "lzma"}.get(data[3:4], "unknown")
+    if len(data) >= 2 and data[0] == 0x78 and (data[0] * 256 + data[1]) % 31 == 0:
+        return "raw-zlib"  # bare zlib stream, as written by older region files
+    return "json"
+
+
+def decode(data):
+    kind = sniff(data)
+    if kind == "json":
+        return json.loads(data.decode("utf-8-sig"))
+    if kind == "binary":
+        return decode_binary(data)
+    if kind == "zlib":
+        return decode(zlib.decompress(data[4:]))
+    if kind == "lzma":
+        return decode(lzma.decompress(data[4:]))
+    if kind == "raw-zlib":
+        return decode(zlib.decompress(data))
+    raise ValueError("unrecognised data format")
+
+
+def is_compressed(codec):
+    return "+" in codec
+
+
+def load_file(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
@@ -0,0 +1,38 @@
+"""Off-screen surfaces for the parts of a widget that don't change.
+
+A panel's frame, a compass ring or a column of checkbox outlines is the same
+picture every frame, yet it was being rebuilt from circles, rounded rects
+and text each time. LayerCache paints such a static layer once into a
+transparent surface and hands back the same surface until something in its
+key changes (size, layout, display size, focus...). Callers blit it and
+draw only the live bits (hover, ticks, caret) on top.
+"""
+from collections import OrderedDict
+
+import pygame
+
+
+class LayerCache:
+    def __init__(self, max_layers=64):
+        self.max_layers = max_layers
+        self.layers = OrderedDict()  # key -> Surface
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, key, size, paint):
+        """The layer for `key`; paint(surface) fills it the first time."""
+        surf = self.layers.get(key)
+        if surf is not None:
+            self.layers.move_to_end(key)
+            self.hits += 1
+            return surf
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        paint(surf)
+        self.builds += 1
+        self.layers[key] = surf
+        if len(self.layers) > self.max_layers:
+            self.layers.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.layers.clear()
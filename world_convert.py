@@ -0,0 +1,62 @@
+"""Convert a world between the folder, packed .cogw and chunked .regions layouts.
+
+    python world_convert.py pack   world_tiles  world.cogw
+    python world_convert.py unpack world.cogw   world_tiles
+    python world_convert.py copy   world_tiles  world.regions
+    python world_convert.py compact world.cogw
+    python world_convert.py copy   world_tiles  world.cogw --codec binary+zlib
+
+The layout of each side is picked from the path (see world_store.open_world),
+so "pack" and "unpack" are really the same copy; they are there for clarity.
+"""
+import os
+import sys
+import time
+import argparse
+
+from world_store import open_world, copy_world, PackedStore, PACKED_EXT, REGION_EXT, REGION_META
+from tile_codec import CODECS, is_compressed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("pack", "unpack", "copy"):
+        p = sub.add_parser(name)
+        p.add_argument("src")
+        p.add_argument("dst")
+        p.add_argument("--no-compress", action="store_true",
+                       help="store packed records / region chunks uncompressed")
+        p.add_argument("--codec", choices=CODECS,
+                       help="tile format for the destination (see tile_codec.py)")
+    p = sub.add_parser("compact")
+    p.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compact":
+        with PackedStore(args.path) as store:
+            store.compact()
+        print(f"Compacted {args.path}")
+        return 0
+
+    extra = {}
+    if args.codec:
+        extra["codec"] = args.codec
+    if args.no_compress:
+        if args.codec and is_compressed(args.codec):
+            ap.error(f"--no-compress and --codec {args.codec} disagree")
+        if args.dst.endswith(PACKED_EXT):
+            extra["compress_min"] = None
+        elif args.dst.endswith(REGION_EXT) or os.path.exists(os.path.join(args.dst, REGION_META)):
+            # region chunks are compressed by their codec, not by size
+            extra.setdefault("codec", "json-compact")
+        # a folder never compresses unless --codec says so: nothing to do
+    t0 = time.perf_counter()
+    with open_world(args.src) as src, open_world(args.dst, **extra) as dst:
+        n = copy_world(src, dst, progress=lambda k: print(f"  {k} tiles...", end="\r"))
+    print(f"Copied {n} tiles from {args.src} to {args.dst} in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
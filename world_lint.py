@@ -0,0 +1,434 @@
+"""Check a world for broken tiles and exits that don't add up.
+
+    python world_lint.py                        # world_tiles/ (or $COG_WORLD)
+    python world_lint.py world.cogw --jobs 4
+    python world_lint.py --fix                  # repair what can be repaired
+    python world_lint.py --fix one-way,missing --start 0 0 0
+
+Tiles are read and checked on a pool of processes, a batch at a time, and
+problems are printed as the batches come back. Each tile on its own:
+
+  unreadable   broken JSON (or whatever the codec can't decode), or not a
+               tile at all
+  coords       "coords" missing, not {"x", "y", "z"}, or not where the tile
+               is stored; tile files named so the games never find them
+  schema       the plan.html layout: "coords" as a list, "exits" as a list
+               of directions, "terrain" / "objects" instead of the
+               description and items the games use
+  exits        not a dict of true/false, or directions the games don't know
+  description  not a string
+  items        not a list of {"name", "desc", "contains": [...]} objects
+
+Then the exits of all the tiles (kept in an exit_graph.ExitGraph, 2 bytes
+a room) are checked against each other:
+
+  one-way      an exit into a room that has no exit back
+  missing      an exit into a room that has no tile
+  island       rooms that can't be reached from the start room
+
+--fix rewrites tiles from this process once the pool is done (workers only
+ever read): the tile checks repair what they can, one-way exits get their
+way back, and with "missing" named explicitly, exits into missing rooms are
+closed (plan.html means to make those rooms the first time someone steps
+there, so by default they stay). Unreadable tiles and islands are only
+reported. A saved exit graph next to the world is rebuilt afterwards.
+"""
+import os
+import sys
+import time
+import argparse
+from array import array
+from multiprocessing import Pool
+
+from world_store import (open_world, FolderStore, RegionStore, chunk_of,
+                         parse_tile_filename, tile_filename)
+from room_model import EXIT_ORDER, EXIT_BIT, EXIT_STEP, exits_to_mask
+from exit_graph import ExitGraph, graph_path_for
+from engine import OPPOSITE, a_or_an
+
+KINDS = ("unreadable", "coords", "schema", "exits", "description", "items",
+         "one-way", "missing", "island")
+FIXABLE = ("coords", "schema", "exits", "description", "items", "one-way", "missing")
+TILE_FIXES = ("coords", "schema", "exits", "description", "items")  # one tile at a time
+DEFAULT_FIX = TILE_FIXES + ("one-way",)
+BATCH = 2000       # tiles per job for the folder and packed layouts
+MAX_DEPTH = 32     # items nested deeper than this are reported
+PLAN_EXITS = ("up", "down")  # in plan.html, not in the games yet
+
+
+# -------------------------
+# ONE TILE
+# -------------------------
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _kind(v):
+    return a_or_an(type(v).__name__)
+
+
+def _check_items(items, where, problems, fixing, depth=0):
+    """Problems in an items list; returns the list as it should be."""
+    out = []
+    for n, item in enumerate(items):
+        at = f"{where}[{n}]"
+        if isinstance(item, str):
+            problems.append(("items", f"{at} is just the text {item!r}"))
+            if fixing:
+                out.append({"name": item, "desc": "", "contains": []})
+            continue
+        if not isinstance(item, dict):
+            problems.append(("items", f"{at} is {_kind(item)}, not an item"))
+            continue  # dropped when fixing: nothing to make an item of
+        item = dict(item) if fixing else item
+        name = item.get("name")
+        if not isinstance(name, str) or not name.strip():
+            problems.append(("items", f"{at} has no name"))
+            if fixing:
+                item["name"] = str(name).strip() if name not in (None, "") else "something"
+        else:
+            at += f" ({name})"
+        if "desc" in item and not isinstance(item["desc"], str):
+            problems.append(("items", f"{at} has a desc that isn't text"))
+            if fixing:
+                item["desc"] = "" if item["desc"] is None else str(item["desc"])
+        kids = item.get("contains", [])
+        if isinstance(kids, dict):
+            kids = [kids]
+            problems.append(("items", f"{at} contains one item, not a list"))
+        elif not isinstance(kids, list):
+            problems.append(("items", f"{at} has contains that isn't a list"))
+            kids = []
+        if depth >= MAX_DEPTH and kids:
+            problems.append(("items", f"{at} is nested over {MAX_DEPTH} deep"))
+        elif kids:
+            kids = _check_items(kids, f"{at}.contains", problems, fixing, depth + 1)
+        if fixing and "contains" in item:
+            item["contains"] = kids
+        out.append(item)
+    return out
+
+
+def check_tile(tile, x, y, z, fix=()):
+    """Problems with one tile stored at (x, y, z).
+
+    Returns (problems, fixed, mask): problems is [(kind, message), ...],
+    fixed the repaired tile if `fix` (kinds to repair) changed anything,
+    else None, and mask the room's exit mask as the games would read it
+    after the repairs.
+    """
+    problems = []
+    if not isinstance(tile, dict):
+        return [("unreadable", f"is {_kind(tile)}, not a tile")], None, 0
+    out = dict(tile)
+    changed = False
+
+    coords = tile.get("coords")
+    if isinstance(coords, list):
+        problems.append(("schema", "coords is a list (plan.html layout)"))
+        if len(coords) == 3:
+            coords = dict(zip("xyz", coords))
+            if "schema" in fix:
+                out["coords"], changed = coords, True
+    if coords is None:
+        problems.append(("coords", "has no coords"))
+    elif not (isinstance(coords, dict) and set(coords) == {"x", "y", "z"}
+              and all(_is_int(v) for v in coords.values())):
+        problems.append(("coords", f"coords {coords!r} aren't whole numbers x, y, z"))
+    elif (coords["x"], coords["y"], coords["z"]) != (x, y, z):
+        problems.append(("coords", f"says it is at ({coords['x']},{coords['y']},{coords['z']})"))
+    else:
+        coords = False  # fine
+    if coords is not False and "coords" in fix:
+        # where it's stored is where the games look, so that wins
+        out["coords"], changed = {"x": x, "y": y, "z": z}, True
+
+    exits = tile.get("exits")
+    if isinstance(exits, list):
+        problems.append(("schema", "exits is a list of directions (plan.html layout)"))
+        if "schema" in fix:
+            listed = set(e for e in exits if isinstance(e, str))
+            exits = {d: d in listed for d in EXIT_ORDER}
+            exits.update({d: True for d in sorted(listed - set(EXIT_ORDER))})
+            out["exits"], changed = exits, True
+    if isinstance(exits, dict):
+        odd = [d for d in exits if d not in EXIT_BIT]
+        if odd:
+            what = "not in the games yet" if set(odd) <= set(PLAN_EXITS) else "unknown"
+            problems.append(("exits", f"exits {', '.join(map(str, odd))}: {what}"))
+        loose = [d for d, v in exits.items() if d in EXIT_BIT and not isinstance(v, bool)]
+        if loose:
+            problems.append(("exits", f"exits {', '.join(loose)} aren't true/false"))
+            if "exits" in fix:
+                out["exits"] = exits = {d: (bool(v) if d in loose else v) for d, v in exits.items()}
+                changed = True
+    elif "exits" in tile and not isinstance(exits, list):
+        problems.append(("exits", f"exits is {_kind(exits)}"))
+        if "exits" in fix:
+            out["exits"], changed = {d: False for d in EXIT_ORDER}, True
+    elif "exits" not in tile:
+        problems.append(("exits", "has no exits"))
+        if "exits" in fix:
+            out["exits"], changed = {d: False for d in EXIT_ORDER}, True
+
+    if "terrain" in tile or "objects" in tile:
+        problems.append(("schema", "has terrain/objects (plan.html layout)"))
+        if "schema" in fix:
+            terrain = out.pop("terrain", None)
+            objects = out.pop("objects", None)
+            if terrain and not out.get("description"):
+                out["description"] = str(terrain)
+            elif terrain:
+                out["terrain"] = terrain  # nowhere to put it; keep it as it was
+            if isinstance(objects, list):
+                out["items"] = list(out.get("items") or []) + [
+                    {"name": o, "desc": "", "contains": []} if isinstance(o, str) else o
+                    for o in objects]
+            elif objects is not None:
+                out["objects"] = objects
+            changed = True
+
+    desc = out.get("description")
+    if "description" in out and not isinstance(desc, str):
+        problems.append(("description", f"description is {_kind(desc)}"))
+        if "description" in fix:
+            out["description"] = "" if desc is None else str(desc)
+            changed = True
+
+    items = out.get("items")
+    if isinstance(items, list):
+        fixing = "items" in fix
+        before = len(problems)
+        items = _check_items(items, "items", problems, fixing)
+        if fixing and len(problems) > before:
+            out["items"], changed = items, True
+    elif items is not None or "items" in out:
+        problems.append(("items", f"items is {_kind(items)}, not a list"))
+        if "items" in fix:
+            out["items"] = [items] if isinstance(items, (dict, str)) else []
+            out["items"] = _check_items(out["items"], "items", [], True)
+            changed = True
+
+    exits = out.get("exits")
+    if isinstance(exits, list):
+        mask = exits_to_mask({d: True for d in exits if isinstance(d, str)})
+    else:
+        mask = exits_to_mask(exits) if isinstance(exits, dict) else 0
+    return problems, out if changed else None, mask
+
+
+# -------------------------
+# THE POOL
+# -------------------------
+
+_store = None  # each worker's own handle on the world, read-only
+
+
+def _open_worker(path, codec):
+    global _store
+    _store = open_world(path, codec, readonly=True)
+
+
+def _lint_job(job):
+    # job: ("tiles", [(x, y, z), ...]) or ("chunk", key) for the region layout
+    kind, what, fix = job
+    rooms = array("i")  # x, y, z, mask for every tile that was there
+    problems, fixed = [], []
+    if kind == "chunk":
+        try:
+            coords = list(_store.load_chunk(what))
+        except Exception as e:  # whatever the codec chokes on
+            name = _store.chunk_filename(*what)
+            return rooms, [(None, name, "unreadable", f"whole chunk: {e}")], fixed, []
+        tiles = _store.chunks.pop(what)  # not going to be needed again
+        read = tiles.get
+    else:
+        coords = what
+        read = _store.get
+    unreadable = []
+    for x, y, z in coords:
+        try:
+            tile = read((x, y, z)) if kind == "chunk" else read(x, y, z)
+        except Exception as e:
+            tile, error = None, e
+        else:
+            error = None
+            if tile is None:
+                continue  # deleted since the listing
+        if error is not None:
+            found, out, mask = [("unreadable", str(error) or type(error).__name__)], None, 0
+        else:
+            found, out, mask = check_tile(tile, x, y, z, fix)
+        if found and found[0][0] == "unreadable":
+            unreadable.append((x, y, z))
+        rooms.extend((x, y, z, mask))
+        for k, msg in found:
+            problems.append(((x, y, z), _store.location(x, y, z), k, msg))
+        if out is not None:
+            fixed.append(((x, y, z), out))
+    return rooms, problems, fixed, unreadable
+
+
+def _jobs(store, fix, strays):
+    fix = tuple(fix)
+    if isinstance(store, RegionStore):
+        for key in sorted(store.known):
+            yield ("chunk", key, fix)
+        return
+    if isinstance(store, FolderStore):
+        coords = []
+        for name in os.listdir(store.path) if os.path.isdir(store.path) else ():
+            c = parse_tile_filename(name)
+            if c is None:
+                if name.endswith(".json"):
+                    strays.append((name, None))
+            elif tile_filename(*c) != name:
+                strays.append((name, c))  # "0-1-0.json": the games read 00-01-00.json
+            else:
+                coords.append(c)
+    else:
+        coords = list(store.coords())
+    coords.sort(key=lambda c: chunk_of(*c))
+    for i in range(0, len(coords), BATCH):
+        yield ("tiles", coords[i:i + BATCH], fix)
+
+
+# -------------------------
+# THE WHOLE WORLD
+# -------------------------
+
+class Report:
+    def __init__(self, limit=None, quiet=False, out=sys.stdout):
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.limit = limit
+        self.quiet = quiet
+        self.out = out
+
+    def add(self, where, kind, msg):
+        self.counts[kind] += 1
+        if self.quiet or (self.limit is not None and self.counts[kind] > self.limit):
+            return
+        print(f"{where}: {kind}: {msg}", file=self.out)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def lint(path=None, jobs=None, fix=(), start=(0, 0, 0), report=None, progress=None):
+    """Check the world at `path`; returns (report, tiles checked, tiles fixed)."""
+    report = report or Report()
+    fix = set(fix)
+    store = open_world(path)
+    try:
+        store.flush()  # a packed index on disk, so workers don't rescan (and truncate) the file
+        strays = []
+        graph = ExitGraph()
+        unreadable = set()
+        pending = {}  # (x, y, z) -> tile to write back
+        checked = 0
+        with Pool(jobs, initializer=_open_worker, initargs=(store.path, None)) as pool:
+            for rooms, problems, fixed, bad in pool.imap_unordered(_lint_job, _jobs(store, fix, strays)):
+                for i in range(0, len(rooms), 4):
+                    graph.set_room(rooms[i], rooms[i + 1], rooms[i + 2], rooms[i + 3])
+                checked += len(rooms) // 4
+                for _coords, where, kind, msg in problems:
+                    report.add(where, kind, msg)
+                pending.update(fixed)
+                unreadable.update(bad)
+                if progress:
+                    progress(checked)
+
+        for name, c in strays:
+            where = os.path.join(store.path, name)
+            if c is None:
+                report.add(where, "coords", "file name doesn't say where the tile is")
+            elif os.path.exists(store.filename(*c)):
+                report.add(where, "coords", f"shadowed by {tile_filename(*c)}, which the games read")
+            else:
+                report.add(where, "coords", f"the games look for {tile_filename(*c)}")
+                if "coords" in fix:
+                    os.replace(where, store.filename(*c))
+
+        def exits_at(c):
+            # the exits dict to repair, in a tile that will be written back
+            tile = pending.get(c) or store.get(*c)
+            if not isinstance(tile.get("exits"), dict):
+                return None
+            pending[c] = tile
+            return tile["exits"]
+
+        for (x, y, z), d, back in list(graph.unmatched()):
+            dx, dy, dz = EXIT_STEP[d]
+            there = (x + dx, y + dy, z + dz)
+            if back is None:
+                report.add(store.location(x, y, z), "missing",
+                           f"exit {d} leads to ({there[0]},{there[1]},{there[2]}), which has no tile")
+                if "missing" in fix and (x, y, z) not in unreadable:
+                    exits = exits_at((x, y, z))
+                    if exits is not None:
+                        exits[d] = False
+                        graph.set_room(x, y, z, graph.mask(x, y, z) & ~EXIT_BIT[d])
+            elif there not in unreadable:
+                report.add(store.location(x, y, z), "one-way",
+                           f"exit {d} leads to ({there[0]},{there[1]},{there[2]}), "
+                           f"which has no exit {OPPOSITE[d]} back")
+                if "one-way" in fix:
+                    exits = exits_at(there)
+                    if exits is not None:
+                        exits[OPPOSITE[d]] = True
+                        graph.set_room(*there, graph.mask(*there) | EXIT_BIT[OPPOSITE[d]])
+
+        islands = graph.islands(tuple(start))
+        if islands is None:
+            print(f"No room at ({start[0]},{start[1]},{start[2]}) to check islands from.",
+                  file=report.out)
+        for size, c in islands or ():
+            rooms = "1 room" if size == 1 else f"{size} rooms"
+            report.add(store.location(*c), "island",
+                       f"{rooms} here can't be reached from ({start[0]},{start[1]},{start[2]})")
+
+        for (x, y, z), tile in pending.items():
+            store.put(x, y, z, tile)
+        store.flush()
+        graph_file = graph_path_for(store)
+        if pending and os.path.exists(graph_file):
+            graph.build()
+            graph.save(graph_file, store=store)
+        return report, checked, len(pending)
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("world", nargs="?", help="world folder or file (default: $COG_WORLD or world_tiles/)")
+    ap.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    ap.add_argument("--fix", nargs="?", const=",".join(DEFAULT_FIX), default="",
+                    help=f"repair these kinds (default: {','.join(DEFAULT_FIX)})")
+    ap.add_argument("--start", type=int, nargs=3, default=[0, 0, 0], metavar="N",
+                    help="room islands are measured from (default: 0 0 0)")
+    ap.add_argument("--limit", type=int, help="print at most this many problems of each kind")
+    ap.add_argument("--quiet", action="store_true", help="only print the totals")
+    args = ap.parse_args(argv)
+
+    fix = [k for k in args.fix.split(",") if k]
+    wrong = [k for k in fix if k not in FIXABLE]
+    if wrong:
+        ap.error(f"can't fix {', '.join(wrong)} (can fix: {', '.join(FIXABLE)})")
+    t0 = time.perf_counter()
+    report, checked, fixed = lint(args.world, args.jobs, fix, args.start,
+                                  Report(args.limit, args.quiet),
+                                  progress=args.quiet and (lambda n: print(f"  {n} tiles...", end="\r")))
+    took = time.perf_counter() - t0
+    found = ", ".join(f"{n} {k}" for k, n in report.counts.items() if n) or "no problems"
+    print(f"{checked} tiles in {took:.1f}s ({checked / max(took, 1e-9):,.0f}/s, "
+          f"{args.jobs or os.cpu_count()} processes): {found}")
+    if fix:
+        print(f"Fixed {fixed} tiles.")
+    return 1 if report.total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
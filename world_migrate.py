@@ -0,0 +1,323 @@
+"""Upgrade every tile in a world to the current layout (room_model.SCHEMA_VERSION).
+
+    python world_migrate.py                     # world_tiles/ (or $COG_WORLD)
+    python world_migrate.py world.cogw --jobs 4
+    python world_migrate.py --dry-run           # count what would change
+    python world_migrate.py --restart           # ignore a checkpoint, start over
+
+Tiles say which layout they use in "schema_version"; one without it is a
+version 1 tile. Each upgrade is a function from one version to the next,
+registered with @migration(n). A tile goes through every step from its
+own version up to the current one, and a tile already there is left
+alone, so running this twice changes nothing. To change the layout (new
+item fields, up/down exits): bump SCHEMA_VERSION, add the step here, run
+this; the loaders can then count on the new layout.
+
+  1 -> 2   the layout the games write, with nothing left to default:
+           coords where the tile is stored, all eight exits as true/false,
+           a description, last_move, and items that each have name, desc
+           and contains. plan.html-style tiles are converted on the way
+           (these are world_lint.check_tile's repairs).
+
+The work is split by chunk (world_store.chunk_of) and streamed through a
+pool of processes. In a folder world the workers rewrite the tile files
+themselves, each through a temp file and a rename. Packed and region worlds
+are written from this process: packed tiles come back from the workers
+already encoded, and go on the end of the file as new records (it is
+compacted afterwards); region chunks are replaced whole. Every few seconds
+the chunks finished so far are noted in world_tiles.migrate next to the
+world, so an interrupted run picks up where it stopped; --restart ignores
+it.
+
+A folder world can be upgraded while the game or server runs: a tile
+saved in the meantime is left as the game wrote it. Packed and region
+worlds have a single writer, so close the games first.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+
+from world_store import open_world, FolderStore, PackedStore, RegionStore, chunk_of
+from room_model import SCHEMA_VERSION, EXIT_ORDER, exits_to_mask
+from tile_codec import encode
+from saver import write_atomic
+from world_lint import check_tile, TILE_FIXES
+from exit_graph import build_graph, graph_path_for
+
+BATCH = 2000               # tiles per job for the folder and packed layouts
+CHECKPOINT_SECONDS = 5.0   # how often finished chunks are noted down
+COUNTS = ("tiles", "upgraded", "current", "skipped", "failed")
+
+MIGRATIONS = {}  # version -> function taking a tile from it to the next version
+
+
+def migration(version):
+    """Register fn(tile, x, y, z) -> tile as the upgrade from `version` to the next."""
+    def register(fn):
+        MIGRATIONS[version] = fn
+        return fn
+    return register
+
+
+def tile_version(tile):
+    v = tile.get("schema_version", 1)
+    return v if isinstance(v, int) and not isinstance(v, bool) and v >= 1 else 1
+
+
+def upgrade(tile, x, y, z, target=SCHEMA_VERSION):
+    """(the tile at version `target`, the version it was at); ValueError if it can't be."""
+    if not isinstance(tile, dict):
+        raise ValueError(f"not a tile: {type(tile).__name__}")
+    was = v = tile_version(tile)
+    if v > target:
+        raise ValueError(f"written by version {v}; this only knows up to {target}")
+    while v < target:
+        step = MIGRATIONS.get(v)
+        if step is None:
+            raise ValueError(f"no way up from version {v}")
+        tile = step(tile, x, y, z)
+        v += 1
+        tile["schema_version"] = v
+    return tile, was
+
+
+def _full_item(item):
+    item = dict(item)
+    item.setdefault("desc", "")
+    kids = item.get("contains")
+    item["contains"] = [_full_item(k) for k in kids if isinstance(k, dict)] if isinstance(kids, list) else []
+    return item
+
+
+@migration(1)
+def _games_layout(tile, x, y, z):
+    _, fixed, _ = check_tile(tile, x, y, z, TILE_FIXES)
+    tile = fixed or dict(tile)
+    exits = tile.get("exits") if isinstance(tile.get("exits"), dict) else {}
+    full = {d: bool(exits.get(d, False)) for d in EXIT_ORDER}
+    full.update((d, v) for d, v in exits.items() if d not in full)  # up/down wait for their own step
+    tile["exits"] = full
+    tile.setdefault("last_move", None)
+    tile.setdefault("description", "")
+    tile["items"] = [_full_item(i) for i in tile.get("items") or []]
+    return tile
+
+
+def _mask(tile):
+    exits = tile.get("exits")
+    if isinstance(exits, list):
+        return exits_to_mask({d: True for d in exits if isinstance(d, str)})
+    return exits_to_mask(exits) if isinstance(exits, dict) else 0
+
+
+def checkpoint_path_for(store):
+    return os.path.abspath(store.path).rstrip("/\\") + ".migrate"
+
+
+# -------------------------
+# THE POOL
+# -------------------------
+
+_store = None  # each worker's own handle on the world
+_target = SCHEMA_VERSION
+_dry_run = False
+
+
+def _open_worker(path, target, dry_run):
+    global _store, _target, _dry_run
+    _store = open_world(path, readonly=True)
+    _target = target
+    _dry_run = dry_run
+
+
+def _migrate_job(job):
+    # job: ("tiles", [(chunk key, [coords, ...]), ...]) or ("chunks", [chunk key, ...])
+    kind, units = job
+    counts = dict.fromkeys(COUNTS, 0)
+    out, failed, keys = [], [], []
+    exits_changed = False
+    folder = isinstance(_store, FolderStore)
+    packed = isinstance(_store, PackedStore)
+    for unit in units:
+        if kind == "chunks":
+            key = unit
+            try:
+                tiles = list(_store.load_chunk(key).items())
+            except Exception as e:  # whatever the codec chokes on
+                counts["failed"] += 1
+                failed.append((_store.chunk_filename(*key), f"whole chunk: {e}"))
+                keys.append(key)
+                continue
+            _store.chunks.pop(key, None)  # not going to be needed again
+        else:
+            key, coords = unit
+            tiles = [(c, None) for c in coords]
+        for c, tile in tiles:
+            stamp = None
+            if tile is None:
+                stamp = _store.stamp(*c)
+                if stamp is None:
+                    continue  # deleted since the listing
+            counts["tiles"] += 1
+            try:
+                if tile is None:
+                    tile = _store.get(*c)
+                new, was = upgrade(tile, *c, _target)
+            except Exception as e:
+                counts["failed"] += 1
+                failed.append((_store.location(*c), str(e) or type(e).__name__))
+                continue
+            if was == _target:
+                counts["current"] += 1
+                continue
+            if _dry_run:
+                counts["upgraded"] += 1
+                exits_changed = exits_changed or _mask(tile) != _mask(new)
+                continue
+            if folder:
+                if _store.stamp(*c) != stamp:
+                    counts["skipped"] += 1  # saved by the game meanwhile; that one stands
+                    continue
+                write_atomic(_store.filename(*c), encode(new, _store.codec), fsync=False)
+            elif packed:
+                out.append((c, _store.encode_tile(new)))  # encoded here, in parallel
+            else:
+                out.append((c, new))
+            counts["upgraded"] += 1
+            exits_changed = exits_changed or _mask(tile) != _mask(new)
+        keys.append(key)
+    return keys, counts, out, failed, exits_changed
+
+
+def _jobs(store, done):
+    """(jobs, how many chunks there are in all)."""
+    if isinstance(store, RegionStore):
+        keys = sorted(store.known)
+        todo = [k for k in keys if k not in done]
+        return [("chunks", todo[i:i + 4]) for i in range(0, len(todo), 4)], len(keys)
+    chunks = {}
+    for c in store.coords():
+        chunks.setdefault(chunk_of(*c), []).append(c)
+    jobs, batch, size = [], [], 0
+    for key in sorted(chunks):
+        if key in done:
+            continue
+        batch.append((key, chunks[key]))
+        size += len(chunks[key])
+        if size >= BATCH:
+            jobs.append(("tiles", batch))
+            batch, size = [], 0
+    if batch:
+        jobs.append(("tiles", batch))
+    return jobs, len(chunks)
+
+
+# -------------------------
+# THE WHOLE WORLD
+# -------------------------
+
+def migrate(path=None, target=SCHEMA_VERSION, jobs=None, restart=False, dry_run=False,
+            log=print, every=CHECKPOINT_SECONDS):
+    """Bring every tile of the world at `path` to version `target`; returns the counts."""
+    if not 1 <= target <= SCHEMA_VERSION:
+        raise ValueError(f"versions go from 1 to {SCHEMA_VERSION}, not {target}")
+    store = open_world(path)
+    try:
+        store.flush()  # a packed index on disk, so workers don't rescan (and truncate) the file
+        ck_path = checkpoint_path_for(store)
+        counts = dict.fromkeys(COUNTS, 0)
+        done = set()
+        if os.path.exists(ck_path) and not restart and not dry_run:
+            with open(ck_path, "r", encoding="utf-8") as f:
+                ck = json.load(f)
+            if ck.get("to") == target:
+                done = {tuple(k) for k in ck["done"]}
+                counts.update(ck.get("counts", {}))
+                log(f"Resuming: {len(done)} chunks, {counts['tiles']} tiles done before.")
+            else:
+                log(f"Checkpoint was for version {ck.get('to')}; starting over.")
+        work, total = _jobs(store, done)
+        exits_changed = False
+        t0 = last = time.perf_counter()
+        tiles_before = counts["tiles"]
+
+        def save_checkpoint():
+            store.flush()
+            if isinstance(store, FolderStore) and hasattr(os, "sync"):
+                os.sync()  # the workers' tile writes, before the checkpoint says they're done
+            write_atomic(ck_path, json.dumps({"to": target, "done": sorted(done), "counts": counts}))
+
+        try:
+            with Pool(jobs, initializer=_open_worker, initargs=(store.path, target, dry_run)) as pool:
+                for keys, c, out, failed, changed in pool.imap_unordered(_migrate_job, work):
+                    for (x, y, z), tile in out:
+                        if isinstance(store, PackedStore):
+                            store.put_encoded(x, y, z, tile, append=True)
+                        else:
+                            store.put(x, y, z, tile)
+                    for where, msg in failed:
+                        log(f"{where}: {msg}")
+                    for k, n in c.items():
+                        counts[k] += n
+                    done.update(keys)
+                    exits_changed = exits_changed or changed
+                    now = time.perf_counter()
+                    if now - last >= every:
+                        last = now
+                        if not dry_run:
+                            save_checkpoint()
+                        rate = (counts["tiles"] - tiles_before) / (now - t0)
+                        log(f"  {counts['tiles']} tiles, {counts['upgraded']} upgraded, "
+                            f"{100 * len(done) / max(1, total):.0f}% of chunks, {rate:,.0f} tiles/s")
+        except BaseException:
+            if not dry_run:
+                save_checkpoint()  # whatever finished stays finished
+            raise
+        took = time.perf_counter() - t0
+
+        if not dry_run:
+            store.flush()
+            if isinstance(store, PackedStore) and counts["upgraded"]:
+                t1 = time.perf_counter()
+                store.compact()  # drop the records the upgrades replaced
+                log(f"Compacted {store.path} in {time.perf_counter() - t1:.1f}s.")
+            if os.path.exists(ck_path):
+                os.remove(ck_path)
+            graph_file = graph_path_for(store)
+            if exits_changed and os.path.exists(graph_file):
+                build_graph(store).save(graph_file, store=store)
+                log(f"Rebuilt {graph_file}.")
+        counts["seconds"] = took
+        counts["rate"] = (counts["tiles"] - tiles_before) / max(took, 1e-9)
+        return counts
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("world", nargs="?", help="world folder or file (default: $COG_WORLD or world_tiles/)")
+    ap.add_argument("--to", type=int, default=SCHEMA_VERSION, metavar="VERSION",
+                    help=f"version to bring tiles up to (default: {SCHEMA_VERSION})")
+    ap.add_argument("--jobs", type=int, help="worker processes (default: one per CPU)")
+    ap.add_argument("--restart", action="store_true", help="ignore a checkpoint from an earlier run")
+    ap.add_argument("--dry-run", action="store_true", help="count what would change, write nothing")
+    args = ap.parse_args(argv)
+
+    try:
+        c = migrate(args.world, args.to, args.jobs, args.restart, args.dry_run)
+    except KeyboardInterrupt:
+        print("Stopped; run again to carry on from the checkpoint.")
+        return 130
+    verb = "would be upgraded" if args.dry_run else "upgraded"
+    print(f"{c['tiles']} tiles in {c['seconds']:.1f}s ({c['rate']:,.0f}/s, "
+          f"{args.jobs or os.cpu_count()} processes): {c['upgraded']} {verb} to version {args.to}, "
+          f"{c['current']} already were, {c['skipped']} saved meanwhile, {c['failed']} failed")
+    return 1 if c["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,678 @@
+"""World tile storage shared by game.py (map builder) and game-main.py.
+
+Three layouts are supported behind the same small interface:
+
+  FolderStore  - the original world_tiles/ folder, one pretty JSON file per tile
+  PackedStore  - one binary .cogw file holding every tile plus a coordinate index
+  RegionStore  - a .regions folder of chunk files, each holding a 16x16x4 block
+
+All of them give you get/put/exists/coords keyed by (x, y, z), plus the
+rooms_in_box / rooms_within spatial queries. Use open_world() to pick one
+from a path, and world_convert.py to move a world between layouts.
+
+How each tile is serialized is a separate choice (see tile_codec.py): every
+store takes a `codec`, and reads sniff the format, so a world written with
+one codec keeps loading after you switch to another.
+"""
+import os
+import re
+import json
+import struct
+import zlib
+import threading
+from collections import OrderedDict
+
+from tile_codec import encode, decode, is_compressed
+
+DEFAULT_WORLD = "world_tiles"
+PACKED_EXT = ".cogw"
+
+TILE_NAME_RE = re.compile(r"^(-?\d+)-(-?\d+)-(-?\d+)\.json$")
+
+
+def pad(n: int) -> str:
+    return f"-{abs(n):02d}" if n < 0 else f"{n:02d}"
+
+
+def tile_filename(x, y, z):
+    return f"{pad(x)}-{pad(y)}-{pad(z)}.json"
+
+
+def parse_tile_filename(name):
+    m = TILE_NAME_RE.match(name)
+    if not m:
+        return None
+    return tuple(int(g) for g in m.groups())
+
+
+def new_token():
+    # for fingerprint(): random, so two histories never end up with the same one
+    return int.from_bytes(os.urandom(4), "little") or 1
+
+
+def clone_json(obj):
+    # a lot quicker than copy.deepcopy for plain dict/list/str/number trees
+    if isinstance(obj, dict):
+        return {k: clone_json(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [clone_json(v) for v in obj]
+    return obj
+
+
+class TileStore:
+    """Base interface. Tiles are plain dicts in the usual JSON schema."""
+
+    def get(self, x, y, z):
+        raise NotImplementedError
+
+    def put(self, x, y, z, data):
+        raise NotImplementedError
+
+    def exists(self, x, y, z):
+        raise NotImplementedError
+
+    def coords(self):
+        raise NotImplementedError
+
+    def stamp(self, x, y, z):
+        """A value that changes whenever the tile does, or None if it's missing.
+
+        Caches compare stamps to tell whether their copy is still current.
+        """
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """A string that changes whenever any tile does, even from another
+        process or by hand; None if the store can't tell.
+
+        Things worked out from the whole world (exit_graph.py) keep it, to
+        know on the next run whether they still hold.
+        """
+        return None
+
+    def location(self, x, y, z):
+        # human readable "where did this go" for status messages
+        return f"{self.path} ({x},{y},{z})"
+
+    # --- spatial queries (bounds are inclusive) ---
+
+    def coords_in_box(self, x0, x1, y0, y1, z0, z1):
+        volume = (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1)
+        if volume <= 0:
+            return []
+        if volume <= 4096:
+            return [(x, y, z)
+                    for z in range(z0, z1 + 1)
+                    for y in range(y0, y1 + 1)
+                    for x in range(x0, x1 + 1)
+                    if self.exists(x, y, z)]
+        # a big box over a small world: cheaper to filter what exists
+        return sorted((x, y, z) for x, y, z in self.coords()
+                      if x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1)
+
+    def rooms_in_box(self, x0, x1, y0, y1, z0, z1):
+        """Yield ((x, y, z), tile) for every tile inside the box."""
+        for c in self.coords_in_box(x0, x1, y0, y1, z0, z1):
+            tile = self.get(*c)
+            if tile is not None:
+                yield c, tile
+
+    def rooms_within(self, x, y, z, radius, z_radius=None):
+        """Tiles at most `radius` steps away (diagonals count as one step).
+
+        z_radius defaults to radius; pass 0 to stay on the same level.
+        """
+        zr = radius if z_radius is None else z_radius
+        return self.rooms_in_box(x - radius, x + radius,
+                                 y - radius, y + radius,
+                                 z - zr, z + zr)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __len__(self):
+        return sum(1 for _ in self.coords())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# LEGACY FOLDER LAYOUT
+# -------------------------
+
+class FolderStore(TileStore):
+    def __init__(self, path=DEFAULT_WORLD, codec="json"):
+        # files keep the .json name whatever the codec, so coords() still finds them
+        self.path = path
+        self.codec = codec
+
+    def filename(self, x, y, z):
+        return os.path.join(self.path, tile_filename(x, y, z))
+
+    def location(self, x, y, z):
+        return self.filename(x, y, z)
+
+    def exists(self, x, y, z):
+        return os.path.exists(self.filename(x, y, z))
+
+    def stamp(self, x, y, z):
+        try:
+            st = os.stat(self.filename(x, y, z))
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, x, y, z):
+        path = self.filename(x, y, z)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return decode(f.read())
+
+    def put(self, x, y, z, data):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.filename(x, y, z), "wb") as f:
+            f.write(encode(data, self.codec))
+
+    def coords(self):
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            c = parse_tile_filename(name)
+            if c is not None:
+                yield c
+
+    def fingerprint(self):
+        # a stat per tile: much cheaper than reading them, and it sees hand edits
+        count = newest = size = 0
+        if os.path.isdir(self.path):
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if TILE_NAME_RE.match(entry.name):
+                        st = entry.stat()
+                        count += 1
+                        newest = max(newest, st.st_mtime_ns)
+                        size += st.st_size
+        return f"{count}:{newest}:{size}"
+
+
+# -------------------------
+# PACKED SINGLE-FILE LAYOUT
+# -------------------------
+#
+# file   = header, record*, [index]
+# header = magic "COGWORLD", version, token, index_offset, index_count
+# record = magic "TILE", x, y, z, flags, length, capacity, payload[capacity]
+# index  = (x, y, z, offset, flags, length, capacity) * index_count
+#
+# Records get some slack (capacity >= length) so small edits overwrite in
+# place. A record that outgrows its slot is marked dead and re-appended.
+# The index is written behind the last record on flush(); the header's
+# index_offset is zeroed as soon as a put makes it stale, so a file that
+# was not closed cleanly is rebuilt by scanning the records instead.
+#
+# token is the store's fingerprint(): a random number, replaced by the
+# first put after it was written out or handed out. It is zeroed along
+# with index_offset, so a file that wasn't closed cleanly has none and
+# nothing worked out from it earlier is trusted. (Files from before the
+# token have 0 there too; it was an unused flags field.)
+
+HEADER = struct.Struct("<8sIIQQ")
+RECORD = struct.Struct("<4siiiBII")
+INDEX_ENTRY = struct.Struct("<iiiQBII")
+MAGIC = b"COGWORLD"
+RECORD_MAGIC = b"TILE"
+VERSION = 1
+
+FLAG_ZLIB = 1
+FLAG_DEAD = 2
+_FLAGS_AT = 16  # offset of the flags byte inside RECORD
+
+
+def _capacity_for(n):
+    return max(64, (n + n // 4 + 63) & ~63)
+
+
+class PackedStore(TileStore):
+    def __init__(self, path, compress_min=256, codec="json-compact", readonly=False):
+        # compress_min: zlib payloads at least this big, None to never compress
+        # (only for codecs that don't compress by themselves)
+        # readonly: never write, not even the index on close (for a second
+        # process reading a file that someone else is writing)
+        self.path = path
+        self.readonly = readonly
+        self.compress_min = compress_min
+        self.codec = codec
+        self.index = {}  # (x, y, z) -> (offset, flags, length, capacity)
+        self.versions = {}  # (x, y, z) -> puts since open, for stamp()
+        self.lock = threading.RLock()  # one file handle, shared by threads
+        self.token = 0
+        self.token_seen = False  # handed out by fingerprint() since it was made
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if readonly and not exists:
+            raise FileNotFoundError(path)
+        self.f = open(path, "rb" if readonly else "r+b" if exists else "w+b")
+        if exists:
+            self._open_existing()
+        else:
+            self.data_end = HEADER.size
+            self.index_on_disk = False
+            self.token = new_token()
+            self._write_header(0, 0)
+
+    # --- file layout ---
+
+    def _write_header(self, index_offset, index_count, token=0):
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, token, index_offset, index_count))
+
+    def _open_existing(self):
+        raw = self.f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise ValueError(f"{self.path}: truncated header")
+        magic, version, token, index_offset, index_count = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not a packed world file")
+        if version != VERSION:
+            raise ValueError(f"{self.path}: unsupported version {version}")
+        if index_offset:
+            self.f.seek(index_offset)
+            blob = self.f.read(index_count * INDEX_ENTRY.size)
+            for x, y, z, off, flags, length, cap in INDEX_ENTRY.iter_unpack(blob):
+                self.index[(x, y, z)] = (off, flags, length, cap)
+            self.data_end = index_offset
+            self.index_on_disk = True
+            self.token = token
+            if not token and not self.readonly:
+                self.token = new_token()  # a file from before tokens
+                self._write_header(index_offset, index_count, self.token)
+        else:
+            self._scan_records()
+            if not self.readonly:
+                self.token = new_token()  # written with the index, on flush()
+
+    def _scan_records(self):
+        pos = HEADER.size
+        self.f.seek(0, os.SEEK_END)
+        size = self.f.tell()
+        while pos + RECORD.size <= size:
+            self.f.seek(pos)
+            magic, x, y, z, flags, length, cap = RECORD.unpack(self.f.read(RECORD.size))
+            if magic != RECORD_MAGIC or pos + RECORD.size + cap > size:
+                break  # torn tail from an interrupted append
+            if not flags & FLAG_DEAD:
+                self.index[(x, y, z)] = (pos, flags, length, cap)
+            pos += RECORD.size + cap
+        self.data_end = pos
+        if not self.readonly:
+            self.f.truncate(pos)
+        self.index_on_disk = self.readonly  # nothing to write back
+
+    def _encode(self, data):
+        payload = encode(data, self.codec)
+        flags = 0
+        if (self.compress_min is not None and len(payload) >= self.compress_min
+                and not is_compressed(self.codec)):
+            packed = zlib.compress(payload, 6)
+            if len(packed) < len(payload):
+                payload, flags = packed, FLAG_ZLIB
+        return payload, flags
+
+    # --- TileStore ---
+
+    def location(self, x, y, z):
+        return f"{self.path} ({x},{y},{z})"
+
+    def exists(self, x, y, z):
+        return (x, y, z) in self.index
+
+    def stamp(self, x, y, z):
+        entry = self.index.get((x, y, z))
+        if entry is None:
+            return None
+        return (entry, self.versions.get((x, y, z), 0))
+
+    def coords(self):
+        return iter(list(self.index))
+
+    def fingerprint(self):
+        with self.lock:
+            if not self.token:
+                return None  # read-only, and not closed cleanly (or older than tokens)
+            self.token_seen = True
+            return f"{self.token:08x}"
+
+    def __len__(self):
+        return len(self.index)
+
+    def read_payload(self, x, y, z):
+        entry = self.index.get((x, y, z))
+        if entry is None:
+            return None
+        off, flags, length, _cap = entry
+        with self.lock:
+            self.f.seek(off + RECORD.size)
+            payload = self.f.read(length)
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return payload
+
+    def get(self, x, y, z):
+        payload = self.read_payload(x, y, z)
+        if payload is None:
+            return None
+        return decode(payload)
+
+    def put(self, x, y, z, data, append=False):
+        # append=True never overwrites the old record in place: the new one goes
+        # on the end first, so a crash part way leaves the old or the new tile
+        self.put_encoded(x, y, z, self._encode(data), append)
+
+    def encode_tile(self, data):
+        """What put() would write, for put_encoded(); lets other processes do the encoding."""
+        return self._encode(data)
+
+    def put_encoded(self, x, y, z, encoded, append=False):
+        if self.readonly:
+            raise OSError(f"{self.path} is open read-only")
+        payload, flags = encoded
+        with self.lock:
+            self._put_payload(x, y, z, payload, flags, append)
+
+    def _put_payload(self, x, y, z, payload, flags, append=False):
+        key = (x, y, z)
+        old = self.index.get(key)
+        if self.index_on_disk or self.token_seen:
+            # someone may remember the old token; this tile makes it wrong
+            self.token = new_token()
+            self.token_seen = False
+        if self.index_on_disk:
+            # the saved index is about to be stale (and maybe overwritten)
+            self._write_header(0, 0)
+            self.index_on_disk = False
+        in_place = old is not None and len(payload) <= old[3] and not append
+        if in_place:
+            off, cap = old[0], old[3]
+        else:
+            off, cap = self.data_end, _capacity_for(len(payload))
+            self.data_end = off + RECORD.size + cap
+        self.f.seek(off)
+        self.f.write(RECORD.pack(RECORD_MAGIC, x, y, z, flags, len(payload), cap))
+        self.f.write(payload)
+        if off + RECORD.size + cap == self.data_end:
+            # keep the slack zeroed so a scan sees a full record
+            self.f.write(b"\0" * (cap - len(payload)))
+        if old is not None and not in_place:
+            # only now the old one goes; a scan keeps the later of two live records
+            self.f.seek(old[0] + _FLAGS_AT)
+            self.f.write(bytes([old[1] | FLAG_DEAD]))
+        self.index[key] = (off, flags, len(payload), cap)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.f.closed:
+            return
+        if not self.index_on_disk:
+            self.f.seek(self.data_end)
+            entries = [INDEX_ENTRY.pack(x, y, z, *entry)
+                       for (x, y, z), entry in self.index.items()]
+            self.f.write(b"".join(entries))
+            self.f.truncate()
+            self._write_header(self.data_end, len(entries), self.token)
+            self.index_on_disk = True
+        self.f.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self._flush()
+                self.f.close()
+
+    def compact(self):
+        """Rewrite the file with only live records (drops dead slots)."""
+        tmp = self.path + ".tmp"
+        # the lock is held throughout: a put() that went into the old file
+        # after its record was copied would be lost at the rename
+        with self.lock:
+            if os.path.exists(tmp):
+                os.remove(tmp)  # left by a compaction that crashed; don't append to it
+            with PackedStore(tmp, self.compress_min, self.codec) as out:
+                # payloads are copied as they are: no decoding, so a broken tile survives too
+                for (x, y, z), (off, flags, length, _cap) in list(self.index.items()):
+                    self.f.seek(off + RECORD.size)
+                    out._put_payload(x, y, z, self.f.read(length), flags & FLAG_ZLIB)
+                out.token = self.token  # the same tiles: what was worked out from them still holds
+            self.f.close()
+            os.replace(tmp, self.path)
+            self.index = {}
+            self.f = open(self.path, "r+b")
+            self._open_existing()
+
+
+# -------------------------
+# CHUNKED REGION LAYOUT
+# -------------------------
+#
+# world.regions/
+#   regions.json          {"version": 1, "chunk": [16, 16, 4], "token": 12345}
+#   r.0.0.0.cogr          {"x,y,z": tile, ...} for one chunk (json-compact+zlib by default)
+#
+# The default codec's chunks are bare zlib streams with no tile_codec
+# header, exactly as chunks were written before codecs existed, so older
+# code can still read them; decode() recognises them by their zlib header.
+#
+# A chunk is read (and cached) whole, so neighbouring rooms and box queries
+# cost one read per chunk instead of one per tile. Writes are buffered per
+# chunk and go out atomically on flush() or when the chunk is evicted.
+#
+# "token" is the store's fingerprint(), as in a packed file. A new one is
+# written to regions.json before the first chunk write after the old one
+# was seen, so a crash between the two can only make it look changed.
+
+REGION_EXT = ".regions"
+REGION_META = "regions.json"
+CHUNK_SIZE = (16, 16, 4)
+REGION_CODEC = "json-compact+zlib"
+
+
+def chunk_of(x, y, z, size=CHUNK_SIZE):
+    return (x // size[0], y // size[1], z // size[2])
+
+
+class RegionStore(TileStore):
+    def __init__(self, path, chunk=CHUNK_SIZE, max_chunks=64, codec=REGION_CODEC):
+        self.path = path
+        self.max_chunks = max_chunks
+        self.codec = codec
+        self.chunks = OrderedDict()  # (cx, cy, cz) -> {(x, y, z): tile}
+        self.dirty = set()
+        self.versions = {}  # (x, y, z) -> puts since open, for stamp()
+        self.lock = threading.RLock()
+        meta_path = os.path.join(path, REGION_META)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.chunk = tuple(meta.get("chunk", CHUNK_SIZE))
+            self.token = meta.get("token", 0)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.chunk = tuple(chunk)
+            self.token = 0
+        self.token_seen = True  # it's on disk: anyone could have it
+        if not self.token:
+            self._new_token()  # a new world, or one from before tokens
+        self.known = self._scan_chunk_files()
+
+    def _new_token(self):
+        self.token = new_token()
+        self.token_seen = False
+        meta_path = os.path.join(self.path, REGION_META)
+        tmp = f"{meta_path}.{os.getpid()}.tmp"  # pool workers may open an old world together
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "chunk": list(self.chunk), "token": self.token}, f)
+        os.replace(tmp, meta_path)
+
+    def _scan_chunk_files(self):
+        found = set()
+        for name in os.listdir(self.path):
+            parts = name.split(".")
+            if len(parts) == 5 and parts[0] == "r" and parts[4] == "cogr":
+                try:
+                    found.add((int(parts[1]), int(parts[2]), int(parts[3])))
+                except ValueError:
+                    pass
+        return found
+
+    def chunk_filename(self, cx, cy, cz):
+        return os.path.join(self.path, f"r.{cx}.{cy}.{cz}.cogr")
+
+    def chunk_bounds(self, cx, cy, cz):
+        sx, sy, sz = self.chunk
+        return (cx * sx, cx * sx + sx - 1,
+                cy * sy, cy * sy + sy - 1,
+                cz * sz, cz * sz + sz - 1)
+
+    def load_chunk(self, key):
+        """The cached {(x, y, z): tile} dict for chunk `key` (not a copy)."""
+        with self.lock:
+            return self._load_chunk(key)
+
+    def _load_chunk(self, key):
+        tiles = self.chunks.get(key)
+        if tiles is not None:
+            self.chunks.move_to_end(key)
+            return tiles
+        tiles = {}
+        if key in self.known:
+            with open(self.chunk_filename(*key), "rb") as f:
+                raw = decode(f.read())
+            for k, tile in raw.items():
+                tiles[tuple(int(n) for n in k.split(","))] = tile
+        self.chunks[key] = tiles
+        while len(self.chunks) > self.max_chunks:
+            old_key, old_tiles = self.chunks.popitem(last=False)
+            if old_key in self.dirty:
+                self._write_chunk(old_key, old_tiles)
+        return tiles
+
+    def _write_chunk(self, key, tiles):
+        raw = {f"{x},{y},{z}": t for (x, y, z), t in tiles.items()}
+        if self.codec == REGION_CODEC:
+            blob = zlib.compress(encode(raw, "json-compact"), 6)  # no header; see above
+        else:
+            blob = encode(raw, self.codec)
+        if self.token_seen:
+            self._new_token()  # before the chunk, in case we crash in between
+        path = self.chunk_filename(*key)
+        with open(path + ".tmp", "wb") as f:
+            f.write(blob)
+        os.replace(path + ".tmp", path)
+        self.known.add(key)
+        self.dirty.discard(key)
+
+    # --- TileStore ---
+
+    def location(self, x, y, z):
+        return f"{self.chunk_filename(*chunk_of(x, y, z, self.chunk))} ({x},{y},{z})"
+
+    def exists(self, x, y, z):
+        key = chunk_of(x, y, z, self.chunk)
+        if key not in self.known and key not in self.chunks:
+            return False
+        return (x, y, z) in self.load_chunk(key)
+
+    def stamp(self, x, y, z):
+        if not self.exists(x, y, z):
+            return None
+        return self.versions.get((x, y, z), 0)
+
+    def get(self, x, y, z):
+        with self.lock:
+            tile = self._load_chunk(chunk_of(x, y, z, self.chunk)).get((x, y, z))
+            return None if tile is None else clone_json(tile)
+
+    def put(self, x, y, z, data):
+        key = chunk_of(x, y, z, self.chunk)
+        with self.lock:
+            self._load_chunk(key)[(x, y, z)] = clone_json(data)
+            self.dirty.add(key)
+            self.versions[(x, y, z)] = self.versions.get((x, y, z), 0) + 1
+
+    def coords(self):
+        for key in sorted(self.known | set(self.chunks)):
+            yield from list(self.load_chunk(key))
+
+    def flush(self):
+        with self.lock:
+            for key in list(self.dirty):
+                self._write_chunk(key, self.chunks[key])
+
+    def fingerprint(self):
+        with self.lock:
+            if self.dirty:
+                return None  # tiles that aren't on disk yet; flush() first
+            self.token_seen = True
+            return f"{self.token:08x}"
+
+    def coords_in_box(self, x0, x1, y0, y1, z0, z1):
+        c0 = chunk_of(x0, y0, z0, self.chunk)
+        c1 = chunk_of(x1, y1, z1, self.chunk)
+        out = []
+        for cz in range(c0[2], c1[2] + 1):
+            for cy in range(c0[1], c1[1] + 1):
+                for cx in range(c0[0], c1[0] + 1):
+                    key = (cx, cy, cz)
+                    if key not in self.known and key not in self.chunks:
+                        continue
+                    out.extend(c for c in self.load_chunk(key)
+                               if x0 <= c[0] <= x1 and y0 <= c[1] <= y1 and z0 <= c[2] <= z1)
+        out.sort(key=lambda c: (c[2], c[1], c[0]))
+        return out
+
+
+# -------------------------
+# OPENING / CONVERTING
+# -------------------------
+
+def open_world(path=None, codec=None, readonly=False, **kwargs):
+    """Open the world at `path` (default: $COG_WORLD or world_tiles/).
+
+    `codec` (default: $COG_CODEC, else the layout's own default) is what new
+    writes use; existing tiles are read whatever they were written with.
+    readonly=True is for helper processes reading a world another process
+    writes: a packed file is opened for reading only (the other layouts
+    never write unless asked to).
+    """
+    if path is None:
+        path = os.environ.get("COG_WORLD", DEFAULT_WORLD)
+    codec = codec or os.environ.get("COG_CODEC")
+    if codec:
+        kwargs["codec"] = codec
+    if path.endswith(PACKED_EXT):
+        return PackedStore(path, readonly=readonly, **kwargs)
+    if path.endswith(REGION_EXT) or os.path.exists(os.path.join(path, REGION_META)):
+        return RegionStore(path, **{k: v for k, v in kwargs.items()
+                                    if k in ("chunk", "max_chunks", "codec")})
+    return FolderStore(path, **{k: v for k, v in kwargs.items() if k == "codec"})
+
+
+def copy_world(src, dst, progress=None):
+    n = 0
+    for x, y, z in src.coords():
+        dst.put(x, y, z, src.get(x, y, z))
+        n += 1
+        if progress and n % 1000 == 0:
+            progress(n)
+    dst.flush()
+    return n
@@ -0,0 +1,530 @@
+"""Rooms made up on the spot: the same seed always makes the same world.
+
+    gen = Generator(seed=42)
+    gen.room_at(x, y, z)                     # is there meant to be a room here?
+    gen.tile(x, y, z, existing)              # the tile for (x, y, z)
+    World(store, generator=gen)              # engine: rooms appear as you walk in
+
+    python worldgen.py room 5 -3 0 --seed 42                  # print one tile
+    python worldgen.py region -500 -500 499 499 --seed 42     # a million spots
+    python worldgen.py region 0 0 99 99 --z 1 --world world.cogw
+
+Everything comes from hashing (seed, x, y, z). Two layers of value noise
+decide where rooms are (rock or open, every 7 rooms or so) and what they
+are like (the biome, every 40), and one hash per pair of neighbours
+decides whether there's an exit between them. Nothing depends on the
+order rooms are made in, so a room made when someone first steps into it
+is the same as one made by the batch, and making it again from the same
+seed gives the same tile. That also means a generated room nobody has
+saved yet can't be lost: it comes back the same.
+
+Tiles that already exist always win. A new room's exit towards one of
+them is open exactly when that tile has an exit back; towards empty spots
+it follows the noise. Existing tiles are never changed, so a region can be
+generated around a hand-built area, and running the batch twice does
+nothing the second time. A spot the noise calls rock still gets a room if
+an existing exit leads into it (a dead end, joined only to its
+neighbours). The rooms round (0, 0, 0), where new players start, are
+never rock.
+
+The region batch works a row at a time: the noise is interpolated along
+each row from the lattice corners, each edge is hashed once for both
+rooms it joins, and bands of rows are shared out over a process pool
+(--jobs). With NumPy installed, the noise, rock and exit fields of a band
+are worked out as whole arrays instead; the floats come out bit for bit
+the same, so both ways make identical tiles. Tiles are written
+straight into the world store. On one core that's about 12k rooms a
+second into a packed world (a million spots, 650k rooms, in under a
+minute), 16k into a region world and 5k into a folder of JSON files;
+making the rooms is the quick part, encoding and writing them isn't. See
+bench/bench_worldgen.py.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # region_rows works the fields out a row at a time instead
+
+from world_store import open_world, PackedStore
+from room_model import EXIT_ORDER, EXIT_STEP, SCHEMA_VERSION
+from exit_graph import ExitGraph, graph_path_for
+
+M64 = (1 << 64) - 1
+TO_UNIT = 1.0 / (1 << 64)
+# EXIT_ORDER goes round the compass, so the way back is four along
+BACK = {d: EXIT_ORDER[i ^ 4] for i, d in enumerate(EXIT_ORDER)}
+FORWARD = ("n", "ne", "e", "se")  # an edge is hashed from the room it leaves this way
+EDGE_CHANCE = {"n": 0.95, "e": 0.95, "ne": 0.25, "se": 0.25}
+
+ROCK_LEVEL = 0.42    # openness below this is solid rock: about 60% of spots are rooms,
+ROCK_SCALE = 7       # rooms per rock/open noise cell          nearly all of them joined up
+JITTER = 0.15        # how much of openness is per-room hash rather than noise
+BIOME_SCALE = 40     # rooms per biome noise cell
+LOOT_CHANCE = 0.10   # a thing lying about
+CACHE_CHANCE = 0.03  # a container with things in it
+ROWS_PER_JOB = 16
+
+# salts, so the hashes for different questions don't line up
+S_ROCK, S_JITTER, S_BIOME, S_EDGE, S_PLACE, S_DETAIL, S_LOOT = range(1, 8)
+
+BIOMES = (
+    {"name": "cave",
+     "places": ("A low cave", "A damp cavern", "A narrow tunnel", "A wide grotto",
+                "A twisting passage", "A cramped crawlway"),
+     "details": ("Water drips steadily from the ceiling", "The floor is slick with mud",
+                 "Bats rustle somewhere overhead", "Pale roots hang through cracks in the rock",
+                 "Your footsteps echo away into the dark", "A cold draught blows from somewhere"),
+     "loot": (("flint", "a sharp grey flint"), ("bone", "an old gnawed bone"),
+              ("lantern", "a dented tin lantern, dry of oil"), ("mushroom", "a fat white mushroom"),
+              ("rope", "a coil of damp rope")),
+     "caches": (("rotting sack", "a sack gone soft with damp"),)},
+    {"name": "mine",
+     "places": ("An old mine gallery", "A timbered shaft", "A collapsed working",
+                "A cart tunnel", "A miners' rest", "A narrow seam"),
+     "details": ("Rusted rails run along the floor", "Rotten props hold up the roof, just",
+                 "Picks have scarred every wall", "A broken cart lies on its side",
+                 "Dust hangs thick in the air", "Something glints in the rock face"),
+     "loot": (("pick", "a miner's pick with a split handle"), ("nugget", "a small nugget of copper"),
+              ("candle stub", "the end of a tallow candle"), ("helmet", "a battered leather helmet"),
+              ("chisel", "a blunt iron chisel")),
+     "caches": (("ore cart", "a little cart, half full of rubble"),
+                ("tool box", "a wooden box with a broken latch"))},
+    {"name": "ruin",
+     "places": ("A crumbling hall", "A broken chamber", "A pillared gallery",
+                "A roofless room", "An old guardroom", "A buried stair landing"),
+     "details": ("Faded carvings cover the walls", "Fallen masonry lies everywhere",
+                 "A cracked mosaic shows a forgotten king", "Ivy has found its way in",
+                 "An empty alcove once held a statue", "The air smells of old stone"),
+     "loot": (("coin", "a worn silver coin"), ("shard", "a shard of painted pottery"),
+              ("key", "a heavy iron key"), ("ring", "a tarnished ring"),
+              ("scroll", "a scroll too faded to read")),
+     "caches": (("urn", "a tall clay urn, its lid cracked"),
+                ("chest", "an iron-bound chest"))},
+    {"name": "fungus",
+     "places": ("A glowing hollow", "A spore-choked cave", "A soft-floored chamber",
+                "A mushroom grove", "A dripping warren", "A puffball field"),
+     "details": ("Mushrooms taller than a man glow faintly blue", "Spores drift in the still air",
+                 "The ground gives underfoot like a sponge", "Something squelches in the dark",
+                 "Thin threads of mould cover the walls", "A sweet, rotten smell fills the air"),
+     "loot": (("glowcap", "a mushroom that glows in your hand"), ("spore pod", "a dry pod that rattles"),
+              ("slime", "a jar of green slime"), ("bone charm", "a charm of bone and fungus thread"),
+              ("lichen", "a tuft of orange lichen")),
+     "caches": (("husk", "the dried husk of some giant puffball"),)},
+)
+
+
+def _smooth(t):
+    return t * t * (3 - 2 * t)
+
+
+class Generator:
+    def __init__(self, seed=0, rock=ROCK_LEVEL):
+        self.seed = int(seed)
+        self.rock = rock
+        self.base = self.seed * 0xD6E8FEB86659FD93
+        self.corners = {}  # (salt, ix, iy, z) -> lattice value, for the value noise
+
+    def hash(self, x, y, z, salt):
+        # _mix inlined: the batch calls this a few million times
+        h = (x * 0x9E3779B97F4A7C15 + y * 0xC2B2AE3D27D4EB4F + z * 0x165667B19E3779F9
+             + self.base + salt) & M64
+        h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & M64
+        h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & M64
+        return h ^ (h >> 31)
+
+    def unit(self, x, y, z, salt):
+        return self.hash(x, y, z, salt) * TO_UNIT
+
+    def _corner(self, salt, ix, iy, z):
+        key = (salt, ix, iy, z)
+        v = self.corners.get(key)
+        if v is None:
+            if len(self.corners) > 200000:
+                self.corners.clear()  # a long walk; they're cheap to make again
+            v = self.corners[key] = self.unit(ix, iy, z, salt)
+        return v
+
+    def noise(self, salt, scale, x, y, z):
+        """Value noise in [0, 1): smooth, changing over about `scale` rooms."""
+        fx, fy = x / scale, y / scale
+        ix, iy = math.floor(fx), math.floor(fy)
+        tx, ty = _smooth(fx - ix), _smooth(fy - iy)
+        a = self._corner(salt, ix, iy, z)
+        b = self._corner(salt, ix + 1, iy, z)
+        c = self._corner(salt, ix, iy + 1, z)
+        d = self._corner(salt, ix + 1, iy + 1, z)
+        top = a + (b - a) * tx
+        return top + (c + (d - c) * tx - top) * ty
+
+    def noise_row(self, salt, scale, x0, n, y, z):
+        """[noise(salt, scale, x, y, z) for x in x0 .. x0+n-1], the same floats, faster."""
+        fy = y / scale
+        iy = math.floor(fy)
+        ty = _smooth(fy - iy)
+        corner = self._corner
+        out = []
+        last = None
+        for x in range(x0, x0 + n):
+            fx = x / scale
+            ix = math.floor(fx)
+            if ix != last:
+                last = ix
+                a, b = corner(salt, ix, iy, z), corner(salt, ix + 1, iy, z)
+                c, d = corner(salt, ix, iy + 1, z), corner(salt, ix + 1, iy + 1, z)
+            tx = _smooth(fx - ix)
+            top = a + (b - a) * tx
+            out.append(top + (c + (d - c) * tx - top) * ty)
+        return out
+
+    # --- the same, over whole arrays (NumPy) ---
+
+    def hash_array(self, x, y, z, salt):
+        """hash() of every (x, y) in two int64 arrays that broadcast together."""
+        u = np.uint64
+        # uint64 arithmetic wraps, which is what the & M64s do above
+        h = (x.astype(u) * u(0x9E3779B97F4A7C15) + y.astype(u) * u(0xC2B2AE3D27D4EB4F)
+             + u((z * 0x165667B19E3779F9 + self.base + salt) & M64))
+        h = (h ^ (h >> u(30))) * u(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> u(27))) * u(0x94D049BB133111EB)
+        return h ^ (h >> u(31))
+
+    def unit_array(self, x, y, z, salt):
+        return self.hash_array(x, y, z, salt).astype(np.float64) * TO_UNIT
+
+    def noise_array(self, salt, scale, xs, ys, z):
+        """noise() for every row in ys and column in xs: a len(ys) x len(xs) array."""
+        fx, fy = xs / scale, ys / scale
+        ix, iy = np.floor(fx), np.floor(fy)
+        tx, ty = _smooth(fx - ix), _smooth(fy - iy)[:, None]
+        ix, iy = ix.astype(np.int64), iy.astype(np.int64)
+        # every lattice corner the box touches, once
+        cx = np.arange(ix[0], ix[-1] + 2, dtype=np.int64)
+        cy = np.arange(iy[0], iy[-1] + 2, dtype=np.int64)
+        lattice = self.unit_array(cx[None, :], cy[:, None], z, salt)
+        ci, cj = ix - cx[0], (iy - cy[0])[:, None]
+        a, b = lattice[cj, ci], lattice[cj, ci + 1]
+        c, d = lattice[cj + 1, ci], lattice[cj + 1, ci + 1]
+        top = a + (b - a) * tx
+        return top + (c + (d - c) * tx - top) * ty
+
+    def region_fields(self, x0, w, y0, y1, z):
+        """open_rows, fwd_rows and biome_rows, as region_rows() would work
+        them out, for columns x0 .. x0+w-1 and all the rows it asks for."""
+        xs = np.arange(x0, x0 + w, dtype=np.int64)
+        ys = np.arange(y0 - 2, y1 + 3, dtype=np.int64)
+        X, Y = xs[None, :], ys[:, None]
+        opened = ((1 - JITTER) * self.noise_array(S_ROCK, ROCK_SCALE, xs, ys, z)
+                  + JITTER * self.unit_array(X, Y, z, S_JITTER)) >= self.rock
+        if z == 0 and y0 - 2 <= 1 and y1 + 2 >= -1:
+            # see room_at
+            opened[max(-1, y0 - 2) - (y0 - 2):min(1, y1 + 2) - (y0 - 2) + 1,
+                   max(-1, x0) - x0:max(0, min(1, x0 + w - 1) - x0 + 1)] = True
+        # fwd rows y0-1 .. y1+1, each with the open rows below and above it
+        below, here, up = opened[:-2], opened[1:-1], opened[2:]
+        Y = Y[1:-1]
+
+        def edge(k, d):
+            return self.unit_array(X, Y, z, S_EDGE + 16 * k) < EDGE_CHANCE[d]
+
+        fwd = (here & up & edge(0, "n")).astype(np.uint8)
+        fwd[:, :-1] |= (here[:, :-1] & up[:, 1:] & edge(1, "ne")[:, :-1]) * np.uint8(2)
+        fwd[:, :-1] |= (here[:, :-1] & here[:, 1:] & edge(2, "e")[:, :-1]) * np.uint8(4)
+        fwd[:, :-1] |= (here[:, :-1] & below[:, 1:] & edge(3, "se")[:, :-1]) * np.uint8(8)
+        biomes = self.noise_array(S_BIOME, BIOME_SCALE, xs, ys[2:-2], z)
+        opened = opened.astype(np.uint8)
+        return ({y0 - 2 + k: bytearray(row.tobytes()) for k, row in enumerate(opened)},
+                {y0 - 1 + k: bytearray(row.tobytes()) for k, row in enumerate(fwd)},
+                {y0 + k: row.tolist() for k, row in enumerate(biomes)})
+
+    # --- the shape of the world ---
+
+    def room_at(self, x, y, z):
+        if z == 0 and -1 <= x <= 1 and -1 <= y <= 1:
+            return True  # new players start at (0, 0, 0)
+        open_ = (1 - JITTER) * self.noise(S_ROCK, ROCK_SCALE, x, y, z) + JITTER * self.unit(x, y, z, S_JITTER)
+        return open_ >= self.rock
+
+    def edge_open(self, x, y, z, d):
+        """Would the noise put an exit `d` out of (x, y, z)? The same asked from either end."""
+        if d not in EDGE_CHANCE:
+            dx, dy, dz = EXIT_STEP[d]
+            x, y, z, d = x + dx, y + dy, z + dz, BACK[d]
+        return self.unit(x, y, z, S_EDGE + 16 * FORWARD.index(d)) < EDGE_CHANCE[d]
+
+    def exits(self, x, y, z, existing=None):
+        """Exits of a new room at (x, y, z).
+
+        existing(x, y, z) gives the exits dict of a tile already there, or
+        None; those decide the exits towards them.
+        """
+        made_up = self.room_at(x, y, z)  # else a dead end some existing exit leads into
+        out = {}
+        for d in EXIT_ORDER:
+            dx, dy, dz = EXIT_STEP[d]
+            there = existing(x + dx, y + dy, z + dz) if existing is not None else None
+            if there is not None:
+                out[d] = bool(there.get(BACK[d]))
+            else:
+                out[d] = (made_up and self.room_at(x + dx, y + dy, z + dz)
+                          and self.edge_open(x, y, z, d))
+        return out
+
+    # --- what's in a room ---
+
+    def biome(self, x, y, z, v=None):
+        if v is None:
+            v = self.noise(S_BIOME, BIOME_SCALE, x, y, z)
+        return BIOMES[min(len(BIOMES) - 1, int(v * len(BIOMES)))]
+
+    def dress(self, x, y, z, b=None):
+        """(description, items) for the room at (x, y, z); b: its biome, if known."""
+        b = b or self.biome(x, y, z)
+        h = self.hash(x, y, z, S_PLACE)
+        place = b["places"][h % len(b["places"])]
+        details = b["details"]
+        h2 = self.hash(x, y, z, S_DETAIL)
+        first = h2 % len(details)
+        desc = f"{place}.\n{details[first]}."
+        if (h2 >> 20) & 3 == 0:
+            second = (first + 1 + (h2 >> 8) % (len(details) - 1)) % len(details)
+            desc += f" {details[second]}."
+        items = []
+        h3 = self.hash(x, y, z, S_LOOT)
+        r = (h3 & 0xFFFFFFFF) / 2**32
+        loot = b["loot"]
+        if r < CACHE_CHANCE:
+            name, what = b["caches"][(h3 >> 32) % len(b["caches"])]
+            inside = [self._item(loot[(h3 >> (40 + 4 * k)) % len(loot)]) for k in range(1 + (h3 >> 60) % 2)]
+            items.append({"name": name, "desc": what, "contains": inside})
+        elif r < CACHE_CHANCE + LOOT_CHANCE:
+            items.append(self._item(loot[(h3 >> 32) % len(loot)]))
+        return desc, items
+
+    @staticmethod
+    def _item(entry):
+        return {"name": entry[0], "desc": entry[1], "contains": []}
+
+    def tile(self, x, y, z, existing=None):
+        """The whole tile for (x, y, z), in the current layout (room_model.SCHEMA_VERSION)."""
+        return self.make_tile(x, y, z, self.exits(x, y, z, existing))
+
+    def make_tile(self, x, y, z, exits, biome=None):
+        desc, items = self.dress(x, y, z, biome)
+        return {"coords": {"x": x, "y": y, "z": z}, "last_move": None, "exits": exits,
+                "description": desc, "items": items, "schema_version": SCHEMA_VERSION,
+                "generated": self.seed}
+
+    # --- whole regions ---
+
+    def region_rows(self, x0, x1, y0, y1, z, existing):
+        """(x, y, tile) for every new room in the box, a row at a time.
+
+        existing: {(x, y, z): exits dict} of the tiles already in or around
+        the box. The results are the same as tile() would give, room by
+        room; it's just quicker to work out whole rows (or, with NumPy,
+        the whole box).
+        """
+        w = x1 - x0 + 3  # a column of margin either side
+        near = set()  # spots next to an existing tile, whose exits decide ours
+        for (ex, ey, ez) in existing:
+            near.update((ex + dx, ey + dy, ez) for dx, dy, _ in EXIT_STEP.values())
+        if np is not None:
+            open_rows, fwd_rows, biome_rows = self.region_fields(x0 - 1, w, y0, y1, z)
+        else:
+            open_rows, fwd_rows, biome_rows = {}, {}, None
+
+        def open_row(y):
+            row = open_rows.get(y)
+            if row is None:
+                rock, unit = self.rock, self.unit
+                noise = self.noise_row(S_ROCK, ROCK_SCALE, x0 - 1, w, y, z)
+                row = open_rows[y] = bytearray(
+                    (1 - JITTER) * v + JITTER * unit(x0 - 1 + i, y, z, S_JITTER) >= rock
+                    for i, v in enumerate(noise))
+                if z == 0 and -1 <= y <= 1:
+                    for x in range(max(-1, x0 - 1), min(1, x1 + 1) + 1):
+                        row[x - x0 + 1] = 1  # see room_at
+            return row
+
+        def fwd_row(y):
+            # the noise's exits n, ne, e, se out of every room in row y, as bits
+            row = fwd_rows.get(y)
+            if row is None:
+                here, up = open_row(y), open_row(y + 1)
+                row = fwd_rows[y] = bytearray(w)
+                for i in range(w):
+                    if not here[i]:
+                        continue
+                    x = x0 - 1 + i
+                    bits = 0
+                    if up[i] and self.unit(x, y, z, S_EDGE) < EDGE_CHANCE["n"]:
+                        bits |= 1
+                    if i + 1 < w:
+                        if up[i + 1] and self.unit(x, y, z, S_EDGE + 16) < EDGE_CHANCE["ne"]:
+                            bits |= 2
+                        if here[i + 1] and self.unit(x, y, z, S_EDGE + 32) < EDGE_CHANCE["e"]:
+                            bits |= 4
+                        if open_row(y - 1)[i + 1] and self.unit(x, y, z, S_EDGE + 48) < EDGE_CHANCE["se"]:
+                            bits |= 8
+                    row[i] = bits
+            return row
+
+        for y in range(y0, y1 + 1):
+            here, below, above = fwd_row(y), fwd_row(y - 1), fwd_row(y + 1)
+            opened = open_row(y)
+            if biome_rows is not None:
+                biomes = biome_rows.pop(y)
+            else:
+                biomes = self.noise_row(S_BIOME, BIOME_SCALE, x0 - 1, w, y, z)
+            for i in range(1, w - 1):
+                x = x0 - 1 + i
+                if (x, y, z) in existing:
+                    continue
+                if not opened[i]:
+                    if (x, y, z) in near and any(
+                            existing.get((x + dx, y + dy, z), {}).get(BACK[d])
+                            for d, (dx, dy, _) in EXIT_STEP.items()):
+                        yield x, y, self.tile(x, y, z, lambda *c: existing.get(c))
+                    continue
+                f, fb, fa = here[i], below, above
+                exits = {"n": bool(f & 1), "ne": bool(f & 2), "e": bool(f & 4), "se": bool(f & 8),
+                         "s": bool(fb[i] & 1), "sw": bool(fb[i - 1] & 2),
+                         "w": bool(here[i - 1] & 4), "nw": bool(fa[i - 1] & 8)}
+                if (x, y, z) in near:
+                    for d, (dx, dy, _) in EXIT_STEP.items():
+                        there = existing.get((x + dx, y + dy, z))
+                        if there is not None:
+                            exits[d] = bool(there.get(BACK[d]))
+                yield x, y, self.make_tile(x, y, z, exits, self.biome(x, y, z, biomes[i]))
+            open_rows.pop(y - 2, None)
+            fwd_rows.pop(y - 2, None)
+
+
+# -------------------------
+# WRITING REGIONS
+# -------------------------
+
+_gen = None
+_encoder = None  # a read-only handle on a packed world, to encode tiles the way it will store them
+
+
+def _open_worker(seed, path):
+    global _gen, _encoder
+    _gen = Generator(seed)
+    _encoder = open_world(path, readonly=True) if path.endswith(".cogw") else None
+
+
+def _region_job(job):
+    x0, x1, y0, y1, z, existing = job
+    out = []
+    for x, y, tile in _gen.region_rows(x0, x1, y0, y1, z, existing):
+        out.append((x, y, _encoder.encode_tile(tile) if _encoder is not None else tile))
+    return out
+
+
+def generate_region(store, gen, x0, y0, x1, y1, z=0, jobs=1, progress=None):
+    """Write every missing room of the box into the store; returns how many."""
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    existing = {}
+    for c, tile in store.rooms_in_box(x0 - 1, x1 + 1, y0 - 1, y1 + 1, z, z):
+        exits = tile.get("exits") if isinstance(tile, dict) else None
+        existing[c] = exits if isinstance(exits, dict) else {}
+    bands = []
+    for y in range(y0, y1 + 1, ROWS_PER_JOB):
+        top = min(y1, y + ROWS_PER_JOB - 1)
+        near = {c: e for c, e in existing.items() if y - 1 <= c[1] <= top + 1}
+        bands.append((x0, x1, y, top, z, near))
+    packed = isinstance(store, PackedStore)
+    made = []
+    if jobs == 1:
+        results = (list(gen.region_rows(*band)) for band in bands)
+    else:
+        store.flush()  # a packed index on disk for the workers
+        pool = Pool(jobs, initializer=_open_worker, initargs=(gen.seed, store.path if packed else ""))
+        results = pool.imap(_region_job, bands)
+    try:
+        for rows in results:
+            for x, y, tile in rows:
+                if packed and not isinstance(tile, dict):
+                    store.put_encoded(x, y, z, tile)
+                else:
+                    store.put(x, y, z, tile)
+                made.append((x, y, tile))
+            if progress:
+                progress(len(made))
+    finally:
+        if jobs != 1:
+            pool.close()
+            pool.join()
+    store.flush()
+    return made
+
+
+def _update_graph(store, made, z, world):
+    # keep a saved exit graph in step, rather than have the game rebuild it;
+    # world: the store's fingerprint from before we added to it
+    path = graph_path_for(store)
+    if not os.path.exists(path):
+        return False
+    graph = ExitGraph.load(path)
+    if world is None or graph.world != world:
+        return False  # it was out of date already; open_graph() rebuilds it
+    for x, y, tile in made:
+        if not isinstance(tile, dict):
+            tile = store.get(x, y, z)  # came back encoded
+        graph.set_room(x, y, z, tile["exits"])
+    graph.build()
+    graph.save(path, store=store)
+    return True
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("room", help="print the tile the generator makes for one spot")
+    p.add_argument("coords", type=int, nargs=3, metavar="N")
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("region", help="write every missing room in a box into the world")
+    p.add_argument("box", type=int, nargs=4, metavar="N", help="x0 y0 x1 y1 (inclusive)")
+    p.add_argument("--z", type=int, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--world", help="world folder or file (default: $COG_WORLD or world_tiles/)")
+    p.add_argument("--jobs", type=int, default=1, help="worker processes (0: one per CPU)")
+    args = ap.parse_args(argv)
+
+    gen = Generator(args.seed)
+    if args.cmd == "room":
+        x, y, z = args.coords
+        print(json.dumps(gen.tile(x, y, z), indent=2))
+        if not gen.room_at(x, y, z):
+            print("(rock here: a room only if an existing exit leads in)")
+        return 0
+
+    x0, y0, x1, y1 = args.box
+    store = open_world(args.world)
+    try:
+        t0 = time.perf_counter()
+        world = store.fingerprint()
+        made = generate_region(store, gen, x0, y0, x1, y1, args.z, args.jobs or os.cpu_count(),
+                               progress=lambda n: print(f"  {n} rooms...", end="\r"))
+        took = time.perf_counter() - t0
+        area = (abs(x1 - x0) + 1) * (abs(y1 - y0) + 1)
+        print(f"{len(made)} new rooms in {area} spots in {took:.1f}s "
+              f"({len(made) / max(took, 1e-9):,.0f}/s) -> {args.world or store.path}")
+        if made and _update_graph(store, made, args.z, world):
+            print(f"Updated {graph_path_for(store)}.")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())